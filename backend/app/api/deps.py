@@ -0,0 +1,60 @@
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from typing import Optional
+from app.core.config import settings
+from app.core.security import verify_token_cached
+from app.services.users import get_user, is_admin
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+def unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> Optional[dict]:
+    """The signed-in user, or None without a token. A bad token is always refused."""
+    if credentials is None:
+        return None
+
+    claims = await verify_token_cached(credentials.credentials)
+    if claims is None:
+        raise unauthorized("Invalid or expired token")
+
+    user = await get_user(claims.get("user_id", ""))
+    if user is None:
+        raise unauthorized("User no longer exists")
+    return user
+
+async def get_current_user(user: Optional[dict] = Depends(get_optional_user)) -> dict:
+    """The signed-in user; requests without a token are refused."""
+    if user is None:
+        raise unauthorized("Not authenticated")
+    return user
+
+async def authenticate(user: Optional[dict] = Depends(get_optional_user)) -> Optional[dict]:
+    """Router-wide check: a token is required only when AUTH_REQUIRED is set."""
+    if user is None and settings.AUTH_REQUIRED:
+        raise unauthorized("Not authenticated")
+    return user
+
+async def require_admin(user: dict = Depends(get_current_user)) -> dict:
+    """The signed-in user, who must have the admin role."""
+    if not is_admin(user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
+    return user
+
+async def is_admin_request(headers: list[tuple[bytes, bytes]]) -> bool:
+    """Whether raw ASGI request headers carry a valid bearer token of an admin."""
+    for name, value in headers:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return False
+            claims = await verify_token_cached(token.strip())
+            return claims is not None and is_admin(await get_user(claims.get("user_id", "")))
+    return False
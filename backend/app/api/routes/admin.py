@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.api.deps import require_admin
+from app.core.config import settings
+from app.core.profiling import get_profile, list_profiles, profile_window
+
+async def require_profiling() -> None:
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+
+router = APIRouter(dependencies=[Depends(require_profiling), Depends(require_admin)])
+
+@router.post("/profile")
+async def capture_profile(
+    seconds: float = Query(5.0, gt=0),
+    mode: str = Query("sampling", pattern="^(sampling|cprofile)$"),
+    interval_ms: float = Query(5.0, ge=1, le=1000)
+):
+    """
+    Profile the server for a time window and return the stored profile.
+    Sampling reports collapsed stacks for flame graphs; cprofile reports pstats output.
+    """
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds cannot be more than {settings.PROFILE_MAX_SECONDS:g}"
+        )
+
+    try:
+        return await profile_window(seconds, mode, interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/profiles")
+async def get_profiles():
+    """Stored profiles, newest first, without their reports."""
+    return list_profiles()
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile_report(profile_id: str):
+    """The report of a stored profile as plain text."""
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["report"])
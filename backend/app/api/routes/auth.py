@@ -5,86 +5,112 @@ from app.schemas.schemas import (
     UserResponse,
     Token
 )
-from app.core.security import (
-    get_password_hash,
-    verify_password,
-    create_access_token
-)
-from datetime import timedelta
+from fastapi.security import HTTPAuthorizationCredentials
+from app.api.deps import bearer_scheme, get_current_user
+from app.core.responses import model_response
+from app.core.hashing import HasherBusyError, get_password_hasher
+from app.core.security import create_access_token, revoke_token
+from app.services.users import ADMIN_ROLE, add_user, get_user_by_email, update_password
+from datetime import datetime
+import uuid
 from app.core.config import settings
 
 router = APIRouter()
 
-# In-memory storage for demo (replace with database in production)
-users_db = {}
+def hasher_busy(e: HasherBusyError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": "5"}
+    )
 
 @router.post("/signup", response_model=Token, status_code=status.HTTP_201_CREATED)
 async def signup(user: UserCreate):
     """Register a new user."""
     # Check if user already exists
-    if user.email in users_db:
+    if await get_user_by_email(user.email) is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     # Create user
-    hashed_password = get_password_hash(user.password)
-    user_id = f"user_{len(users_db) + 1}"
+    try:
+        hashed_password = await get_password_hasher().hash(user.password)
+    except HasherBusyError as e:
+        raise hasher_busy(e)
+    user_id = f"user_{uuid.uuid4().hex[:16]}"
+    created_at = datetime.utcnow()
     
     user_data = {
         "id": user_id,
         "email": user.email,
         "name": user.name,
         "password": hashed_password,
-        "role": "USER",
+        "role": ADMIN_ROLE if user.email.lower() in {email.lower() for email in settings.ADMIN_EMAILS} else "USER",
         "isResearcher": False,
-        "createdAt": "2026-01-05T00:00:00Z"
+        "createdAt": created_at,
+        "updatedAt": created_at,
     }
     
-    users_db[user.email] = user_data
+    # Another signup for the same email may have finished while this one hashed
+    if not await add_user(user_data):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
     # Create access token
     access_token = create_access_token(
         data={"sub": user.email, "user_id": user_id}
     )
     
-    user_response = UserResponse(**{k: v for k, v in user_data.items() if k != "password"})
+    user_response = UserResponse.model_validate({k: v for k, v in user_data.items() if k != "password"})
     
-    return Token(access_token=access_token, user=user_response)
+    return model_response(Token(access_token=access_token, user=user_response), status.HTTP_201_CREATED)
 
 @router.post("/signin", response_model=Token)
 async def signin(credentials: UserLogin):
     """Authenticate a user and return a token."""
     # Find user
-    user_data = users_db.get(credentials.email)
+    user_data = await get_user_by_email(credentials.email)
+    
+    valid, new_hash = False, None
+    if user_data:
+        try:
+            valid, new_hash = await get_password_hasher().verify(credentials.password, user_data["password"])
+        except HasherBusyError as e:
+            raise hasher_busy(e)
     
-    if not user_data or not verify_password(credentials.password, user_data["password"]):
+    if user_data is None or not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Stored with an outdated cost factor: keep the hash computed at the current one
+    if new_hash:
+        await update_password(user_data["id"], new_hash)
+    
     # Create access token
     access_token = create_access_token(
         data={"sub": credentials.email, "user_id": user_data["id"]}
     )
     
-    user_response = UserResponse(**{k: v for k, v in user_data.items() if k != "password"})
+    user_response = UserResponse.model_validate({k: v for k, v in user_data.items() if k != "password"})
     
-    return Token(access_token=access_token, user=user_response)
+    return model_response(Token(access_token=access_token, user=user_response))
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user():
+async def read_current_user(user_data: dict = Depends(get_current_user)):
     """Get current user information."""
-    # This would normally use the JWT token to identify the user
-    # For demo purposes, return a mock user
-    return UserResponse(
-        id="user_1",
-        email="demo@veridian.com",
-        name="Demo User",
-        role="USER",
-        isResearcher=False,
-        createdAt="2026-01-05T00:00:00Z"
-    )
+    return model_response(UserResponse.model_validate({k: v for k, v in user_data.items() if k != "password"}))
+
+@router.post("/signout", status_code=status.HTTP_204_NO_CONTENT)
+async def signout(
+    user_data: dict = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
+):
+    """Revoke the token used for this request."""
+    await revoke_token(credentials.credentials)
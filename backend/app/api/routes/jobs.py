@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from pydantic import ValidationError
+from app.api.deps import get_optional_user
+from app.core.config import settings
+from app.core.responses import ORJSONResponse
+from app.schemas.schemas import JobRequest
+from app.services.jobs import ALL_USERS, CANCELLED, FINISHED, JOB_KINDS, SUCCEEDED, QueueFullError, get_job_manager
+from app.services.users import is_admin
+
+router = APIRouter()
+
+def user_id(user: Optional[dict]) -> Optional[str]:
+    return user["id"] if user is not None else None
+
+def check_access(job: Optional[dict], user: Optional[dict]) -> dict:
+    """
+    The job, if the caller may see it: their own jobs (anonymous callers see
+    anonymous jobs), or any job for admins.
+    """
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.get("userId") != user_id(user) and not is_admin(user):
+        raise HTTPException(status_code=403, detail="Not your job")
+    return job
+
+def job_response(job: dict) -> dict:
+    """A job record as returned by the API."""
+    response = {k: v for k, v in job.items() if k not in ("payload", "result")}
+    for field in ("createdAt", "startedAt", "finishedAt"):
+        if response.get(field) is not None:
+            response[field] = response[field].isoformat()
+    if job["status"] == SUCCEEDED:
+        response["resultUrl"] = f"{settings.API_V1_STR}/jobs/{job['id']}/result"
+    return response
+
+@router.post("", status_code=202)
+async def submit_job(request: JobRequest, user: Optional[dict] = Depends(get_optional_user)):
+    """
+    Queue a long-running job. The payload is the request body of the
+    matching endpoint: "simulation" (/simulation/simulate), "dispersion"
+    (/simulation/dispersion) or "sweep" (/simulation/sweep).
+    """
+    if request.kind not in JOB_KINDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"kind must be one of: {', '.join(sorted(JOB_KINDS))}"
+        )
+    
+    try:
+        job = await get_job_manager().submit(request.kind, request.payload, user_id(user))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    
+    return job_response(job)
+
+@router.get("")
+async def list_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|succeeded|failed|cancelled)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    user: Optional[dict] = Depends(get_optional_user)
+):
+    """The caller's most recent jobs first; every user's for admins."""
+    owner = ALL_USERS if is_admin(user) else user_id(user)
+    return [job_response(job) for job in await get_job_manager().recent(status, limit, owner)]
+
+@router.get("/stats")
+async def get_job_stats():
+    """Report worker, queue and completion counters."""
+    return await get_job_manager().stats()
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, user: Optional[dict] = Depends(get_optional_user)):
+    """Status and progress of a job."""
+    job = check_access(await get_job_manager().get(job_id), user)
+    return job_response(job)
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str, user: Optional[dict] = Depends(get_optional_user)):
+    """The result of a succeeded job, as the matching endpoint would have returned it."""
+    job = check_access(await get_job_manager().result(job_id), user)
+    if job["status"] != SUCCEEDED:
+        detail = f"Job is {job['status']}"
+        if job.get("error"):
+            detail += f": {job['error']}"
+        raise HTTPException(status_code=409, detail=detail)
+    # Returned directly: results can be large and are already JSON-ready
+    return ORJSONResponse(job["result"])
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: str, user: Optional[dict] = Depends(get_optional_user)):
+    """Cancel a queued or running job."""
+    check_access(await get_job_manager().get(job_id), user)
+    job = await get_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in FINISHED and job["status"] != CANCELLED:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    return job_response(job)
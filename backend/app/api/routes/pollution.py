@@ -1,16 +1,50 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from datetime import datetime
-from app.schemas.schemas import PollutionDataResponse, PollutionQuery
+from app.core.broadcast import Broadcaster
+from app.core.cache import TTLCache, geo_key
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.responses import model_response, records, table_response
+from app.schemas.schemas import PollutionDataResponse, PollutionBatchRequest
+from app.services.features import get_feature_store, series_features
+from app.services.history import get_series_registry, unregistered_history
+from app.services.ingest import BatchResult, iter_lines, pollution_records, prepare_batch, store_batch
+from app.services.aqi import NO2_UGM3_PER_PPB, POLLUTANTS, calculate_pi, compute_aqi
+from app.services.spatial import thin_points, zoom_for_bbox
+from app.services.stations import DEFAULT_CITY, get_station_index
+from app.services.timeseries import RESOLUTIONS
+import numpy as np
 import random
+import json
+import csv
 
 router = APIRouter()
 
+# Current conditions per (location, lat/lon cell)
+current_cache = TTLCache(
+    settings.CACHE_MAX_ENTRIES,
+    settings.CACHE_TTL_SECONDS,
+    max_bytes=settings.CACHE_MAX_BYTES
+)
+
+# One producer per streamed station or map box, shared by all its subscribers
+broadcaster = Broadcaster(settings.STREAM_INTERVAL_SECONDS, settings.STREAM_QUEUE_SIZE)
+
 # Mock pollution data generator
-def generate_mock_pollution_data(location: str, lat: float, lon: float) -> dict:
+def generate_mock_pollution_data(location: str, lat: float, lon: float, typical_pm25: Optional[float] = None) -> dict:
     """Generate mock pollution data for demonstration."""
-    # Simulate varying pollution levels
-    base_pm25 = random.uniform(10, 150)
+    # Simulate varying pollution levels around the station's typical level
+    if typical_pm25 is None:
+        base_pm25 = random.uniform(10, 150)
+    else:
+        base_pm25 = typical_pm25 * random.uniform(0.6, 1.4)
+    # Mass concentration as sensors report it, in the ppb the AQI tables use
+    no2 = random.uniform(10, 100) / NO2_UGM3_PER_PPB
+    o3 = random.uniform(20, 80)
+    co = random.uniform(0.5, 5)
     
     return {
         "id": f"poll_{random.randint(1000, 9999)}",
@@ -20,32 +54,56 @@ def generate_mock_pollution_data(location: str, lat: float, lon: float) -> dict:
         "date": datetime.now().isoformat(),
         "pm25": round(base_pm25, 2),
         "pm10": round(base_pm25 * 1.5, 2),
-        "no2": round(random.uniform(10, 100), 2),
-        "o3": round(random.uniform(20, 80), 2),
-        "co": round(random.uniform(0.5, 5), 2),
+        "no2": round(no2, 2),
+        "o3": round(o3, 2),
+        "co": round(co, 2),
         "temperature": round(random.uniform(15, 35), 1),
         "humidity": round(random.uniform(30, 80), 1),
-        "aqi": calculate_aqi(base_pm25),
+        "aqi": int(compute_aqi(pm25=base_pm25, pm10=base_pm25 * 1.5, no2=no2, o3=o3, co=co)["aqi"][0]),
         "pollutionIndex": round(calculate_pi(base_pm25, random.uniform(20, 30), random.uniform(1, 3), 100), 2),
         "createdAt": datetime.now().isoformat()
     }
 
-def calculate_aqi(pm25: float) -> int:
-    """Calculate AQI from PM2.5."""
-    if pm25 <= 12:
-        return int(pm25 * 4.17)
-    elif pm25 <= 35.4:
-        return int(((pm25 - 12.1) / 23.3) * 49 + 51)
-    elif pm25 <= 55.4:
-        return int(((pm25 - 35.5) / 19.9) * 49 + 101)
-    elif pm25 <= 150.4:
-        return int(((pm25 - 55.5) / 94.9) * 99 + 151)
-    else:
-        return int(((pm25 - 150.5) / 99.9) * 99 + 201)
+def resolve_station(location: Optional[str], latitude: Optional[float], longitude: Optional[float]) -> tuple[int, float, float]:
+    """
+    Resolve a request to a station row and the coordinates to report.
+    Coordinates resolve to the nearest station; place names go through the
+    gazetteer, falling back to the default city when unknown.
+    """
+    index = get_station_index()
+    
+    if latitude is not None and longitude is not None:
+        rows, _ = index.nearest(latitude, longitude, 1)
+        return int(rows[0]), latitude, longitude
+    
+    row = index.find(location) if location else None
+    if row is None:
+        # A dataset without the default city falls back to its first station
+        row = index.find(DEFAULT_CITY) or 0
+    return row, float(index.latitudes[row]), float(index.longitudes[row])
+
+def map_point_columns(north: float, south: float, east: float, west: float, zoom: int, limit: int) -> dict[str, np.ndarray]:
+    """Sample the stations in a bounding box, thinned to `limit` per screen cell."""
+    index = get_station_index()
+    rows = index.within_bbox(north, south, east, west)
+    
+    lats = index.latitudes[rows]
+    lons = index.longitudes[rows]
+    pm25 = index.column("base_pm25")[rows] * np.random.uniform(0.6, 1.4, len(rows))
+    aqi = compute_aqi(pm25=pm25)["aqi"]
+    
+    keep = thin_points(lats, lons, zoom, limit, priority=aqi)
+    
+    return {
+        "latitude": lats[keep].round(4),
+        "longitude": lons[keep].round(4),
+        "pm25": pm25[keep].round(2),
+        "aqi": aqi[keep],
+    }
 
-def calculate_pi(pm25: float, temp: float, co: float, altitude: float) -> float:
-    """Calculate pollution index using the formula."""
-    return max(0, min(0.3 * temp + 0.4 * pm25 + 1.2 * co - 0.8 * altitude, 500))
+def build_map_points(north: float, south: float, east: float, west: float, zoom: int, limit: int) -> list[dict]:
+    """Map points as a list of objects, as sent to stream subscribers."""
+    return records(map_point_columns(north, south, east, west, zoom, limit))
 
 @router.get("/current", response_model=PollutionDataResponse)
 async def get_current_pollution(
@@ -60,58 +118,289 @@ async def get_current_pollution(
             detail="Either location or latitude/longitude must be provided"
         )
     
-    # Use provided coordinates or default to New Delhi
-    lat = latitude if latitude else 28.6139
-    lon = longitude if longitude else 77.2090
-    loc = location if location else "New Delhi, India"
+    row, lat, lon = resolve_station(location, latitude, longitude)
+    index = get_station_index()
+    loc = location if location else index.names[row]
+    
+    async def fetch() -> dict:
+        # The latest ingested reading of a named place, when there is one
+        if location:
+            reading = await get_database().latest_pollution(location)
+            if reading is not None:
+                return reading
+        return generate_mock_pollution_data(loc, lat, lon, float(index.column("base_pm25")[row]))
     
-    data = generate_mock_pollution_data(loc, lat, lon)
-    return PollutionDataResponse(**data)
+    key = geo_key(location, lat, lon, settings.CACHE_GEO_PRECISION)
+    data = await current_cache.get_or_fetch(key, fetch)
+    return model_response(PollutionDataResponse(**data))
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Report hit/miss/eviction counters of the current-conditions cache."""
+    return current_cache.stats()
 
 @router.get("/history")
 async def get_pollution_history(
+    request: Request,
     location: str = Query(...),
-    days: int = Query(7, ge=1, le=365)
+    days: int = Query(7, ge=1, le=3650),
+    resolution: str = Query("day", pattern="^(hour|day|month)$")
 ):
-    """Get historical pollution data for a location."""
-    history = []
+    """
+    Get historical pollution data for a location, newest first.
+    Each entry summarises one hour, day or month of readings.
+    """
+    store = get_series_registry().get(location)
+    if store is None:
+        # Not a station: a synthetic series that isn't kept in the registry
+        store = unregistered_history(location)
     
-    for i in range(days):
-        date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        date = date.replace(day=date.day - i)
-        
-        base_pm25 = random.uniform(10, 150)
-        history.append({
-            "date": date.isoformat(),
-            "pm25": round(base_pm25, 2),
-            "aqi": calculate_aqi(base_pm25),
-            "location": location
-        })
+    # Slice from the bucket holding the first requested day up to the current one
+    now = np.datetime64(datetime.now(), "s")
+    if resolution == "hour":
+        end = now.astype("datetime64[h]") + 1
+        start = end - days * 24
+    else:
+        unit = RESOLUTIONS[resolution]
+        end = now.astype(f"datetime64[{unit}]") + 1
+        start = (now.astype("datetime64[D]") - (days - 1)).astype(f"datetime64[{unit}]")
+    series = store.range(start, end, resolution)
+    
+    aqi = compute_aqi(pm25=series["pm25"])["aqi"]
+    # Missing readings are NaN, sent as null
+    columns = {
+        "date": series["time"][::-1].astype("datetime64[s]").astype(str),
+        "pm25": series["pm25"].round(2)[::-1],
+        "pm25Min": series["pm25_min"].round(2)[::-1],
+        "pm25Max": series["pm25_max"].round(2)[::-1],
+        "aqi": np.where(aqi < 0, None, aqi)[::-1],
+        "location": [location] * len(aqi),
+    }
     
-    return {"location": location, "history": history}
+    return table_response(request, {"location": location, "resolution": resolution}, "history", columns)
+
+@router.get("/features")
+async def get_location_features(location: str = Query(...)):
+    """
+    Current model features for a location: rolling PM2.5 means, lagged
+    daily AQI and seasonal encodings as of its latest reading.
+    """
+    features = get_feature_store()
+    current = features.get(location)
+    if current is None:
+        # First request for this place: seed from its stored history. Places
+        # that aren't stations are computed each time rather than tracked.
+        store = get_series_registry().get(location)
+        if store is not None:
+            current = features.seed(location, store)
+        else:
+            current = series_features(unregistered_history(location))
+    
+    hour = current.hour
+    return {
+        "location": location,
+        "asOf": str(np.datetime64(hour, "h").astype("datetime64[s]")) if hour is not None else None,
+        "features": current.as_dict()
+    }
 
 @router.get("/map")
 async def get_pollution_map(
+    request: Request,
     north: float = Query(...),
     south: float = Query(...),
     east: float = Query(...),
-    west: float = Query(...)
+    west: float = Query(...),
+    zoom: Optional[int] = Query(None, ge=0, le=20),
+    limit: int = Query(4, ge=1, le=100)
 ):
-    """Get pollution data for a map bounding box."""
-    # Generate mock data points within the bounding box
-    points = []
-    num_points = 20
-    
-    for _ in range(num_points):
-        lat = random.uniform(south, north)
-        lon = random.uniform(west, east)
-        pm25 = random.uniform(10, 150)
+    """
+    Get pollution data for the stations in a map bounding box.
+    At most `limit` stations are returned per screen cell at the given zoom
+    level (estimated from the box when omitted), worst air quality first.
+    """
+    if north < south:
+        raise HTTPException(status_code=400, detail="north must be greater than or equal to south")
+    
+    if zoom is None:
+        zoom = zoom_for_bbox(north, south, east, west)
+    columns = map_point_columns(north, south, east, west, zoom, limit)
+    
+    return table_response(
+        request,
+        {"bounds": {"north": north, "south": south, "east": east, "west": west}, "zoom": zoom},
+        "points",
+        columns
+    )
+
+@router.post("/batch")
+async def score_pollution_batch(request: PollutionBatchRequest):
+    """
+    Score a columnar batch of readings in one pass.
+    Returns the AQI, dominant pollutant and per-pollutant sub-indices for each reading.
+    """
+    readings = {p: getattr(request, p) for p in POLLUTANTS if getattr(request, p) is not None}
+    
+    try:
+        result = compute_aqi(**readings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    aqi = result["aqi"]
+    return {
+        "count": len(aqi),
+        "aqi": [None if v < 0 else v for v in aqi.tolist()],
+        "dominant": result["dominant"].tolist(),
+        "subIndices": {
+            p: [None if np.isnan(x) else x for x in v.tolist()]
+            for p, v in result["subIndices"].items()
+        }
+    }
+
+INGEST_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+@router.post("/ingest")
+async def ingest_readings(request: Request):
+    """
+    Bulk-ingest sensor readings from a CSV (with header) or NDJSON body.
+    The body is streamed and processed in batches; each batch reports how
+    many rows it accepted and which lines it rejected.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = INGEST_FORMATS.get(content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Content-Type must be one of: {', '.join(INGEST_FORMATS)}"
+        )
+    
+    header = None
+    lines: list[Optional[str]] = []
+    line_numbers: list[int] = []
+    batches: list[BatchResult] = []
+    
+    async def flush():
+        # Parsing and validation run in a worker thread; stores are only
+        # touched from the event loop
+        result, rows = await run_in_threadpool(prepare_batch, len(batches), lines, line_numbers, fmt, header)
+        if rows is not None:
+            stored = store_batch(rows, result)
+            table_rows = await run_in_threadpool(pollution_records, rows, stored)
+            await get_database().copy_pollution(table_rows)
+        batches.append(result)
+        lines.clear()
+        line_numbers.clear()
+    
+    line_number = 0
+    async for line in iter_lines(request.stream()):
+        line_number += 1
+        if line is not None and not line.strip():
+            continue
+        
+        if fmt == "csv" and header is None:
+            if line is None:
+                raise HTTPException(status_code=400, detail="CSV header is not valid UTF-8")
+            header = [name.strip() for name in next(csv.reader([line]))]
+            missing = {"location", "latitude", "longitude"} - set(header)
+            if missing:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"CSV header is missing required columns: {', '.join(sorted(missing))}"
+                )
+            continue
+        
+        lines.append(line)
+        line_numbers.append(line_number)
+        if len(lines) >= settings.INGEST_BATCH_ROWS:
+            await flush()
+    
+    if lines:
+        await flush()
+    
+    accepted = sum(batch.accepted for batch in batches)
+    return {
+        "rows": accepted + sum(batch.rejected for batch in batches),
+        "accepted": accepted,
+        "rejected": sum(batch.rejected for batch in batches),
+        "batches": [batch.to_dict() for batch in batches]
+    }
+
+def sse_frame(event: str, data: dict) -> str:
+    """Encode a server-sent event once so every subscriber can share it."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/stream")
+async def stream_pollution(
+    request: Request,
+    location: Optional[str] = Query(None),
+    latitude: Optional[float] = Query(None),
+    longitude: Optional[float] = Query(None),
+    north: Optional[float] = Query(None),
+    south: Optional[float] = Query(None),
+    east: Optional[float] = Query(None),
+    west: Optional[float] = Query(None),
+    zoom: Optional[int] = Query(None, ge=0, le=20),
+    limit: int = Query(4, ge=1, le=100)
+):
+    """
+    Stream live pollution updates as server-sent events.
+    Subscribe to a station (location or latitude/longitude) or to a map
+    bounding box; every subscriber of the same station or box shares one
+    producer.
+    """
+    bbox = (north, south, east, west)
+    
+    if north is not None and south is not None and east is not None and west is not None:
+        if north < south:
+            raise HTTPException(status_code=400, detail="north must be greater than or equal to south")
+        if zoom is None:
+            zoom = zoom_for_bbox(north, south, east, west)
+        
+        key = f"map:{north:.4f}:{south:.4f}:{east:.4f}:{west:.4f}:{zoom}:{limit}"
+        bounds = {"north": north, "south": south, "east": east, "west": west}
+        
+        def produce() -> str:
+            points = build_map_points(north, south, east, west, zoom, limit)
+            return sse_frame("map", {"bounds": bounds, "zoom": zoom, "points": points})
+    elif any(v is not None for v in bbox):
+        raise HTTPException(status_code=400, detail="north, south, east and west must all be provided")
+    elif location or (latitude is not None and longitude is not None):
+        row, lat, lon = resolve_station(location, latitude, longitude)
+        index = get_station_index()
+        name, typical_pm25 = index.names[row], float(index.column("base_pm25")[row])
+        
+        key = f"station:{index.ids[row]}"
         
-        points.append({
-            "latitude": round(lat, 4),
-            "longitude": round(lon, 4),
-            "pm25": round(pm25, 2),
-            "aqi": calculate_aqi(pm25)
-        })
-    
-    return {"bounds": {"north": north, "south": south, "east": east, "west": west}, "points": points}
+        def produce() -> str:
+            data = generate_mock_pollution_data(name, float(index.latitudes[row]), float(index.longitudes[row]), typical_pm25)
+            return sse_frame("current", data)
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="Either location, latitude/longitude or a bounding box must be provided"
+        )
+    
+    async def events():
+        async with broadcaster.subscribe(key, produce) as subscription:
+            while not await request.is_disconnected():
+                frame = await subscription.next(timeout=settings.STREAM_HEARTBEAT_SECONDS)
+                if frame is None:
+                    # Comment lines keep idle connections open through proxies
+                    yield ": keepalive\n\n"
+                else:
+                    yield frame
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stream/stats")
+async def get_stream_stats():
+    """Report live stream topics, subscribers and dropped frames."""
+    return broadcaster.stats()
@@ -1,87 +1,159 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timedelta
-from app.schemas.schemas import PredictionRequest, PredictionResponse
-import random
+from typing import Optional
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.metrics import timed
+from app.core.responses import model_response, table_response
+from app.schemas.schemas import PredictionBatchRequest, PredictionRequest, PredictionResponse
+from app.services.model import build_features, summarize, typical_pm25
+from app.services.model_server import get_model_server
+from app.services.prediction_cache import get_prediction_cache
+from app.services.prediction_pool import get_prediction_pool, predict_shard
+import numpy as np
+import asyncio
+import json
+import uuid
 
 router = APIRouter()
 
-def predict_pollution(location: str, lat: float, lon: float, target_date: datetime) -> dict:
+@timed("predict_horizon")
+async def predict_horizon(location: str, lat: float, lon: float, dates: np.ndarray) -> dict[str, np.ndarray]:
     """
-    Mock ML prediction function.
-    In production, this would use a trained TensorFlow/Keras model.
+    Predict all target dates for one location with a single batched inference.
+    Dates already cached for this cell and model version skip the model; the
+    rest run through the model server, so concurrent requests share model calls.
     """
-    # Simulate model prediction with some randomness
-    base_aqi = random.randint(50, 200)
-    base_pm25 = base_aqi * 0.5  # Rough conversion
-    
-    # Add seasonal variation
-    month = target_date.month
-    if month in [11, 12, 1, 2]:  # Winter months - higher pollution
-        base_aqi = int(base_aqi * 1.3)
-        base_pm25 = base_pm25 * 1.3
-    elif month in [6, 7, 8, 9]:  # Monsoon months - lower pollution
-        base_aqi = int(base_aqi * 0.7)
-        base_pm25 = base_pm25 * 0.7
-    
-    # Ensure values are within realistic ranges
-    predicted_aqi = min(500, max(0, base_aqi))
-    predicted_pm25 = min(500, max(0, base_pm25))
-    
-    # Simulate confidence score
-    days_ahead = (target_date - datetime.now()).days
-    confidence = max(0.5, 1.0 - (days_ahead / 365) * 0.3)  # Confidence decreases with time
-    
-    return {
-        "predictedAQI": predicted_aqi,
-        "predictedPM25": round(predicted_pm25, 2),
-        "confidence": round(confidence, 2),
-        "modelVersion": "v1.0.0-beta"
-    }
+    server = get_model_server()
+    await server.start()
+    cache = get_prediction_cache()
+    
+    dates = np.asarray(dates, dtype="datetime64[us]")
+    now = datetime.now()
+    typical = typical_pm25(lat, lon, location)
+    features = build_features(lat, lon, dates, typical, now=now)
+    pm25 = await cache.lookup(lat, lon, dates, server.version, typical, now)
+    
+    missing = np.isnan(pm25)
+    if missing.any():
+        pm25[missing] = await server.predict(features[missing])
+        cache.store(lat, lon, dates[missing], server.version, typical, pm25[missing], now)
+    
+    return summarize(pm25, features, dates)
+
+def local_datetime(value: datetime) -> datetime:
+    """Convert timezone-aware request dates to naive local time."""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo is not None else value
+
+def prediction_date_error(prediction_date: datetime) -> Optional[str]:
+    """Return why a prediction date is not allowed, or None if it is."""
+    if prediction_date <= datetime.now():
+        return "Prediction date must be in the future"
+    
+    max_date = datetime.now() + timedelta(days=365)
+    if prediction_date > max_date:
+        return "Prediction date cannot be more than 1 year in the future"
+    return None
 
 @router.post("/predict", response_model=PredictionResponse)
 async def create_prediction(request: PredictionRequest):
     """Generate pollution prediction for a specific date and location."""
     
     # Validate prediction date
-    if request.predictionDate <= datetime.now():
-        raise HTTPException(
-            status_code=400,
-            detail="Prediction date must be in the future"
-        )
-    
-    max_date = datetime.now() + timedelta(days=365)
-    if request.predictionDate > max_date:
-        raise HTTPException(
-            status_code=400,
-            detail="Prediction date cannot be more than 1 year in the future"
-        )
-    
-    # Generate prediction
-    prediction_data = predict_pollution(
-        request.location,
-        request.latitude,
-        request.longitude,
-        request.predictionDate
-    )
+    request.predictionDate = local_datetime(request.predictionDate)
+    error = prediction_date_error(request.predictionDate)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    
+    # Generate prediction; concurrent requests share one model call
+    prediction = await predict_horizon(request.location, request.latitude, request.longitude, [request.predictionDate])
+    prediction_data = {
+        "predictedAQI": int(prediction["predictedAQI"][0]),
+        "predictedPM25": float(prediction["predictedPM25"][0]),
+        "confidence": float(prediction["confidence"][0]),
+        "modelVersion": get_model_server().version
+    }
     
-    # Create response
-    response = {
-        "id": f"pred_{random.randint(1000, 9999)}",
+    # Store the prediction
+    created_at = datetime.now()
+    record = {
+        "id": f"pred_{uuid.uuid4().hex[:16]}",
         "location": request.location,
         "latitude": request.latitude,
         "longitude": request.longitude,
-        "predictionDate": request.predictionDate.isoformat(),
+        "predictionDate": request.predictionDate,
         "predictedAQI": prediction_data["predictedAQI"],
         "predictedPM25": prediction_data["predictedPM25"],
         "confidence": prediction_data["confidence"],
         "modelVersion": prediction_data["modelVersion"],
-        "createdAt": datetime.now().isoformat()
+        "createdAt": created_at
+    }
+    await get_database().insert_prediction(record)
+    
+    # Create response
+    response = {
+        **record,
+        "predictionDate": request.predictionDate.isoformat(),
+        "createdAt": created_at.isoformat()
     }
     
-    return PredictionResponse(**response)
+    return model_response(PredictionResponse.model_validate(response))
+
+@router.post("/batch")
+async def create_batch_prediction(request: PredictionBatchRequest):
+    """
+    Predict daily pollution for many locations at once.
+    Items are split into shards that run on a process pool; results stream
+    back as NDJSON, one line per item, as each shard finishes.
+    """
+    if len(request.items) > settings.PREDICTION_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.PREDICTION_BATCH_MAX_ITEMS} items can be predicted per request"
+        )
+    
+    jobs = []
+    for i, item in enumerate(request.items):
+        start = local_datetime(item.startDate)
+        end = local_datetime(item.endDate) if item.endDate is not None else start
+        for field, value in (("startDate", start), ("endDate", end)):
+            error = prediction_date_error(value)
+            if error:
+                raise HTTPException(status_code=400, detail=f"items[{i}].{field}: {error}")
+        if end < start:
+            raise HTTPException(status_code=400, detail=f"items[{i}]: endDate must not precede startDate")
+        
+        jobs.append({
+            "index": i,
+            "location": item.location,
+            "latitude": item.latitude,
+            "longitude": item.longitude,
+            "typical": typical_pm25(item.latitude, item.longitude, item.location),
+            "start": start.date().isoformat(),
+            "days": (end.date() - start.date()).days + 1,
+        })
+    
+    size = settings.PREDICTION_BATCH_SHARD_SIZE
+    shards = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+    
+    async def results():
+        loop = asyncio.get_running_loop()
+        pool = get_prediction_pool()
+        pending = [loop.run_in_executor(pool, predict_shard, shard) for shard in shards]
+        try:
+            for shard in asyncio.as_completed(pending):
+                yield "".join(json.dumps(result) + "\n" for result in await shard)
+        finally:
+            # Client went away: drop shards that haven't started
+            for future in pending:
+                future.cancel()
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 
 @router.get("/forecast")
 async def get_forecast(
+    request: Request,
     location: str,
     latitude: float,
     longitude: float,
@@ -95,29 +167,28 @@ async def get_forecast(
             detail="Days must be between 1 and 365"
         )
     
-    forecast = []
-    current_date = datetime.now()
+    # One inference covers the whole horizon
+    current_date = np.datetime64(datetime.now(), "us")
+    dates = current_date + (np.arange(days) + 1).astype("timedelta64[D]")
+    prediction = await predict_horizon(location, latitude, longitude, dates)
     
-    for i in range(days):
-        target_date = current_date + timedelta(days=i+1)
-        prediction = predict_pollution(location, latitude, longitude, target_date)
-        
-        forecast.append({
-            "date": target_date.isoformat(),
-            "predictedAQI": prediction["predictedAQI"],
-            "predictedPM25": prediction["predictedPM25"],
-            "confidence": prediction["confidence"]
-        })
-    
-    return {
-        "location": location,
-        "latitude": latitude,
-        "longitude": longitude,
-        "forecast": forecast
+    columns = {
+        "date": [date.isoformat() for date in dates.tolist()],
+        "predictedAQI": prediction["predictedAQI"],
+        "predictedPM25": prediction["predictedPM25"],
+        "confidence": prediction["confidence"],
     }
+    
+    return table_response(
+        request,
+        {"location": location, "latitude": latitude, "longitude": longitude},
+        "forecast",
+        columns
+    )
 
 @router.get("/yearly")
 async def get_yearly_prediction(
+    request: Request,
     location: str,
     latitude: float,
     longitude: float,
@@ -131,23 +202,29 @@ async def get_yearly_prediction(
             detail="Currently only 2026 predictions are supported"
         )
     
-    monthly_predictions = []
-    
-    for month in range(1, 13):
-        target_date = datetime(year, month, 15)  # Middle of each month
-        prediction = predict_pollution(location, latitude, longitude, target_date)
-        
-        monthly_predictions.append({
-            "month": month,
-            "year": year,
-            "date": target_date.isoformat(),
-            "predictedAQI": prediction["predictedAQI"],
-            "predictedPM25": prediction["predictedPM25"],
-            "confidence": prediction["confidence"]
-        })
-    
-    return {
-        "location": location,
-        "year": year,
-        "predictions": monthly_predictions
+    # Middle of each month, all twelve in one inference
+    months = np.arange(1, 13)
+    starts = np.datetime64(f"{year}-01", "M") + (months - 1).astype("timedelta64[M]")
+    dates = starts.astype("datetime64[D]") + np.timedelta64(14, "D")
+    prediction = await predict_horizon(location, latitude, longitude, dates)
+    
+    columns = {
+        "month": months,
+        "year": np.full(len(months), year),
+        "date": [datetime.combine(date, datetime.min.time()).isoformat() for date in dates.tolist()],
+        "predictedAQI": prediction["predictedAQI"],
+        "predictedPM25": prediction["predictedPM25"],
+        "confidence": prediction["confidence"],
     }
+    
+    return table_response(request, {"location": location, "year": year}, "predictions", columns)
+
+@router.get("/stats")
+async def get_model_stats():
+    """Micro-batching metrics for the prediction model."""
+    return get_model_server().stats()
+
+@router.get("/cache/stats")
+async def get_prediction_cache_stats():
+    """Hit/miss counters for the prediction cache."""
+    return get_prediction_cache().stats()
@@ -1,87 +1,114 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
 from datetime import datetime
-from app.schemas.schemas import SimulationRequest, SimulationResponse, TreePlacement
-import random
+from typing import Optional
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.metrics import timed
+from app.core.negotiation import choose_media_type
+from app.core.responses import ORJSONResponse, model_response
+from app.schemas.schemas import (
+    DispersionRequest,
+    Distribution,
+    SimulationRequest,
+    SimulationResponse,
+    SweepRange,
+    SweepRequest,
+)
+from app.services.aqi import concentration
+from app.services.dispersion import run_dispersion, tree_counts
+from app.services.impact import MAX_TREES_PER_KM2, bio_urban_trees, projected_reduction
+from app.services.jobs import Progress, register_job
+from app.services.placement import (
+    ARROW,
+    GEOJSON,
+    PACKED,
+    PLACEMENT_MEDIA_TYPES,
+    STRATEGIES,
+    area_extent,
+    grid_placements,
+    optimized_placements,
+    pack_placements,
+    placements_arrow,
+    placements_from_json,
+    placements_geojson,
+    placements_to_dicts,
+    pollution_raster,
+)
+from app.services.sweep import DISTRIBUTIONS, evaluate_scenarios, get_sweep_pool, pareto_frontier
+import numpy as np
+import asyncio
 import math
+import time
 import json
+import uuid
 
 router = APIRouter()
 
-def calculate_bio_urban_trees(current_aqi: int, current_pi: float, area: float) -> int:
+# Decoded placement coordinates per simulation id; simulations never change
+placement_cache = TTLCache(settings.PLACEMENT_CACHE_MAX_ENTRIES, 3600)
+
+# Dispersion results: JSON with the AQI raster, or the raw raster as little-endian uint16
+DISPERSION_MEDIA_TYPES = ("application/json", PACKED)
+
+def calculate_bio_urban_trees(current_aqi: float, current_pi: float, area: float) -> int:
     """
     Calculate number of bio-urban trees needed.
     Bio-urban trees are 10x more effective than regular trees.
     """
-    # Formula: trees_needed = (pollution_index * area) / tree_effectiveness
-    # One bio-urban tree can clean approximately 100 units of pollution per day
-    tree_effectiveness = 100
-    
-    # Use pollution index and AQI to determine severity
-    pollution_severity = (current_pi + current_aqi) / 2
-    
-    trees_needed = math.ceil((pollution_severity * area) / tree_effectiveness)
-    
-    # Ensure minimum of 1 tree and maximum practical limit
-    return max(1, min(trees_needed, int(area * 100)))  # Max 100 trees per sq km
+    return int(bio_urban_trees(current_aqi, current_pi, area))
 
 def calculate_projected_reduction(trees: int, current_aqi: int, area: float) -> tuple[float, int]:
     """
     Calculate the projected pollution reduction from bio-urban trees.
     Returns: (reduction_percentage, projected_aqi)
     """
-    # Each tree reduces pollution by a certain percentage
-    # Bio-urban trees are 10x more effective (each tree = ~0.5% reduction per sq km)
-    reduction_per_tree = 0.5 / area if area > 0 else 0.5
-    
-    total_reduction = min(trees * reduction_per_tree, 70)  # Cap at 70% reduction
-    
-    projected_aqi = max(0, int(current_aqi * (1 - total_reduction / 100)))
-    
-    return round(total_reduction, 2), projected_aqi
+    total_reduction, projected_aqi = projected_reduction(trees, current_aqi, area)
+    return round(float(total_reduction), 2), int(projected_aqi)
 
-def generate_tree_placements(latitude: float, longitude: float, trees: int, area: float) -> list[dict]:
+@timed("generate_tree_placements")
+def generate_tree_placements(
+    latitude: float,
+    longitude: float,
+    trees: int,
+    area: float,
+    strategy: str = "grid"
+) -> tuple[np.ndarray, np.ndarray]:
     """
-    Generate strategic tree placements within the area.
-    Trees are placed in a grid pattern for optimal coverage.
+    Generate tree coordinates within the area, rounded as they are stored.
+    The optimized strategy follows the area's pollution; grid spreads trees evenly.
     """
-    placements = []
-    
-    # Calculate grid dimensions based on area
-    grid_size = math.ceil(math.sqrt(trees))
-    
-    # Calculate degree offset based on area (rough approximation)
-    # 1 degree ≈ 111 km
-    offset = math.sqrt(area) / 111 / grid_size
-    
-    for i in range(grid_size):
-        for j in range(grid_size):
-            if len(placements) >= trees:
-                break
-            
-            # Add some randomness to avoid perfect grid
-            lat_offset = (i - grid_size/2) * offset + random.uniform(-offset/4, offset/4)
-            lon_offset = (j - grid_size/2) * offset + random.uniform(-offset/4, offset/4)
-            
-            placements.append({
-                "latitude": round(latitude + lat_offset, 6),
-                "longitude": round(longitude + lon_offset, 6),
-                "treeCount": 1
-            })
+    if strategy == "grid":
+        lats, lons = grid_placements(latitude, longitude, trees, area)
+    else:
+        placed = optimized_placements(
+            latitude,
+            longitude,
+            trees,
+            area,
+            settings.PLACEMENT_RASTER_SIZE,
+            settings.PLACEMENT_TIME_BUDGET_MS / 1000
+        )
+        lats, lons = placed["latitudes"], placed["longitudes"]
     
-    return placements
+    return np.round(lats, 6), np.round(lons, 6)
 
-@router.post("/simulate", response_model=SimulationResponse)
-async def create_simulation(request: SimulationRequest):
-    """
-    Simulate bio-urban tree planting and its impact on pollution.
-    """
-    # Validate input
+def validate_simulation_request(request: SimulationRequest) -> None:
     if request.area <= 0:
         raise HTTPException(status_code=400, detail="Area must be positive")
     
     if request.currentAQI < 0 or request.currentAQI > 500:
         raise HTTPException(status_code=400, detail="AQI must be between 0 and 500")
     
+    if request.placementStrategy not in STRATEGIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"placementStrategy must be one of: {', '.join(STRATEGIES)}"
+        )
+
+async def run_simulation(request: SimulationRequest, progress: Optional[Progress] = None) -> dict:
+    """Size, place and store a simulation; returns the response fields."""
     # Calculate number of trees needed
     trees_needed = calculate_bio_urban_trees(
         request.currentAQI,
@@ -96,17 +123,27 @@ async def create_simulation(request: SimulationRequest):
         request.area
     )
     
-    # Generate tree placements
-    tree_placements = generate_tree_placements(
+    if progress:
+        progress(0.1, f"Placing {trees_needed} trees")
+    
+    # Generate tree placements off the event loop; large areas take up to the time budget
+    lats, lons = await asyncio.get_running_loop().run_in_executor(
+        None,
+        generate_tree_placements,
         request.latitude,
         request.longitude,
         trees_needed,
-        request.area
+        request.area,
+        request.placementStrategy
     )
     
-    # Create response
-    response = {
-        "id": f"sim_{random.randint(1000, 9999)}",
+    if progress:
+        progress(0.8, "Storing simulation")
+    
+    # Store the simulation
+    created_at = datetime.now()
+    record = {
+        "id": f"sim_{uuid.uuid4().hex[:16]}",
         "location": request.location,
         "latitude": request.latitude,
         "longitude": request.longitude,
@@ -116,11 +153,207 @@ async def create_simulation(request: SimulationRequest):
         "treesNeeded": trees_needed,
         "projectedReduction": reduction_percentage,
         "projectedAQI": projected_aqi,
-        "treePlacements": json.dumps(tree_placements),
-        "createdAt": datetime.now().isoformat()
+        "treePlacements": json.dumps(placements_to_dicts(lats, lons)),
+        "createdAt": created_at
+    }
+    await get_database().insert_simulation(record)
+    placement_cache.set(record["id"], (lats, lons))
+    
+    return {
+        **record,
+        "placementsUrl": f"{settings.API_V1_STR}/simulation/{record['id']}/placements",
+        "placementStrategy": request.placementStrategy,
+        "createdAt": created_at.isoformat()
+    }
+
+@router.post("/simulate", response_model=SimulationResponse)
+async def create_simulation(
+    request: SimulationRequest,
+    inline_placements: bool = Query(True, description="Include the treePlacements string in the response")
+):
+    """
+    Simulate bio-urban tree planting and its impact on pollution.
+    Placements are also served by GET /{id}/placements in compact formats.
+    Large areas can run in the background as a "simulation" job (/api/jobs).
+    """
+    validate_simulation_request(request)
+    
+    response = await run_simulation(request)
+    if not inline_placements:
+        response["treePlacements"] = None
+    
+    return model_response(SimulationResponse(**response))
+
+async def simulation_job(request: SimulationRequest, progress: Progress) -> dict:
+    response = await run_simulation(request, progress)
+    # Job results point at the placements sub-resource instead of inlining them
+    return {**response, "treePlacements": None}
+
+def compute_dispersion(request: DispersionRequest, lats: np.ndarray, lons: np.ndarray) -> tuple[np.ndarray, dict]:
+    """
+    Projected AQI raster for a set of trees. The baseline field follows the
+    stations' typical levels across the area, scaled so its mean matches the
+    request's current AQI.
+    """
+    size = request.gridSize
+    _, _, intensity = pollution_raster(request.latitude, request.longitude, request.area, size)
+    baseline = intensity / intensity.mean() * concentration("pm25", request.currentAQI)[0]
+    trees = tree_counts(lats, lons, request.latitude, request.longitude, request.area, size)
+    
+    workers = settings.DISPERSION_WORKERS if size >= settings.DISPERSION_PARALLEL_MIN_GRID else 1
+    return run_dispersion(
+        baseline,
+        trees,
+        math.sqrt(request.area) / size,
+        request.windSpeed,
+        request.windDirection,
+        workers
+    )
+
+def validate_dispersion_request(request: DispersionRequest) -> None:
+    validate_simulation_request(request)
+    if not 8 <= request.gridSize <= settings.DISPERSION_MAX_GRID_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"gridSize must be between 8 and {settings.DISPERSION_MAX_GRID_SIZE}"
+        )
+
+async def run_dispersion_request(request: DispersionRequest, progress: Optional[Progress] = None) -> dict:
+    """
+    Place the trees and disperse. Returns the AQI raster (rows north to
+    south), its summary and bounds, and the number of trees.
+    """
+    loop = asyncio.get_running_loop()
+    if request.simulationId:
+        lats, lons = await load_placements(request.simulationId)
+    else:
+        trees_needed = calculate_bio_urban_trees(request.currentAQI, request.currentPI, request.area)
+        lats, lons = await loop.run_in_executor(
+            None,
+            generate_tree_placements,
+            request.latitude,
+            request.longitude,
+            trees_needed,
+            request.area,
+            request.placementStrategy
+        )
+    
+    if progress:
+        progress(0.2, f"Dispersing over a {request.gridSize}x{request.gridSize} grid")
+    raster, summary = await loop.run_in_executor(None, compute_dispersion, request, lats, lons)
+    
+    lat_half, lon_half = area_extent(request.latitude, request.longitude, request.area)
+    bounds = [
+        round(request.latitude - lat_half, 6),
+        round(request.longitude - lon_half, 6),
+        round(request.latitude + lat_half, 6),
+        round(request.longitude + lon_half, 6)
+    ]
+    return {"raster": raster, "summary": summary, "bounds": bounds, "trees": len(lats)}
+
+def dispersion_json(request: DispersionRequest, result: dict) -> dict:
+    return {
+        "location": request.location,
+        "treesPlanted": result["trees"],
+        "gridSize": request.gridSize,
+        "cellSizeKm": round(math.sqrt(request.area) / request.gridSize, 4),
+        "bounds": dict(zip(("south", "west", "north", "east"), result["bounds"])),
+        "windSpeed": request.windSpeed,
+        "windDirection": request.windDirection,
+        "summary": result["summary"],
+        "aqiRaster": result["raster"].tolist()
     }
+
+@router.post("/dispersion")
+async def simulate_dispersion(request: DispersionRequest, http_request: Request):
+    """
+    Model the area as a grid and project the AQI of every cell, with trees as
+    pollution sinks and wind spreading their effect downwind.
+    Trees come from a stored simulation when simulationId is given, otherwise
+    they are sized and placed as /simulate would.
+    """
+    validate_dispersion_request(request)
+    
+    media_type = choose_media_type(http_request.headers.get("accept"), DISPERSION_MEDIA_TYPES)
+    if media_type is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Dispersion results are available as: {', '.join(DISPERSION_MEDIA_TYPES)}"
+        )
     
-    return SimulationResponse(**response)
+    result = await run_dispersion_request(request)
+    
+    if media_type == PACKED:
+        headers = {
+            "X-Grid-Size": str(request.gridSize),
+            "X-Bounds": ",".join(str(b) for b in result["bounds"]),
+            "X-Summary": json.dumps(result["summary"], separators=(",", ":")),
+            "Vary": "Accept"
+        }
+        return Response(result["raster"].astype("<u2").tobytes(), media_type=PACKED, headers=headers)
+    
+    # Returned directly: the generic encoder is slow on million-cell rasters
+    return ORJSONResponse(dispersion_json(request, result))
+
+async def dispersion_job(request: DispersionRequest, progress: Progress) -> dict:
+    return dispersion_json(request, await run_dispersion_request(request, progress))
+
+async def load_placements(simulation_id: str) -> tuple[np.ndarray, np.ndarray]:
+    """Coordinates of a stored simulation's trees, decoded once and cached."""
+    async def fetch() -> tuple[np.ndarray, np.ndarray]:
+        simulation = await get_database().get_simulation(simulation_id)
+        if simulation is None:
+            raise HTTPException(status_code=404, detail="Simulation not found")
+        return placements_from_json(simulation["treePlacements"])
+    
+    return await placement_cache.get_or_fetch(simulation_id, fetch)
+
+@router.get("/{simulation_id}/placements")
+async def get_tree_placements(
+    simulation_id: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    format: Optional[str] = Query(None, description="Media type overriding the Accept header")
+):
+    """
+    Tree placements of a simulation, negotiated on the Accept header:
+    paged JSON (default), GeoJSON, packed float32 pairs or an Arrow stream.
+    JSON pages default to PLACEMENT_PAGE_SIZE; other formats return every
+    placement from `offset` unless `limit` is given.
+    """
+    media_type = choose_media_type(format or request.headers.get("accept"), PLACEMENT_MEDIA_TYPES)
+    if media_type is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Placements are available as: {', '.join(PLACEMENT_MEDIA_TYPES)}"
+        )
+    
+    lats, lons = await load_placements(simulation_id)
+    total = len(lats)
+    if media_type == "application/json":
+        limit = min(limit or settings.PLACEMENT_PAGE_SIZE, settings.PLACEMENT_PAGE_MAX)
+    end = total if limit is None else min(offset + limit, total)
+    lats, lons = lats[offset:end], lons[offset:end]
+    headers = {"X-Total-Count": str(total), "Vary": "Accept"}
+    
+    if media_type == GEOJSON:
+        geojson = placements_geojson(lats, lons, {"simulationId": simulation_id})
+        return ORJSONResponse(geojson, media_type=GEOJSON, headers=headers)
+    if media_type == PACKED:
+        return Response(pack_placements(lats, lons), media_type=PACKED, headers=headers)
+    if media_type == ARROW:
+        return Response(placements_arrow(lats, lons), media_type=ARROW, headers=headers)
+    
+    next_offset = end if end < total else None
+    return ORJSONResponse({
+        "simulationId": simulation_id,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "nextOffset": next_offset,
+        "placements": placements_to_dicts(lats, lons)
+    }, headers=headers)
 
 @router.get("/recommendations")
 async def get_tree_recommendations(
@@ -171,12 +404,150 @@ async def get_tree_recommendations(
         },
         "benefits": [
             f"Reduce AQI from {current_aqi} to ~{projected_aqi}",
-            f"10x more effective than traditional trees",
+            "10x more effective than traditional trees",
             f"Clean air for ~{int(area * 10000)} people",
             "Minimal water and maintenance required"
         ]
     }
 
+def distribution_error(name: str, spec: Distribution) -> Optional[str]:
+    """Why a distribution can't be sampled, or None when it can."""
+    if spec.distribution not in DISTRIBUTIONS:
+        return f"{name}.distribution must be one of: {', '.join(DISTRIBUTIONS)}"
+    if spec.distribution == "uniform":
+        if spec.low is None or spec.high is None or spec.low > spec.high:
+            return f"{name} needs low <= high for a uniform distribution"
+        return None
+    if spec.mean is None:
+        return f"{name}.mean is required"
+    if spec.distribution != "fixed" and (spec.std is None or spec.std < 0):
+        return f"{name}.std must be zero or more"
+    if spec.distribution == "lognormal" and spec.mean <= 0:
+        return f"{name}.mean must be positive for a lognormal distribution"
+    return None
+
+def distribution_mean(spec: Distribution) -> float:
+    # NaN for specs distribution_error refuses
+    if spec.distribution == "uniform" and spec.low is not None and spec.high is not None:
+        return (spec.low + spec.high) / 2
+    return spec.mean if spec.mean is not None else math.nan
+
+def sweep_grid(request: SweepRequest) -> tuple[np.ndarray, np.ndarray, list[int]]:
+    """Areas and tree counts of every scenario, and each area's recommended count."""
+    # The count /recommendations would give each area is always part of the sweep
+    mean_aqi = distribution_mean(request.currentAQI)
+    current_pi = request.currentPI if request.currentPI is not None else mean_aqi * 0.5
+    recommended = [calculate_bio_urban_trees(mean_aqi, current_pi, area) for area in request.areas]
+    
+    areas, trees = [], []
+    for area, count in zip(request.areas, recommended):
+        span = request.treeCounts or SweepRange(min=1, max=max(1, int(area * MAX_TREES_PER_KM2)))
+        steps = np.linspace(span.min, span.max, span.steps if span.max > span.min else 1)
+        counts = np.unique(np.r_[np.round(steps), count]).astype(np.int64)
+        areas.append(np.full(len(counts), area))
+        trees.append(counts)
+    return np.concatenate(areas), np.concatenate(trees), recommended
+
+def validate_sweep_request(request: SweepRequest) -> None:
+    for name, spec in (("currentAQI", request.currentAQI), ("effectiveness", request.effectiveness)):
+        error = distribution_error(name, spec)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+    
+    if min(request.areas) <= 0:
+        raise HTTPException(status_code=400, detail="Areas must be positive")
+    
+    if request.treeCounts is not None and request.treeCounts.min > request.treeCounts.max:
+        raise HTTPException(status_code=400, detail="treeCounts.min must not exceed treeCounts.max")
+    
+    if request.samples > settings.SWEEP_MAX_SAMPLES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.SWEEP_MAX_SAMPLES} samples per scenario")
+    
+    scenarios = len(sweep_grid(request)[1])
+    if scenarios > settings.SWEEP_MAX_SCENARIOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"The sweep has {scenarios} scenarios; at most {settings.SWEEP_MAX_SCENARIOS} are allowed"
+        )
+
+async def run_sweep(request: SweepRequest, progress: Optional[Progress] = None) -> dict:
+    """Evaluate a validated sweep; returns the response body."""
+    started = time.perf_counter()
+    areas, trees, recommended = sweep_grid(request)
+    
+    # One seed for every shard, so all scenarios see the same draws
+    seed = request.seed if request.seed is not None else int(np.random.SeedSequence().generate_state(1)[0])
+    spec = {
+        "currentAQI": request.currentAQI.model_dump(),
+        "effectiveness": request.effectiveness.model_dump(),
+        "samples": request.samples,
+        "seed": seed,
+        "confidence": request.confidence,
+    }
+    
+    loop = asyncio.get_running_loop()
+    pool = get_sweep_pool()
+    size = settings.SWEEP_SHARD_SCENARIOS
+    pending = [
+        loop.run_in_executor(pool, evaluate_scenarios, areas[i:i + size], trees[i:i + size], spec)
+        for i in range(0, len(trees), size)
+    ]
+    if progress:
+        done = 0
+        
+        def shard_done(_) -> None:
+            nonlocal done
+            done += 1
+            progress(done / len(pending) * 0.95, f"{done} of {len(pending)} shards evaluated")
+        
+        for future in pending:
+            future.add_done_callback(shard_done)
+    try:
+        shards = await asyncio.gather(*pending)
+    finally:
+        # Cancelled: drop shards that haven't started
+        for future in pending:
+            future.cancel()
+    stats = {name: np.concatenate([shard[name] for shard in shards]) for name in shards[0]}
+    
+    cost = trees * request.costPerTree
+    frontier = pareto_frontier(cost, stats["meanReduction"])
+    
+    columns = {
+        "area": areas.tolist(),
+        "trees": trees.tolist(),
+        "cost": np.round(cost, 2).tolist(),
+        "annualMaintenance": np.round(cost * 0.1, 2).tolist(),
+        **{name: np.round(values, 2).tolist() for name, values in stats.items()}
+    }
+    scenarios = [dict(zip(columns, row)) for row in zip(*columns.values())]
+    
+    return {
+        "location": request.location,
+        "seed": seed,
+        "samples": request.samples,
+        "confidence": request.confidence,
+        "recommended": [
+            {"area": area, "trees": count} for area, count in zip(request.areas, recommended)
+        ],
+        "scenarioCount": len(scenarios),
+        "scenarios": scenarios,
+        "paretoFrontier": frontier.tolist(),
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+@router.post("/sweep")
+async def sweep_scenarios(request: SweepRequest):
+    """
+    Evaluate many tree counts and areas under uncertainty.
+    Every scenario is scored on the same Monte Carlo draws with the formulas
+    behind /simulate and /recommendations, in shards on a process pool.
+    Returns confidence bands per scenario and the cost/reduction Pareto frontier.
+    """
+    validate_sweep_request(request)
+    # Returned directly: the generic encoder is slow on thousands of scenarios
+    return ORJSONResponse(await run_sweep(request))
+
 def get_aqi_category(aqi: int) -> str:
     """Get AQI category name."""
     if aqi <= 50:
@@ -191,3 +562,8 @@ def get_aqi_category(aqi: int) -> str:
         return "Very Unhealthy"
     else:
         return "Hazardous"
+
+# Heavy runs can also be submitted to /api/jobs and polled
+register_job("simulation", SimulationRequest, simulation_job, validate_simulation_request)
+register_job("dispersion", DispersionRequest, dispersion_job, validate_dispersion_request)
+register_job("sweep", SweepRequest, run_sweep, validate_sweep_request)
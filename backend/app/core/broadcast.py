@@ -0,0 +1,93 @@
+"""
+Fan-out hub for live update streams.
+
+Each topic has exactly one producer task that computes a frame every
+interval and pushes it to all of the topic's subscribers. Subscriber queues
+are bounded: when a slow consumer falls behind, its oldest frames are
+dropped so it always receives the freshest data.
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """Bounded frame queue owned by one client."""
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def push(self, frame: Any) -> None:
+        """Enqueue a frame, discarding the oldest one when the queue is full."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """Wait for the next frame; returns None if the timeout expires first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class _Topic:
+    def __init__(self, produce: Callable[[], Any]):
+        self.produce = produce
+        self.subscribers: set[Subscription] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.frames = 0
+
+class Broadcaster:
+    """Runs one producer per topic while the topic has subscribers."""
+
+    def __init__(self, interval: float, queue_size: int):
+        self.interval = interval
+        self.queue_size = queue_size
+        self._topics: dict[str, _Topic] = {}
+
+    async def _run(self, key: str, topic: _Topic) -> None:
+        while True:
+            try:
+                frame = topic.produce()
+            except Exception:
+                logger.exception("Producer for %s failed", key)
+            else:
+                topic.frames += 1
+                for subscription in topic.subscribers:
+                    subscription.push(frame)
+            await asyncio.sleep(self.interval)
+
+    @asynccontextmanager
+    async def subscribe(self, key: str, produce: Callable[[], Any]) -> AsyncIterator[Subscription]:
+        """
+        Subscribe to a topic for the duration of the context.
+        The producer is only used if this is the topic's first subscriber.
+        """
+        topic = self._topics.get(key)
+        if topic is None:
+            topic = self._topics[key] = _Topic(produce)
+            topic.task = asyncio.create_task(self._run(key, topic))
+
+        subscription = Subscription(self.queue_size)
+        topic.subscribers.add(subscription)
+        try:
+            yield subscription
+        finally:
+            topic.subscribers.discard(subscription)
+            if not topic.subscribers:
+                if topic.task is not None:
+                    topic.task.cancel()
+                del self._topics[key]
+
+    def stats(self) -> dict:
+        """Report active topics, subscribers and frames produced."""
+        return {
+            "topics": len(self._topics),
+            "subscribers": sum(len(t.subscribers) for t in self._topics.values()),
+            "framesProduced": sum(t.frames for t in self._topics.values()),
+            "framesDropped": sum(s.dropped for t in self._topics.values() for s in t.subscribers),
+        }
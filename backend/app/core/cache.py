@@ -0,0 +1,179 @@
+"""
+In-process TTL/LRU cache with request coalescing.
+
+Entries expire after a TTL and the least recently used ones are evicted when
+the cache exceeds its entry or memory budget. Concurrent misses for the same
+key share a single upstream fetch.
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+import asyncio
+import sys
+import time
+
+MISSING = object()
+
+class _FetchAbandoned(Exception):
+    """The request fetching a value was cancelled; one of its waiters fetches it instead."""
+
+def approximate_size(value: Any) -> int:
+    """Estimate the memory held by a value, following dicts, lists and tuples."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approximate_size(v) for v in value)
+    return size
+
+def geo_key(location: Optional[str], lat: float, lon: float, precision: int) -> tuple:
+    """Bucket a request onto a lat/lon grid cell with `precision` decimal places."""
+    return (
+        (location or "").strip().lower(),
+        round(lat, precision),
+        round(lon, precision),
+    )
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a TTL."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = approximate_size
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries: OrderedDict[Hashable, tuple[Any, float, int]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return a live entry and mark it recently used, or `default`."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting least recently used entries to stay within budget."""
+        if key in self._entries:
+            self._remove(key)
+
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at, size)
+        self.bytes += size
+
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes > self.max_bytes and len(self._entries) > 1
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """Drop an entry; returns whether it was present."""
+        if key not in self._entries:
+            return False
+        self._remove(key)
+        return True
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept."""
+        self._entries.clear()
+        self.bytes = 0
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Return the cached value for a key, fetching it on a miss.
+        Concurrent misses for the same key wait on one shared fetch; if the
+        request running it is cancelled, a waiter takes the fetch over.
+        """
+        while True:
+            value = self.get(key)
+            if value is not MISSING:
+                return value
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                return await self._fetch(key, fetch, ttl)
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except _FetchAbandoned:
+                continue
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: Optional[float]) -> Any:
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            # Only this request was cancelled, not the ones waiting on it
+            future.set_exception(_FetchAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        """Report size and hit/miss/eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "bytes": self.bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
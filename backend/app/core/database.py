@@ -0,0 +1,343 @@
+"""
+Async data-access layer.
+
+`PostgresDatabase` runs the hot queries over a pooled asyncpg connection set
+created once in the application lifespan. Every query below is issued with
+identical text, so asyncpg's per-connection statement cache turns each one
+into a server-side prepared statement after its first use. Bulk writes go
+through COPY. `MemoryDatabase` implements the same interface in process so
+the API runs, and can be tested, without a Postgres server. Its rows live in
+one process, so only Postgres is shared by the workers of the pre-fork
+server.
+
+Tables are the ones managed by the Prisma schema in frontend/prisma.
+"""
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from typing import Any, Optional, Sequence
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+POLLUTION_COLUMNS = (
+    "id", "location", "latitude", "longitude", "date",
+    "pm25", "pm10", "no2", "o3", "co", "temperature", "humidity",
+    "aqi", "pollutionIndex", "source", "createdAt", "updatedAt",
+)
+
+PREDICTION_COLUMNS = (
+    "id", "location", "latitude", "longitude", "predictionDate",
+    "predictedAQI", "predictedPM25", "confidence", "modelVersion", "createdAt",
+)
+
+SIMULATION_COLUMNS = (
+    "id", "location", "latitude", "longitude", "area", "currentAQI", "currentPI",
+    "treesNeeded", "projectedReduction", "projectedAQI", "treePlacements", "createdAt",
+)
+
+USER_COLUMNS = (
+    "id", "name", "email", "password", "role", "isResearcher", "createdAt", "updatedAt",
+)
+
+def _insert(table: str, columns: Sequence[str]) -> str:
+    names = ", ".join(f'"{c}"' for c in columns)
+    params = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+    return f'INSERT INTO "{table}" ({names}) VALUES ({params})'
+
+QUERIES = {
+    "latest_pollution": (
+        'SELECT * FROM "PollutionData" WHERE "location" = $1 ORDER BY "date" DESC LIMIT 1'
+    ),
+    "insert_prediction": _insert("Prediction", PREDICTION_COLUMNS),
+    "insert_simulation": _insert("Simulation", SIMULATION_COLUMNS),
+    "get_simulation": 'SELECT * FROM "Simulation" WHERE "id" = $1',
+    "get_user": 'SELECT * FROM "User" WHERE "id" = $1',
+    "get_user_by_email": 'SELECT * FROM "User" WHERE "email" = $1',
+    "insert_user": _insert("User", USER_COLUMNS) + ' ON CONFLICT ("email") DO NOTHING',
+    "update_user_password": 'UPDATE "User" SET "password" = $2, "updatedAt" = $3 WHERE "id" = $1',
+    "revoke_token": (
+        'INSERT INTO "RevokedToken" ("digest", "expiresAt", "createdAt") VALUES ($1, $2, $3) '
+        'ON CONFLICT ("digest") DO NOTHING'
+    ),
+    "purge_revoked_tokens": 'DELETE FROM "RevokedToken" WHERE "expiresAt" <= $1',
+    "revoked_tokens": (
+        'SELECT "digest", "expiresAt", "createdAt" FROM "RevokedToken" '
+        'WHERE "createdAt" >= $1 AND "expiresAt" > $2 ORDER BY "createdAt"'
+    ),
+}
+
+class Database(ABC):
+    """Interface shared by the Postgres and in-memory backends."""
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def latest_pollution(self, location: str) -> Optional[dict]:
+        """The most recent stored reading of a location, as a POLLUTION_COLUMNS dict."""
+
+    @abstractmethod
+    async def copy_pollution(self, records: Sequence[tuple]) -> int:
+        """Bulk-write rows ordered as POLLUTION_COLUMNS; returns the row count."""
+
+    @abstractmethod
+    async def insert_prediction(self, record: dict) -> None:
+        ...
+
+    @abstractmethod
+    async def insert_simulation(self, record: dict) -> None:
+        ...
+
+    @abstractmethod
+    async def get_simulation(self, simulation_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def insert_user(self, record: dict) -> bool:
+        """Store a USER_COLUMNS dict; False, storing nothing, when the email is taken."""
+
+    @abstractmethod
+    async def update_user_password(self, user_id: str, password: str) -> None:
+        ...
+
+    @abstractmethod
+    async def revoke_token(self, digest: str, expires_at: datetime) -> None:
+        """Record a revoked token by digest until it expires (UTC)."""
+
+    @abstractmethod
+    async def revoked_tokens(self, since: datetime) -> list[dict]:
+        """Unexpired revocations recorded at or after a time (UTC), oldest first."""
+
+    def stats(self) -> dict:
+        return {"backend": type(self).__name__}
+
+class PostgresDatabase(Database):
+    """asyncpg connection pool."""
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int,
+        max_size: int,
+        statement_cache_size: int,
+        command_timeout: float,
+        max_inactive_lifetime: float
+    ):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self.command_timeout = command_timeout
+        self.max_inactive_lifetime = max_inactive_lifetime
+        # An asyncpg pool once connected
+        self.pool: Any = None
+
+    async def connect(self) -> None:
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            statement_cache_size=self.statement_cache_size,
+            command_timeout=self.command_timeout,
+            max_inactive_connection_lifetime=self.max_inactive_lifetime,
+        )
+        logger.info("Connected to Postgres (pool %d-%d)", self.min_size, self.max_size)
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _fetch(self, name: str, *args) -> list[dict]:
+        rows = await self.pool.fetch(QUERIES[name], *args)
+        return [dict(row) for row in rows]
+
+    async def _fetchrow(self, name: str, *args) -> Optional[dict]:
+        row = await self.pool.fetchrow(QUERIES[name], *args)
+        return dict(row) if row is not None else None
+
+    async def _execute(self, name: str, *args) -> None:
+        await self.pool.execute(QUERIES[name], *args)
+
+    async def latest_pollution(self, location: str) -> Optional[dict]:
+        return await self._fetchrow("latest_pollution", location)
+
+    async def copy_pollution(self, records: Sequence[tuple]) -> int:
+        if not records:
+            return 0
+        async with self.pool.acquire() as conn:
+            await conn.copy_records_to_table("PollutionData", records=records, columns=POLLUTION_COLUMNS)
+        return len(records)
+
+    async def insert_prediction(self, record: dict) -> None:
+        await self._execute("insert_prediction", *(record[c] for c in PREDICTION_COLUMNS))
+
+    async def insert_simulation(self, record: dict) -> None:
+        await self._execute("insert_simulation", *(record[c] for c in SIMULATION_COLUMNS))
+
+    async def get_simulation(self, simulation_id: str) -> Optional[dict]:
+        return await self._fetchrow("get_simulation", simulation_id)
+
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        return await self._fetchrow("get_user", user_id)
+
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        return await self._fetchrow("get_user_by_email", email)
+
+    async def insert_user(self, record: dict) -> bool:
+        status = await self.pool.execute(QUERIES["insert_user"], *(record[c] for c in USER_COLUMNS))
+        return status.endswith(" 1")
+
+    async def update_user_password(self, user_id: str, password: str) -> None:
+        await self._execute("update_user_password", user_id, password, datetime.utcnow())
+
+    async def revoke_token(self, digest: str, expires_at: datetime) -> None:
+        now = datetime.utcnow()
+        await self._execute("purge_revoked_tokens", now)
+        await self._execute("revoke_token", digest, expires_at, now)
+
+    async def revoked_tokens(self, since: datetime) -> list[dict]:
+        return await self._fetch("revoked_tokens", since, datetime.utcnow())
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        if self.pool is not None:
+            stats.update({
+                "poolSize": self.pool.get_size(),
+                "poolIdle": self.pool.get_idle_size(),
+                "poolMin": self.pool.get_min_size(),
+                "poolMax": self.pool.get_max_size(),
+            })
+        return stats
+
+class MemoryDatabase(Database):
+    """In-process stand-in keeping the most recent rows of each table."""
+
+    def __init__(self, max_rows: int = 100_000):
+        self.pollution: deque[dict] = deque(maxlen=max_rows)
+        # Newest reading per location, so lookups don't scan the table
+        self.latest: dict[str, dict] = {}
+        self.predictions: deque[dict] = deque(maxlen=max_rows)
+        self.simulations: dict[str, dict] = {}
+        self.users: dict[str, dict] = {}
+        self.user_ids: dict[str, str] = {}
+        self.revocations: dict[str, dict] = {}
+        self.max_rows = max_rows
+
+    async def latest_pollution(self, location: str) -> Optional[dict]:
+        return self.latest.get(location)
+
+    async def copy_pollution(self, records: Sequence[tuple]) -> int:
+        for record in records:
+            row = dict(zip(POLLUTION_COLUMNS, record))
+            self.pollution.append(row)
+            latest = self.latest.get(row["location"])
+            if latest is None or row["date"] >= latest["date"]:
+                self.latest[row["location"]] = row
+                if len(self.latest) > self.max_rows:
+                    self.latest.pop(next(iter(self.latest)))
+        return len(records)
+
+    async def insert_prediction(self, record: dict) -> None:
+        self.predictions.append({c: record[c] for c in PREDICTION_COLUMNS})
+
+    async def insert_simulation(self, record: dict) -> None:
+        if len(self.simulations) >= self.max_rows:
+            self.simulations.pop(next(iter(self.simulations)))
+        self.simulations[record["id"]] = {c: record[c] for c in SIMULATION_COLUMNS}
+
+    async def get_simulation(self, simulation_id: str) -> Optional[dict]:
+        return self.simulations.get(simulation_id)
+
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        user = self.users.get(user_id)
+        return dict(user) if user is not None else None
+
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        user_id = self.user_ids.get(email)
+        return await self.get_user(user_id) if user_id is not None else None
+
+    async def insert_user(self, record: dict) -> bool:
+        if record["email"] in self.user_ids:
+            return False
+        self.users[record["id"]] = {c: record[c] for c in USER_COLUMNS}
+        self.user_ids[record["email"]] = record["id"]
+        return True
+
+    async def update_user_password(self, user_id: str, password: str) -> None:
+        user = self.users.get(user_id)
+        if user is not None:
+            user.update({"password": password, "updatedAt": datetime.utcnow()})
+
+    async def revoke_token(self, digest: str, expires_at: datetime) -> None:
+        now = datetime.utcnow()
+        for expired in [d for d, row in self.revocations.items() if row["expiresAt"] <= now]:
+            del self.revocations[expired]
+        self.revocations.setdefault(digest, {"digest": digest, "expiresAt": expires_at, "createdAt": now})
+
+    async def revoked_tokens(self, since: datetime) -> list[dict]:
+        now = datetime.utcnow()
+        rows = [row for row in self.revocations.values() if row["createdAt"] >= since and row["expiresAt"] > now]
+        return sorted(rows, key=lambda row: row["createdAt"])
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update({
+            "pollutionRows": len(self.pollution),
+            "predictionRows": len(self.predictions),
+            "simulationRows": len(self.simulations),
+            "userRows": len(self.users),
+        })
+        return stats
+
+def create_database() -> Database:
+    """Create the backend selected by DATABASE_BACKEND."""
+    if settings.DATABASE_BACKEND == "postgres":
+        return PostgresDatabase(
+            settings.DATABASE_URL,
+            settings.DB_POOL_MIN_SIZE,
+            settings.DB_POOL_MAX_SIZE,
+            settings.DB_STATEMENT_CACHE_SIZE,
+            settings.DB_COMMAND_TIMEOUT,
+            settings.DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+        )
+    if settings.DATABASE_BACKEND == "memory":
+        return MemoryDatabase()
+    raise ValueError(f"Unknown DATABASE_BACKEND: {settings.DATABASE_BACKEND}")
+
+_database: Optional[Database] = None
+
+async def init_database() -> Database:
+    """Create and connect the process-wide database; called from the app lifespan."""
+    global _database
+    _database = create_database()
+    await _database.connect()
+    return _database
+
+async def close_database() -> None:
+    global _database
+    if _database is not None:
+        await _database.close()
+        _database = None
+
+def get_database() -> Database:
+    """Return the connected database, falling back to an in-memory one outside the app lifespan."""
+    global _database
+    if _database is None:
+        _database = MemoryDatabase()
+    return _database
@@ -0,0 +1,103 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow (a few hundred milliseconds at the default
+cost), so hashing on the event loop stalls every other request while a
+sign-in is in progress. Hashes are computed on a small dedicated thread
+pool instead; bcrypt releases the GIL, so other requests keep running.
+The pool has its own bounded queue: when more sign-ins are waiting than
+PASSWORD_HASH_MAX_QUEUED, or one waits longer than
+PASSWORD_HASH_TIMEOUT_SECONDS, it is refused rather than piling up.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+import asyncio
+import threading
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_and_update_password
+
+class HasherBusyError(Exception):
+    """Raised when the hashing queue is full or a hash waited too long."""
+
+class PasswordHasher:
+    """A size-limited thread pool for bcrypt with a bounded wait queue."""
+
+    def __init__(self, workers: int, max_queued: int, timeout: float):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="password-hash")
+        # Counted from submission until the thread finishes, so work still
+        # running after its caller timed out keeps its slot
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    async def _run(self, fn: Callable, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queued:
+                self.rejected += 1
+                raise HasherBusyError("Too many sign-ins in progress, try again shortly")
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            # Frees the slot at once if the hash never left the queue
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise HasherBusyError("Timed out waiting to check the password, try again shortly")
+
+    async def hash(self, password: str) -> str:
+        """Hash a new password at the configured cost."""
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password against its stored hash. The second item is a
+        replacement hash when the stored one has an outdated cost factor.
+        """
+        return await self._run(verify_and_update_password, password, hashed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "maxQueued": self.max_queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timedOut": self.timed_out,
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+_hasher: Optional[PasswordHasher] = None
+
+def get_password_hasher() -> PasswordHasher:
+    """Return the process-wide password hasher, creating it on first use."""
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher(
+            settings.PASSWORD_HASH_WORKERS,
+            settings.PASSWORD_HASH_MAX_QUEUED,
+            settings.PASSWORD_HASH_TIMEOUT_SECONDS
+        )
+    return _hasher
+
+def close_password_hasher() -> None:
+    global _hasher
+    if _hasher is not None:
+        _hasher.close()
+        _hasher = None
@@ -0,0 +1,195 @@
+"""
+Request and function metrics in the Prometheus text format.
+
+MetricsMiddleware times every HTTP request and records its size and the
+size of its response, labelled by the route template (not the raw path, so
+/simulation/{simulation_id}/placements is one series) and the status code.
+`timed` records the duration of hot functions. `render` writes everything
+for GET /metrics. Metrics are per process.
+"""
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Iterable, Optional, Union
+import asyncio
+import threading
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(float(4 ** i) for i in range(3, 13))  # 64 B to 16 MiB
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Histogram:
+    """Observations counted into fixed buckets, per combination of label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Label values -> [count per bucket (the last one is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labels + ('le',), labels + (_number(bound),))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+class Gauge:
+    """A value that goes up and down, e.g. requests in flight."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, amount: float) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name} {_number(self.value)}"
+
+REQUEST_DURATION = Histogram(
+    "veridian_http_request_duration_seconds",
+    "Time from receiving a request to sending the end of its response.",
+    ("method", "route", "status")
+)
+REQUEST_SIZE = Histogram(
+    "veridian_http_request_size_bytes",
+    "Size of request bodies.",
+    ("method", "route"),
+    SIZE_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    "veridian_http_response_size_bytes",
+    "Size of response bodies.",
+    ("method", "route"),
+    SIZE_BUCKETS
+)
+IN_FLIGHT = Gauge("veridian_http_requests_in_flight", "Requests being handled.")
+FUNCTION_DURATION = Histogram(
+    "veridian_function_duration_seconds",
+    "Time spent in instrumented functions.",
+    ("function",)
+)
+
+METRICS: list[Union[Histogram, Gauge]] = [REQUEST_DURATION, REQUEST_SIZE, RESPONSE_SIZE, IN_FLIGHT, FUNCTION_DURATION]
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+def timed(name: str) -> Callable:
+    """Decorator recording how long each call of a function or coroutine function takes."""
+    def decorate(fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def timed_async(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    FUNCTION_DURATION.observe(time.perf_counter() - started, name)
+            return timed_async
+
+        @wraps(fn)
+        def timed_sync(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                FUNCTION_DURATION.observe(time.perf_counter() - started, name)
+        return timed_sync
+    return decorate
+
+def route_template(scope) -> str:
+    """
+    The path template of the route that handled a request. Unmatched paths
+    share one label so scans can't create unbounded series.
+    """
+    # FastAPI resolves included routers lazily: the matched route keeps its
+    # path within the router, and the full path is on the route context
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None and getattr(context, "path", None):
+        return context.path
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request; streamed bodies are timed to their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_bytes = 0
+        response_bytes = 0
+        status: Optional[int] = None
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.add(1)
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            IN_FLIGHT.add(-1)
+            path = route_template(scope)
+            method = scope["method"]
+            REQUEST_DURATION.observe(time.perf_counter() - started, method, path, status or 500)
+            REQUEST_SIZE.observe(request_bytes, method, path)
+            RESPONSE_SIZE.observe(response_bytes, method, path)
@@ -0,0 +1,51 @@
+"""
+Content negotiation on the Accept header.
+
+Endpoints that can render a resource in several formats list the media types
+they offer, most preferred first; the client's Accept header (with q-values
+and wildcards) picks among them.
+"""
+from typing import Optional, Sequence
+
+def parse_accept(accept: Optional[str]) -> list[tuple[str, float]]:
+    """Media ranges from an Accept header with their q-values, best first."""
+    ranges = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((media_type.lower(), quality, position))
+    # Stable on position, so equal q-values keep the client's order
+    ranges.sort(key=lambda r: (-r[1], r[2]))
+    return [(media_type, quality) for media_type, quality, _ in ranges]
+
+def _matches(media_range: str, media_type: str) -> bool:
+    if media_range in ("*/*", media_type):
+        return True
+    kind, _, subtype = media_range.partition("/")
+    return subtype == "*" and media_type.startswith(kind + "/")
+
+def choose_media_type(accept: Optional[str], offered: Sequence[str]) -> Optional[str]:
+    """
+    The offered media type the client prefers. A missing or empty Accept
+    header gets the first offer; None means nothing offered is acceptable.
+    """
+    ranges = parse_accept(accept)
+    if not ranges:
+        return offered[0]
+    refused = {media_range for media_range, quality in ranges if quality <= 0}
+    for media_range, quality in ranges:
+        if quality <= 0:
+            continue
+        for media_type in offered:
+            if media_type not in refused and _matches(media_range, media_type):
+                return media_type
+    return None
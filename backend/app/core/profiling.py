@@ -0,0 +1,163 @@
+"""
+On-demand profiling, off unless PROFILING_ENABLED is set.
+
+A request sent with an `X-Profile: 1` header by an admin runs under
+cProfile; the response carries an `X-Profile-Id` to fetch the report from
+/api/admin/profiles. /api/admin/profile captures a time window instead,
+either with cProfile or by sampling the event loop thread's stack, which
+costs far less and is safe under load.
+
+Everything on the event loop runs in one thread, so a profile also covers
+whatever other requests ran while it was recording. Only one cProfile
+capture runs at a time; an `X-Profile` request arriving during another, or
+from anyone but an admin, is served without profiling.
+"""
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from app.core.config import settings
+
+REPORT_LINES = 60
+
+_profiles: OrderedDict[str, dict] = OrderedDict()
+_cprofile_active = False
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+def store_profile(profile_id: str, kind: str, seconds: float, report: str, **details) -> dict:
+    """Keep a finished profile, dropping the oldest beyond PROFILE_MAX_STORED."""
+    profile = {
+        "id": profile_id,
+        "kind": kind,
+        "createdAt": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(seconds, 3),
+        **details,
+        "report": report,
+    }
+    _profiles[profile["id"]] = profile
+    while len(_profiles) > settings.PROFILE_MAX_STORED:
+        _profiles.popitem(last=False)
+    return profile
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    return _profiles.get(profile_id)
+
+def list_profiles() -> list[dict]:
+    """Stored profiles without their reports, newest first."""
+    return [{k: v for k, v in p.items() if k != "report"} for p in reversed(_profiles.values())]
+
+def cprofile_report(profiler: cProfile.Profile) -> str:
+    """The functions with the most cumulative time, as pstats prints them."""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(REPORT_LINES)
+    return stream.getvalue()
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _sample(thread_id: int, interval: float, stop: threading.Event, stacks: Counter) -> None:
+    while not stop.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        stacks[";".join(reversed(stack))] += 1
+
+async def profile_window(seconds: float, mode: str, interval_ms: float = 5.0) -> dict:
+    """
+    Profile the event loop thread for `seconds`. "sampling" reports collapsed
+    stacks with sample counts (the input of flamegraph.pl and speedscope);
+    "cprofile" reports pstats output.
+    """
+    global _cprofile_active
+    started = time.perf_counter()
+    if mode == "sampling":
+        stacks: Counter = Counter()
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=_sample,
+            args=(threading.get_ident(), interval_ms / 1000, stop, stacks),
+            name="profile-sampler",
+            daemon=True
+        )
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+        report = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+        return store_profile(new_profile_id(), "sampling", time.perf_counter() - started, report, samples=sum(stacks.values()))
+
+    if _cprofile_active:
+        raise RuntimeError("Another cProfile capture is running")
+    _cprofile_active = True
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+        _cprofile_active = False
+    return store_profile(new_profile_id(), "cprofile", time.perf_counter() - started, cprofile_report(profiler))
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling requests that ask for it with `X-Profile`
+    and whose headers `allow` accepts.
+    """
+
+    def __init__(self, app, allow: Callable[[list[tuple[bytes, bytes]]], Awaitable[bool]]):
+        self.app = app
+        self.allow = allow
+
+    async def __call__(self, scope, receive, send):
+        global _cprofile_active
+        if (
+            scope["type"] != "http"
+            or not settings.PROFILING_ENABLED
+            or not any(name == b"x-profile" and value not in (b"", b"0") for name, value in scope["headers"])
+            or not await self.allow(scope["headers"])
+            # Checked after the await, right before the flag is set
+            or _cprofile_active
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = new_profile_id()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        _cprofile_active = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            _cprofile_active = False
+            store_profile(
+                profile_id,
+                "request",
+                time.perf_counter() - started,
+                cprofile_report(profiler),
+                method=scope["method"],
+                path=scope["path"]
+            )
@@ -0,0 +1,104 @@
+"""
+Fast response encoding.
+
+ORJSONResponse is the app's default response class: orjson encodes in C and
+understands NumPy arrays and scalars, datetimes and dataclasses directly.
+`model_response` sends a pydantic model that is already of the declared
+response type, so FastAPI doesn't validate it a second time. Endpoints that
+return long lists of rows use `table_response`, which lets the Accept header
+choose JSON, MessagePack or an Arrow IPC stream.
+"""
+from datetime import date, datetime
+from typing import Any, Mapping, Optional, Sequence, Union
+import io
+import numpy as np
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from app.core.negotiation import choose_media_type
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+TABLE_MEDIA_TYPES = (JSON, MSGPACK, ARROW)
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# A column of a tabular response: a list or a NumPy array
+Column = Union[Sequence[Any], np.ndarray]
+
+def _default(value: Any) -> Any:
+    """Types neither orjson nor msgpack encode natively."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson; NaN and infinity become null."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK
+
+    def render(self, content: Any) -> bytes:
+        import msgpack
+        return msgpack.packb(content, default=_default, use_bin_type=True)
+
+def model_response(model: BaseModel, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """Send a model as JSON as it is, skipping FastAPI's response_model validation."""
+    return Response(model.model_dump_json(), status_code=status_code, headers=headers, media_type=JSON)
+
+def records(columns: Mapping[str, Column]) -> list[dict]:
+    """Rows as dicts from equal-length columns (lists or NumPy arrays)."""
+    names = list(columns)
+    values = [column.tolist() if isinstance(column, np.ndarray) else column for column in columns.values()]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+def arrow_stream(columns: Mapping[str, Column], metadata: Mapping[str, Any]) -> bytes:
+    """
+    The columns as an Arrow IPC stream. `metadata` (the non-tabular fields of
+    the response) is stored as JSON in the schema metadata under "veridian".
+    """
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    # from_pandas turns NaN into null, as JSON sends it
+    arrays = {name: pa.array(column, from_pandas=True) for name, column in columns.items()}
+    table = pa.table(arrays).replace_schema_metadata({"veridian": dumps(dict(metadata))})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+def table_response(request: Request, fields: Mapping[str, Any], rows_key: str, columns: Mapping[str, Column]) -> Response:
+    """
+    A response made of some fields plus a list of rows, in the format the
+    Accept header prefers. JSON and MessagePack carry the rows as a list of
+    objects under `rows_key`; Arrow carries them as a table.
+    """
+    media_type = choose_media_type(request.headers.get("accept"), TABLE_MEDIA_TYPES)
+    if media_type is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Available as: {', '.join(TABLE_MEDIA_TYPES)}"
+        )
+
+    headers = {"Vary": "Accept"}
+    if media_type == ARROW:
+        return Response(arrow_stream(columns, fields), media_type=ARROW, headers=headers)
+    content = {**fields, rows_key: records(columns)}
+    if media_type == MSGPACK:
+        return MsgPackResponse(content, headers=headers)
+    return ORJSONResponse(content, headers=headers)
@@ -1,19 +1,41 @@
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+import hashlib
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from app.core.cache import MISSING, TTLCache
 from app.core.config import settings
+from app.core.database import get_database
+from app.core.metrics import timed
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes with any other cost factor are flagged for rehashing, so changing
+# BCRYPT_ROUNDS upgrades (or downgrades) stored hashes as users sign in
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
     return pwd_context.verify(plain_password, hashed_password)
 
+@timed("password_hash")
 def get_password_hash(password: str) -> str:
     """Hash a password."""
     return pwd_context.hash(password)
 
+@timed("password_verify")
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and, if its hash uses an outdated cost factor,
+    return a new hash to store in its place (None otherwise).
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -45,3 +67,84 @@ def verify_token(token: str) -> Optional[dict]:
         return payload
     except JWTError:
         return None
+
+# Verified claims by token digest, so a repeat token skips the HMAC check and
+# JSON parsing. Entries never outlive the token's own expiry.
+claims_cache = TTLCache(settings.AUTH_CLAIMS_CACHE_MAX_ENTRIES, settings.AUTH_CLAIMS_CACHE_TTL_SECONDS)
+
+# Digest -> expiry (Unix time) of revoked tokens that have not expired yet.
+# Revocations are recorded in the database and copied here by
+# sync_revocations, so those made by other workers apply too.
+revoked_tokens: dict[bytes, float] = {}
+
+# Revocations recorded this long before the newest one seen are read again,
+# in case they were committed out of order
+REVOCATION_SYNC_OVERLAP = timedelta(seconds=60)
+
+_revocations_synced_at: Optional[float] = None
+_revocations_seen: Optional[datetime] = None
+
+def token_digest(token: str) -> bytes:
+    """Cache key for a token; the raw token is never kept."""
+    return hashlib.sha256(token.encode()).digest()
+
+def _utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+def _forget_revocation(digest: bytes, expires_at: float) -> None:
+    revoked_tokens[digest] = expires_at
+    claims_cache.delete(digest)
+
+async def sync_revocations(force: bool = False) -> None:
+    """
+    Apply revocations recorded since the last sync, at most once every
+    AUTH_REVOCATION_SYNC_SECONDS unless forced.
+    """
+    global _revocations_synced_at, _revocations_seen
+    now = time.monotonic()
+    if not force and _revocations_synced_at is not None and now - _revocations_synced_at < settings.AUTH_REVOCATION_SYNC_SECONDS:
+        return
+    _revocations_synced_at = now
+    
+    for digest, expires_at in list(revoked_tokens.items()):
+        if expires_at <= time.time():
+            del revoked_tokens[digest]
+    since = datetime.min if _revocations_seen is None else _revocations_seen - REVOCATION_SYNC_OVERLAP
+    for row in await get_database().revoked_tokens(since):
+        _forget_revocation(bytes.fromhex(row["digest"]), row["expiresAt"].replace(tzinfo=timezone.utc).timestamp())
+        _revocations_seen = max(_revocations_seen or row["createdAt"], row["createdAt"])
+
+async def verify_token_cached(token: str) -> Optional[dict]:
+    """
+    Verify and decode a JWT token, reusing the claims of an earlier check
+    while both the cache entry and the token are valid. Tokens revoked by
+    another worker are refused from its next revocation sync on.
+    """
+    await sync_revocations()
+    digest = token_digest(token)
+    claims = claims_cache.get(digest)
+    if claims is not MISSING:
+        return claims
+    
+    if digest in revoked_tokens:
+        return None
+    claims = verify_token(token)
+    if claims is None:
+        return None
+    
+    ttl = settings.AUTH_CLAIMS_CACHE_TTL_SECONDS
+    if "exp" in claims:
+        ttl = min(ttl, claims["exp"] - time.time())
+    if ttl > 0:
+        claims_cache.set(digest, claims, ttl)
+    return claims
+
+async def revoke_token(token: str) -> None:
+    """Reject a token from now on, in every worker, until it would have expired anyway."""
+    claims = verify_token(token)
+    if claims is None:
+        return
+    digest = token_digest(token)
+    expires_at = claims.get("exp", time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    _forget_revocation(digest, expires_at)
+    await get_database().revoke_token(digest.hex(), _utc(expires_at))
@@ -1,7 +1,40 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app.api.deps import authenticate, is_admin_request
 from app.core.config import settings
-from app.api.routes import pollution, prediction, simulation, auth
+from app.core.database import close_database, get_database, init_database
+from app.core.hashing import close_password_hasher
+from app.core.metrics import MetricsMiddleware, render as render_metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.responses import ORJSONResponse
+from app.services.jobs import close_job_manager, get_job_manager
+from app.services.model_server import get_model_server
+from app.services.prediction_cache import close_prediction_cache, get_prediction_cache
+from app.services.prediction_pool import shutdown_prediction_pool
+from app.services.sweep import shutdown_sweep_pool
+from app.api.routes import pollution, prediction, simulation, auth, jobs, admin
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the connection pool once; requests borrow from it
+    await init_database()
+    # Load and warm up the prediction model before taking traffic
+    await get_model_server().start()
+    # Cached predictions from any other model version are no longer valid
+    get_prediction_cache().purge(get_model_server().version)
+    # Resume jobs left queued or running by the previous process; under the
+    # pre-fork server the master does that instead (see app/server.py)
+    await get_job_manager().start(resume=getattr(app.state, "resume_jobs", True))
+    yield
+    await close_job_manager()
+    await get_model_server().stop()
+    shutdown_prediction_pool()
+    shutdown_sweep_pool()
+    close_prediction_cache()
+    close_password_hasher()
+    await close_database()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -9,6 +42,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS Configuration
@@ -20,11 +55,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include routers
+# Profiles cover the app and CORS, but not the metrics bookkeeping around them
+app.add_middleware(ProfilingMiddleware, allow=is_admin_request)
+# Added last so it runs first: timings include every other middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Include routers; everything but sign-up/sign-in checks the bearer token
+protected = [Depends(authenticate)]
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
-app.include_router(pollution.router, prefix="/api/pollution", tags=["Pollution"])
-app.include_router(prediction.router, prefix="/api/prediction", tags=["Prediction"])
-app.include_router(simulation.router, prefix="/api/simulation", tags=["Simulation"])
+app.include_router(pollution.router, prefix="/api/pollution", tags=["Pollution"], dependencies=protected)
+app.include_router(prediction.router, prefix="/api/prediction", tags=["Prediction"], dependencies=protected)
+app.include_router(simulation.router, prefix="/api/simulation", tags=["Simulation"], dependencies=protected)
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"], dependencies=protected)
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"], dependencies=protected)
 
 @app.get("/")
 async def root():
@@ -36,7 +80,13 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "database": get_database().stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
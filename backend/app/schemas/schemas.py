@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 # User Schemas
@@ -33,11 +33,11 @@ class PollutionDataBase(BaseModel):
     location: str
     latitude: float
     longitude: float
-    pm25: Optional[float] = None
-    pm10: Optional[float] = None
-    no2: Optional[float] = None
-    o3: Optional[float] = None
-    co: Optional[float] = None
+    pm25: Optional[float] = None  # µg/m³
+    pm10: Optional[float] = None  # µg/m³
+    no2: Optional[float] = None  # ppb
+    o3: Optional[float] = None  # ppb
+    co: Optional[float] = None  # ppm
     temperature: Optional[float] = None
     humidity: Optional[float] = None
 
@@ -51,6 +51,18 @@ class PollutionDataResponse(PollutionDataBase):
     class Config:
         from_attributes = True
 
+class PollutionBatchRequest(BaseModel):
+    """
+    Columnar batch of readings; every provided array must have the same
+    length. Units are those of the EPA tables: µg/m³ for particulates, ppb
+    for NO2 and O3, ppm for CO.
+    """
+    pm25: Optional[List[Optional[float]]] = None  # µg/m³
+    pm10: Optional[List[Optional[float]]] = None  # µg/m³
+    no2: Optional[List[Optional[float]]] = None  # ppb
+    o3: Optional[List[Optional[float]]] = None  # ppb
+    co: Optional[List[Optional[float]]] = None  # ppm
+
 class PollutionQuery(BaseModel):
     location: Optional[str] = None
     latitude: Optional[float] = None
@@ -63,6 +75,16 @@ class PredictionRequest(BaseModel):
     longitude: float
     predictionDate: datetime
 
+class PredictionBatchItem(BaseModel):
+    location: str
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    startDate: datetime
+    endDate: Optional[datetime] = None  # Defaults to startDate; one prediction per day in between
+
+class PredictionBatchRequest(BaseModel):
+    items: List[PredictionBatchItem] = Field(..., min_length=1)
+
 class PredictionResponse(BaseModel):
     id: str
     location: str
@@ -86,6 +108,42 @@ class SimulationRequest(BaseModel):
     area: float  # in square km
     currentAQI: int
     currentPI: float
+    placementStrategy: str = "grid"  # "grid" or "optimized"
+
+class DispersionRequest(SimulationRequest):
+    windSpeed: float = Field(0.0, ge=0)  # m/s
+    windDirection: float = 0.0  # degrees the wind blows from, clockwise from north
+    gridSize: int = 200  # cells per side
+    simulationId: Optional[str] = None  # reuse a stored simulation's trees
+
+class Distribution(BaseModel):
+    distribution: str = "fixed"  # "fixed", "normal", "lognormal" or "uniform"
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+class SweepRange(BaseModel):
+    min: int = Field(..., ge=0)
+    max: int = Field(..., ge=0)
+    steps: int = Field(50, ge=1)
+
+class SweepRequest(BaseModel):
+    location: str
+    areas: List[float] = Field(..., min_length=1)  # in square km
+    currentAQI: Distribution
+    currentPI: Optional[float] = None  # Defaults to half the mean AQI, as in /recommendations
+    effectiveness: Distribution = Distribution(mean=1.0)  # Multiplier on each tree's reduction
+    treeCounts: Optional[SweepRange] = None  # Defaults to 1 up to the practical limit of each area
+    samples: int = Field(1000, ge=1)
+    confidence: float = Field(0.9, gt=0, lt=1)
+    costPerTree: float = Field(500, ge=0)
+    seed: Optional[int] = None
+
+# Job Schemas
+class JobRequest(BaseModel):
+    kind: str  # "simulation", "dispersion" or "sweep"
+    payload: dict  # Request body of the matching endpoint
 
 class SimulationResponse(BaseModel):
     id: str
@@ -98,7 +156,9 @@ class SimulationResponse(BaseModel):
     treesNeeded: int
     projectedReduction: float
     projectedAQI: int
-    treePlacements: Optional[str] = None
+    treePlacements: Optional[str] = None  # JSON list of TreePlacement; see placementsUrl for compact formats
+    placementsUrl: Optional[str] = None
+    placementStrategy: Optional[str] = None
     createdAt: datetime
     
     class Config:
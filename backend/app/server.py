@@ -0,0 +1,408 @@
+"""
+Pre-fork production server.
+
+Usage (from the backend directory):
+    python -m app.server
+    python -m app.server --workers 4 --port 8000
+
+The master process binds the socket and loads the read-only data every
+worker needs (prediction model, dataset, station index and the history
+series with their rollups for the gazetteer cities), then forks uvicorn
+workers. Forked workers share those pages copy-on-write instead of each
+building its own copy, so adding a worker costs only the memory it
+writes to. The master never serves requests and starts no threads, event
+loop or pools, which keeps forking safe.
+
+Signals to the master:
+- SIGHUP reloads the data from disk (e.g. new model weights), starts a new
+  generation of workers and stops the old one once the new one is ready.
+  A reload that fails keeps the running workers. Code changes still need
+  a restart.
+- SIGTERM or SIGINT stops gracefully: workers finish their requests within
+  WORKER_GRACEFUL_TIMEOUT_SECONDS and are killed after that.
+
+A worker is replaced after WORKER_MAX_REQUESTS requests or once its private
+memory grows past WORKER_MAX_MEMORY_MB. Everything a worker keeps in memory
+(caches, metrics, ingested series) is its own. Users, revoked tokens and
+stored simulations are shared only through DATABASE_BACKEND=postgres, and
+jobs only through JOBS_DIR, so more than one worker is refused without
+both. Jobs belong to the worker that claimed them: the master queues a
+worker's unfinished jobs again when it exits, for the others to pick up.
+Without --workers or WEB_CONCURRENCY, the server starts one worker
+per CPU when they are set and a single worker otherwise.
+"""
+from types import ModuleType
+from typing import Any, Callable, Optional
+import argparse
+import gc
+import logging
+import os
+import random
+import select
+import signal
+import sys
+import time
+import numpy as np
+import uvicorn
+from app.core.config import settings
+from app.main import app
+from app.services import history, model, stations, synthetic
+from app.services.jobs import SQLiteJobStore
+
+logger = logging.getLogger(__name__)
+
+# Process-wide singletons loaded in the master: (name, module, global holding it, loader)
+ASSETS: tuple[tuple[str, ModuleType, str, Callable[[], Any]], ...] = (
+    ("dataset", synthetic, "_dataset", synthetic.get_dataset),
+    ("stations", stations, "_station_index", stations.get_station_index),
+    ("model", model, "_model", model.get_model),
+    ("history", history, "_series_registry", history.get_series_registry),
+)
+
+# Exit status of a worker whose startup (lifespan) failed
+BOOT_FAILURE = 3
+
+# Pause before replacing a worker that failed to start
+BOOT_RETRY_SECONDS = 5.0
+
+# Time a stopping worker gets beyond its graceful timeout to shut down before it is killed
+KILL_AFTER_SECONDS = 5.0
+
+def private_state() -> list[str]:
+    """Settings still keeping state in each worker, which would differ between workers."""
+    missing = []
+    if settings.DATABASE_BACKEND != "postgres":
+        missing.append("DATABASE_BACKEND=postgres (users, revoked tokens, simulations)")
+    if not settings.JOBS_DIR:
+        missing.append("JOBS_DIR (jobs)")
+    return missing
+
+def release_jobs(owner: Optional[int] = None) -> None:
+    """
+    Queue again the unfinished jobs of an exited worker (or of every worker
+    before any is started), so the running workers claim them.
+    """
+    if not settings.JOBS_DIR:
+        return
+    try:
+        store = SQLiteJobStore(settings.JOBS_DIR)
+        try:
+            released = store.release(owner)
+        finally:
+            store.close()
+    except Exception:
+        logger.exception("Could not requeue the jobs of worker %s", owner)
+        return
+    if released:
+        logger.info("Requeued %d unfinished jobs of %s", released, f"worker {owner}" if owner else "the previous server")
+
+def load_assets(reload: bool = False) -> dict[str, float]:
+    """
+    Load the read-only data every worker uses and return the seconds each
+    part took. With `reload`, whatever was loaded before is read again.
+    """
+    timings = {}
+    for name, module, attribute, load in ASSETS:
+        started = time.perf_counter()
+        if reload:
+            setattr(module, attribute, None)
+        asset = load()
+        if name == "model":
+            # The first call pays for lazy initialisation inside the model
+            asset.predict(np.zeros((1, len(model.FEATURES))))
+        elif name == "history":
+            for city in stations.CITIES:
+                asset.get(city[0])
+        timings[name] = round(time.perf_counter() - started, 3)
+    return timings
+
+def private_memory_mb(pid: int) -> Optional[float]:
+    """Memory only this process uses (its private pages), or None where /proc has no smaps_rollup."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    kb = sum(int(line.split()[1]) for line in lines if line.startswith(("Private_Clean:", "Private_Dirty:")))
+    return kb / 1024
+
+class _Worker:
+    __slots__ = ("pid", "generation", "started", "ready", "stopping")
+
+    def __init__(self, pid: int, generation: int):
+        self.pid = pid
+        self.generation = generation
+        self.started = time.monotonic()
+        self.ready = False
+        # When the worker was asked to stop
+        self.stopping: Optional[float] = None
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn server telling the master when it has started up."""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets)
+        if not self.should_exit:
+            os.write(self.ready_fd, f"{os.getpid()}\n".encode())
+
+class PreforkServer:
+    """Master process keeping `workers` forked uvicorn workers running."""
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        workers: int,
+        max_requests: int = 0,
+        max_requests_jitter: int = 0,
+        max_memory_mb: float = 0,
+        graceful_timeout: float = 30.0
+    ):
+        self.config = config
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_memory_mb = max_memory_mb
+        self.graceful_timeout = graceful_timeout
+        self.generation = 1
+        self._children: dict[int, _Worker] = {}
+        self._signals: list[int] = []
+        self._retry_at = 0.0
+        self._exit_code = 0
+
+    def run(self) -> int:
+        self.socket = self.config.bind_socket()
+        timings = load_assets()
+        logger.info("Loaded shared data in the master: %s", timings)
+        # Objects loaded so far never change: keep the collector from
+        # writing to their headers, which would copy their pages per worker
+        gc.freeze()
+        # Workers only claim jobs no worker owns, so first free what a previous server left
+        release_jobs()
+
+        self._wake_r, self._wake_w = os.pipe()
+        self._ready_r, self._ready_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+        signal.set_wakeup_fd(self._wake_w)
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, self._on_signal)
+
+        logger.info("Master %d starting %d workers", os.getpid(), self.workers)
+        try:
+            while self._step():
+                pass
+        finally:
+            self._stop_all()
+            self.socket.close()
+        return self._exit_code
+
+    def _on_signal(self, sig: int, frame) -> None:
+        self._signals.append(sig)
+
+    def _step(self) -> bool:
+        """One pass of the master loop; False once the master should exit."""
+        while self._signals:
+            sig = self._signals.pop(0)
+            if sig in (signal.SIGTERM, signal.SIGINT):
+                logger.info("Master got %s, stopping", signal.Signals(sig).name)
+                return False
+            if sig == signal.SIGHUP:
+                self._reload()
+
+        if not self._reap():
+            return False
+        self._spawn_missing()
+        self._retire_old_generations()
+        self._check_memory()
+        self._kill_overdue()
+
+        readable, _, _ = select.select([self._wake_r, self._ready_r], [], [], 1.0)
+        if self._wake_r in readable:
+            os.read(self._wake_r, 4096)
+        if self._ready_r in readable:
+            for pid in os.read(self._ready_r, 4096).split():
+                worker = self._children.get(int(pid))
+                if worker is not None:
+                    worker.ready = True
+        return True
+
+    def _reload(self) -> None:
+        logger.info("Reloading shared data")
+        previous = [(module, attribute, getattr(module, attribute)) for _, module, attribute, _ in ASSETS]
+        try:
+            gc.unfreeze()
+            timings = load_assets(reload=True)
+        except Exception:
+            logger.exception("Reload failed; keeping the data and workers we have")
+            for module, attribute, value in previous:
+                setattr(module, attribute, value)
+            return
+        finally:
+            gc.collect()
+            gc.freeze()
+        logger.info("Reloaded shared data: %s; replacing workers", timings)
+        self.generation += 1
+        self._retry_at = 0.0
+
+    def _current(self) -> list[_Worker]:
+        return [w for w in self._children.values() if w.generation == self.generation and w.stopping is None]
+
+    def _spawn_missing(self) -> None:
+        if time.monotonic() < self._retry_at:
+            return
+        for _ in range(self.workers - len(self._current())):
+            self._spawn()
+
+    def _spawn(self) -> None:
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else None
+        pid = os.fork()
+        if pid:
+            self._children[pid] = _Worker(pid, self.generation)
+            return
+
+        code = 1
+        try:
+            for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            signal.set_wakeup_fd(-1)
+            for fd in (self._wake_r, self._wake_w, self._ready_r):
+                os.close(fd)
+            # Jobs left by exited workers are released by the master instead
+            app.state.resume_jobs = False
+            self.config.limit_max_requests = limit
+            server = _WorkerServer(self.config, self._ready_w)
+            server.run(sockets=[self.socket])
+            code = 0 if server.started else BOOT_FAILURE
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+        finally:
+            os._exit(code)
+
+    def _reap(self) -> bool:
+        """Forget exited workers; False when workers can't start and none is serving."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return True
+            if pid == 0:
+                return True
+            worker = self._children.pop(pid, None)
+            release_jobs(pid)
+            if worker is None or worker.stopping is not None:
+                continue
+
+            code = os.waitstatus_to_exitcode(status)
+            if worker.ready:
+                # Served its request limit, or crashed; replaced by _spawn_missing
+                if code != 0:
+                    logger.warning("Worker %d exited with status %d", pid, code)
+                continue
+
+            logger.error("Worker %d failed to start (status %d)", pid, code)
+            if not any(w.ready and w.stopping is None for w in self._children.values()):
+                self._exit_code = BOOT_FAILURE
+                return False
+            self._retry_at = time.monotonic() + BOOT_RETRY_SECONDS
+
+    def _retire_old_generations(self) -> None:
+        current = self._current()
+        if len(current) < self.workers or not all(w.ready for w in current):
+            return
+        for worker in list(self._children.values()):
+            if worker.generation < self.generation and worker.stopping is None:
+                self._stop(worker)
+
+    def _check_memory(self) -> None:
+        if not self.max_memory_mb:
+            return
+        for worker in list(self._children.values()):
+            if not worker.ready or worker.stopping is not None:
+                continue
+            memory = private_memory_mb(worker.pid)
+            if memory is not None and memory > self.max_memory_mb:
+                logger.info("Replacing worker %d: %.0f MB private memory", worker.pid, memory)
+                self._stop(worker)
+
+    def _stop(self, worker: _Worker) -> None:
+        worker.stopping = time.monotonic()
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _kill_overdue(self) -> None:
+        now = time.monotonic()
+        for worker in self._children.values():
+            if worker.stopping is not None and now - worker.stopping > self.graceful_timeout + KILL_AFTER_SECONDS:
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _stop_all(self) -> None:
+        for worker in self._children.values():
+            if worker.stopping is None:
+                self._stop(worker)
+        deadline = time.monotonic() + self.graceful_timeout + KILL_AFTER_SECONDS
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for worker in self._children.values():
+            try:
+                os.kill(worker.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        for pid in list(self._children):
+            os.waitpid(pid, 0)
+            release_jobs(pid)
+        self._children.clear()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY or None)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument(
+        "--allow-private-state",
+        action="store_true",
+        help="start several workers even though each keeps its own users, tokens, data and jobs (benchmarks only)"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s")
+    missing = [] if args.allow_private_state else private_state()
+    if args.workers is None:
+        args.workers = 1 if missing else os.cpu_count() or 1
+        if missing:
+            logger.info("Starting one worker; set %s to run one per CPU", " and ".join(missing))
+    elif args.workers > 1 and missing:
+        parser.error(
+            f"{args.workers} workers would each keep their own state; set "
+            + " and ".join(missing) + ", or run one worker"
+        )
+    config = uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        backlog=args.backlog,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=int(settings.WORKER_GRACEFUL_TIMEOUT_SECONDS),
+    )
+    server = PreforkServer(
+        config,
+        args.workers,
+        max_requests=settings.WORKER_MAX_REQUESTS,
+        max_requests_jitter=settings.WORKER_MAX_REQUESTS_JITTER,
+        max_memory_mb=settings.WORKER_MAX_MEMORY_MB,
+        graceful_timeout=settings.WORKER_GRACEFUL_TIMEOUT_SECONDS,
+    )
+    sys.exit(server.run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Vectorized AQI engine.
+
+Scores whole arrays of pollutant readings against the US EPA breakpoint
+tables in one pass. Every function accepts scalars, lists or NumPy arrays;
+missing readings are represented as NaN and simply don't contribute to the
+dominant AQI.
+"""
+from typing import Optional, Sequence, Union
+import numpy as np
+
+ArrayLike = Union[float, Sequence[Optional[float]], np.ndarray]
+
+POLLUTANTS = ("pm25", "pm10", "no2", "o3", "co")
+
+# Breakpoint tables: (concentration_low, concentration_high, index_low, index_high)
+# pm25/pm10 in µg/m³, no2/o3 in ppb, co in ppm; readings must come in these units
+BREAKPOINTS = {
+    "pm25": np.array([
+        (0.0, 12.0, 0, 50),
+        (12.1, 35.4, 51, 100),
+        (35.5, 55.4, 101, 150),
+        (55.5, 150.4, 151, 200),
+        (150.5, 250.4, 201, 300),
+        (250.5, 350.4, 301, 400),
+        (350.5, 500.4, 401, 500),
+    ]),
+    "pm10": np.array([
+        (0, 54, 0, 50),
+        (55, 154, 51, 100),
+        (155, 254, 101, 150),
+        (255, 354, 151, 200),
+        (355, 424, 201, 300),
+        (425, 504, 301, 400),
+        (505, 604, 401, 500),
+    ], dtype=float),
+    "no2": np.array([
+        (0, 53, 0, 50),
+        (54, 100, 51, 100),
+        (101, 360, 101, 150),
+        (361, 649, 151, 200),
+        (650, 1249, 201, 300),
+        (1250, 1649, 301, 400),
+        (1650, 2049, 401, 500),
+    ], dtype=float),
+    # 8-hour ozone; readings above the top breakpoint are clamped to it
+    "o3": np.array([
+        (0, 54, 0, 50),
+        (55, 70, 51, 100),
+        (71, 85, 101, 150),
+        (86, 105, 151, 200),
+        (106, 200, 201, 300),
+    ], dtype=float),
+    "co": np.array([
+        (0.0, 4.4, 0, 50),
+        (4.5, 9.4, 51, 100),
+        (9.5, 12.4, 101, 150),
+        (12.5, 15.4, 151, 200),
+        (15.5, 30.4, 201, 300),
+        (30.5, 40.4, 301, 400),
+        (40.5, 50.4, 401, 500),
+    ]),
+}
+
+# EPA truncates concentrations before the lookup: one decimal for PM2.5/CO,
+# whole units for everything else
+TRUNCATION = {"pm25": 10.0, "pm10": 1.0, "no2": 1.0, "o3": 1.0, "co": 10.0}
+
+# µg/m³ of NO2 in one ppb at 25 °C and 1 atm, for converting mass readings
+NO2_UGM3_PER_PPB = 1.88
+
+def _as_array(values: ArrayLike) -> np.ndarray:
+    """Convert input readings to a float64 array with NaN for missing values."""
+    # np.asarray maps None to NaN when the dtype is float
+    return np.atleast_1d(np.asarray(values, dtype=np.float64))
+
+def sub_index(pollutant: str, concentrations: ArrayLike) -> np.ndarray:
+    """Calculate the AQI sub-index of one pollutant for an array of concentrations."""
+    table = BREAKPOINTS[pollutant]
+    c_lo, c_hi, i_lo, i_hi = table.T
+
+    c = _as_array(concentrations)
+    scale = TRUNCATION[pollutant]
+    c = np.floor(np.clip(c, 0, c_hi[-1]) * scale + 1e-9) / scale
+
+    row = np.minimum(np.searchsorted(c_hi, c, side="left"), len(table) - 1)
+    index = (i_hi[row] - i_lo[row]) / (c_hi[row] - c_lo[row]) * (c - c_lo[row]) + i_lo[row]
+
+    # EPA rounds the interpolated index to the nearest integer, halves up;
+    # NaN readings propagate through the arithmetic untouched
+    return np.floor(index + 0.5)
+
+def concentration(pollutant: str, aqi: ArrayLike) -> np.ndarray:
+    """
+    The lowest concentration whose sub-index reaches each AQI value; the
+    inverse of sub_index wherever the truncation step can hit the value exactly.
+    """
+    table = BREAKPOINTS[pollutant]
+    c_lo, c_hi, i_lo, i_hi = table.T
+
+    index = np.clip(_as_array(aqi), 0, i_hi[-1])
+    row = np.minimum(np.searchsorted(i_hi, index, side="left"), len(table) - 1)
+    # The index rounds up from half a point below, within the value's own category
+    target = np.maximum(index - 0.5, i_lo[row])
+    c = (c_hi[row] - c_lo[row]) / (i_hi[row] - i_lo[row]) * (target - i_lo[row]) + c_lo[row]
+
+    # Round up to the truncation step so sub_index lands back on the same value
+    scale = TRUNCATION[pollutant]
+    return np.ceil(c * scale - 1e-6) / scale
+
+def compute_aqi(**readings: ArrayLike) -> dict:
+    """
+    Score arrays of pollutant readings in one pass.
+    Returns per-pollutant sub-indices, the overall AQI (max sub-index, -1 when
+    no pollutant was reported) and the dominant pollutant for each reading.
+    """
+    unknown = set(readings) - set(POLLUTANTS)
+    if unknown:
+        raise ValueError(f"Unknown pollutants: {', '.join(sorted(unknown))}")
+
+    provided = [p for p in POLLUTANTS if readings.get(p) is not None]
+    if not provided:
+        raise ValueError("At least one pollutant must be provided")
+
+    sub_indices = {p: sub_index(p, readings[p]) for p in provided}
+
+    lengths = {len(v) for v in sub_indices.values()}
+    if len(lengths) != 1:
+        raise ValueError("All pollutant arrays must have the same length")
+
+    stacked = np.vstack([sub_indices[p] for p in provided])
+    reported = ~np.isnan(stacked)
+    filled = np.where(reported, stacked, -1)
+
+    dominant_row = filled.argmax(axis=0)
+    aqi = filled.max(axis=0).astype(np.int64)
+    dominant = np.array(provided, dtype=object)[dominant_row]
+    dominant[~reported.any(axis=0)] = None
+
+    return {"subIndices": sub_indices, "aqi": aqi, "dominant": dominant}
+
+def pollution_index(pm25: ArrayLike, temp: ArrayLike, co: ArrayLike, altitude: ArrayLike) -> np.ndarray:
+    """Calculate the pollution index formula for arrays of readings."""
+    pi = 0.3 * _as_array(temp) + 0.4 * _as_array(pm25) + 1.2 * _as_array(co) - 0.8 * _as_array(altitude)
+    return np.clip(pi, 0, 500)
+
+def calculate_aqi(pm25: float) -> int:
+    """Calculate AQI from PM2.5."""
+    return int(sub_index("pm25", pm25)[0])
+
+def calculate_pi(pm25: float, temp: float, co: float, altitude: float) -> float:
+    """Calculate pollution index using the formula."""
+    return float(pollution_index(pm25, temp, co, altitude)[0])
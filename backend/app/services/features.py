@@ -0,0 +1,260 @@
+"""
+Incremental model features per location.
+
+Rolling PM2.5 means, lagged daily AQI and seasonal encodings are kept up to
+date as readings arrive: every reading is an O(1) update of fixed-size ring
+buffers, so inference reads the current feature vector instead of rescanning
+history. `backfill_features` computes the same features for every hour of a
+long series in one vectorized pass, for building training sets.
+
+These are the inputs the model's own features are derived from, not the
+model's input: its 30-day mean becomes the typical level in
+app.services.model.build_features, which serving and training both use.
+
+Readings are bucketed by hour. Rolling means cover the window of hours
+ending at (and including) the latest reading's hour.
+"""
+from typing import Optional
+import numpy as np
+from app.services.aqi import sub_index
+from app.services.timeseries import SeriesRegistry, SeriesStore
+
+FEATURE_NAMES = (
+    "pm25",
+    "pm25Mean7d",
+    "pm25Mean30d",
+    "aqiLag1d",
+    "aqiLag7d",
+    "dayOfYearSin",
+    "dayOfYearCos",
+    "winter",
+    "monsoon",
+)
+
+SHORT_WINDOW_HOURS = 7 * 24
+LONG_WINDOW_HOURS = 30 * 24
+LAG_DAYS = (1, 7)
+
+WINTER_MONTHS = (11, 12, 1, 2)
+MONSOON_MONTHS = (6, 7, 8, 9)
+
+class SlidingWindow:
+    """
+    Sum and count of values over the last `size` periods (hours or days).
+    Periods are integers; each push moves the window forward in O(1)
+    amortized time by clearing only the slots it passes over.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        # Plain lists: scalar indexing is several times faster than on arrays
+        self.sums = [0.0] * size
+        self.counts = [0] * size
+        self.head: Optional[int] = None
+        self.total = 0.0
+        self.count = 0
+
+    def advance(self, period: int) -> None:
+        """Move the window so that it ends at `period`."""
+        if self.head is None:
+            self.head = period
+            return
+        if period <= self.head:
+            return
+        if period - self.head >= self.size:
+            self.sums = [0.0] * self.size
+            self.counts = [0] * self.size
+            self.total = 0.0
+            self.count = 0
+        else:
+            for p in range(self.head + 1, period + 1):
+                slot = p % self.size
+                self.total -= self.sums[slot]
+                self.count -= self.counts[slot]
+                self.sums[slot] = 0.0
+                self.counts[slot] = 0
+        self.head = period
+
+    def push(self, period: int, value: float) -> None:
+        """Add a value; values older than the window are ignored."""
+        self.advance(period)
+        # advance() has set head
+        if value != value or (self.head is not None and period <= self.head - self.size):
+            return
+        slot = period % self.size
+        self.sums[slot] += value
+        self.counts[slot] += 1
+        self.total += value
+        self.count += 1
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else np.nan
+
+    def period_mean(self, period: int) -> float:
+        """Mean of a single period still inside the window."""
+        if self.head is None or not self.head - self.size < period <= self.head:
+            return np.nan
+        slot = period % self.size
+        return self.sums[slot] / self.counts[slot] if self.counts[slot] else np.nan
+
+def _seasonal(hours: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Day-of-year sine/cosine and winter/monsoon flags for datetime64[h] values."""
+    hours = np.asarray(hours, dtype="datetime64[h]")
+    day_of_year = (hours - hours.astype("datetime64[Y]")).astype(np.int64) / 24
+    angle = 2 * np.pi * day_of_year / 365.25
+    month = hours.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    return (
+        np.sin(angle),
+        np.cos(angle),
+        np.isin(month, WINTER_MONTHS).astype(np.float64),
+        np.isin(month, MONSOON_MONTHS).astype(np.float64),
+    )
+
+class LocationFeatures:
+    """Running feature state for one location."""
+
+    def __init__(self):
+        self.short = SlidingWindow(SHORT_WINDOW_HOURS)
+        self.long = SlidingWindow(LONG_WINDOW_HOURS)
+        self.daily = SlidingWindow(max(LAG_DAYS) + 1)
+
+    @property
+    def hour(self) -> Optional[int]:
+        return self.long.head
+
+    def push(self, hour: int, pm25: float) -> None:
+        """Add one reading at an hour index (hours since the epoch)."""
+        self.short.push(hour, pm25)
+        self.long.push(hour, pm25)
+        self.daily.push(hour // 24, pm25)
+
+    def update(self, times: np.ndarray, pm25: np.ndarray) -> None:
+        """Add readings in time order."""
+        hours = np.asarray(times, dtype="datetime64[h]").astype(np.int64).tolist()
+        for hour, value in zip(hours, np.asarray(pm25, dtype=np.float64).tolist()):
+            self.push(hour, value)
+
+    def vector(self) -> np.ndarray:
+        """The current feature vector, ordered as FEATURE_NAMES."""
+        if self.hour is None:
+            return np.full(len(FEATURE_NAMES), np.nan)
+        day = self.hour // 24
+        lags = sub_index("pm25", [self.daily.period_mean(day - lag) for lag in LAG_DAYS])
+        seasonal = _seasonal(np.array([self.hour], dtype="datetime64[h]"))
+        return np.array([
+            self.short.period_mean(self.hour),
+            self.short.mean(),
+            self.long.mean(),
+            *lags,
+            *(values[0] for values in seasonal),
+        ])
+
+    def as_dict(self) -> dict:
+        values = self.vector()
+        return {name: (None if np.isnan(v) else float(v)) for name, v in zip(FEATURE_NAMES, values.tolist())}
+
+def series_features(store: SeriesStore) -> LocationFeatures:
+    """Features as of the latest reading of a series, from its tail."""
+    features = LocationFeatures()
+    if store.last_time is not None:
+        end = store.last_time.astype("datetime64[h]") + 1
+        recent = store.raw(end - LONG_WINDOW_HOURS, end)
+        features.update(recent["time"], recent["pm25"])
+    return features
+
+class FeatureStore:
+    """Current features for every location with readings."""
+
+    def __init__(self):
+        self._locations: dict[str, LocationFeatures] = {}
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __contains__(self, location: str) -> bool:
+        return SeriesRegistry.key(location) in self._locations
+
+    def get(self, location: str) -> Optional[LocationFeatures]:
+        return self._locations.get(SeriesRegistry.key(location))
+
+    def seed(self, location: str, store: SeriesStore) -> LocationFeatures:
+        """Start tracking a location from the tail of its stored series."""
+        features = series_features(store)
+        self._locations[SeriesRegistry.key(location)] = features
+        return features
+
+    def update(self, location: str, times: np.ndarray, pm25: np.ndarray, store: SeriesStore) -> None:
+        """
+        Add readings just appended to `store`.
+        A location seen for the first time is seeded from the store instead,
+        which already holds the new readings.
+        """
+        features = self.get(location)
+        if features is None:
+            self.seed(location, store)
+        else:
+            features.update(times, pm25)
+
+def backfill_features(times: np.ndarray, pm25: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Features at every distinct reading hour of a sorted series, in one pass.
+    Matches what LocationFeatures reports after the readings up to each hour.
+    """
+    hours = np.asarray(times, dtype="datetime64[h]").astype(np.int64)
+    pm25 = np.asarray(pm25, dtype=np.float64)
+    finite = np.isfinite(pm25)
+    first = hours[0]
+
+    # Per-hour sums and counts on a dense grid, then windowed sums via cumsum
+    slot = hours - first
+    length = int(slot[-1]) + 1
+    sums = np.bincount(slot[finite], pm25[finite], minlength=length)
+    counts = np.bincount(slot[finite], minlength=length)
+    cum_sums = np.r_[0.0, np.cumsum(sums)]
+    cum_counts = np.r_[0, np.cumsum(counts)]
+
+    out_hours = np.unique(hours)
+    idx = out_hours - first
+
+    def window_mean(size: int) -> np.ndarray:
+        lo = np.maximum(idx + 1 - size, 0)
+        total = cum_sums[idx + 1] - cum_sums[lo]
+        count = cum_counts[idx + 1] - cum_counts[lo]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        current = np.where(counts[idx] > 0, sums[idx] / np.maximum(counts[idx], 1), np.nan)
+
+    # Daily means, indexed from the first day of the series
+    days = hours // 24
+    first_day = days[0]
+    day_sums = np.bincount(days[finite] - first_day, pm25[finite], minlength=int(days[-1] - first_day) + 1)
+    day_counts = np.bincount(days[finite] - first_day, minlength=len(day_sums))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        day_means = np.where(day_counts > 0, day_sums / np.maximum(day_counts, 1), np.nan)
+
+    out_days = out_hours // 24 - first_day
+    result = {
+        "time": out_hours.astype("datetime64[h]"),
+        "pm25": current,
+        "pm25Mean7d": window_mean(SHORT_WINDOW_HOURS),
+        "pm25Mean30d": window_mean(LONG_WINDOW_HOURS),
+    }
+    for lag in LAG_DAYS:
+        lagged = out_days - lag
+        means = np.where(lagged >= 0, day_means[np.maximum(lagged, 0)], np.nan)
+        result[f"aqiLag{lag}d"] = sub_index("pm25", means)
+
+    sin, cos, winter, monsoon = _seasonal(result["time"])
+    result.update({"dayOfYearSin": sin, "dayOfYearCos": cos, "winter": winter, "monsoon": monsoon})
+    return result
+
+_feature_store: Optional[FeatureStore] = None
+
+def get_feature_store() -> FeatureStore:
+    """Return the process-wide feature store."""
+    global _feature_store
+    if _feature_store is None:
+        _feature_store = FeatureStore()
+    return _feature_store
@@ -0,0 +1,83 @@
+"""
+Historical readings per location.
+
+Stations without stored readings are backfilled from the configured
+dataset, or with a synthetic hourly series, so the history endpoints always
+have data to slice. Places that aren't in the station index aren't
+registered, so arbitrary location strings can't fill the registry or
+TIMESERIES_DIR; they get a synthetic series of their own from
+unregistered_history, kept only in a small LRU cache.
+"""
+from datetime import datetime
+from typing import Optional
+import zlib
+import numpy as np
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.services.stations import get_station_index
+from app.services.synthetic import get_dataset, pm25_series, regional_noise
+from app.services.timeseries import SeriesRegistry, SeriesStore
+
+# Typical PM2.5 used for places that aren't in the station index
+FALLBACK_PM25 = 80.0
+
+# Series of places outside the station index, kept briefly for repeat requests
+unregistered_cache = TTLCache(max_entries=64, ttl=3600)
+
+def synthetic_history(location: str, days: int, end: Optional[np.datetime64] = None) -> Optional[SeriesStore]:
+    """
+    Build an hourly series for a station ending at the current hour, or
+    return None when the location isn't in the station index. Stations
+    present in the configured dataset are served from it instead.
+    """
+    index = get_station_index()
+    row = index.find(location)
+    if row is None:
+        return None
+    
+    dataset = get_dataset()
+    if dataset is not None:
+        readings = dataset.station_readings(row)
+        store = SeriesStore()
+        store.append(readings["time"], **{field: readings[field] for field in store.fields})
+        return store
+    
+    return _synthetic_series(location, float(index.column("base_pm25")[row]), days, end)
+
+def unregistered_history(location: str) -> SeriesStore:
+    """
+    Synthetic hourly series for a place that isn't in the station index,
+    as the registry would backfill for a station with FALLBACK_PM25.
+    """
+    key = SeriesRegistry.key(location)
+    store = unregistered_cache.get(key)
+    if store is MISSING:
+        store = _synthetic_series(location, FALLBACK_PM25, settings.TIMESERIES_BACKFILL_DAYS)
+        unregistered_cache.set(key, store)
+    return store
+
+def _synthetic_series(location: str, typical: float, days: int, end: Optional[np.datetime64] = None) -> SeriesStore:
+    if end is None:
+        end = np.datetime64(datetime.now(), "h")
+    hours = end - np.arange(days * 24)[::-1].astype("timedelta64[h]")
+    
+    # Seed on the location so the same place always gets the same history
+    rng = np.random.default_rng(zlib.crc32(SeriesRegistry.key(location).encode()))
+    noise = regional_noise(rng, 1, len(hours))[0] + rng.normal(0, 0.15, len(hours))
+    pm25 = pm25_series(typical, hours, noise)
+    
+    store = SeriesStore()
+    store.append(hours, pm25=pm25, pm10=pm25 * 1.5)
+    return store
+
+_series_registry: Optional[SeriesRegistry] = None
+
+def get_series_registry() -> SeriesRegistry:
+    """Return the process-wide series registry."""
+    global _series_registry
+    if _series_registry is None:
+        _series_registry = SeriesRegistry(
+            settings.TIMESERIES_DIR,
+            lambda location: synthetic_history(location, settings.TIMESERIES_BACKFILL_DAYS)
+        )
+    return _series_registry
@@ -0,0 +1,40 @@
+"""
+Bio-urban tree impact model.
+
+How many trees an area needs and how much they reduce its pollution, as
+array operations: every function accepts scalars or NumPy arrays that
+broadcast together. The simulation endpoints' scalar helpers and the
+parameter sweep both evaluate these formulas, so they always agree.
+"""
+import numpy as np
+
+# One bio-urban tree cleans approximately this many units of pollution per day
+TREE_EFFECTIVENESS = 100
+
+# Practical planting limit
+MAX_TREES_PER_KM2 = 100
+
+# Each tree reduces pollution by this percentage over one km², up to the cap
+REDUCTION_PER_TREE_PERCENT = 0.5
+MAX_REDUCTION_PERCENT = 70.0
+
+def bio_urban_trees(current_aqi, current_pi, area) -> np.ndarray:
+    """Trees needed for an area, between 1 and MAX_TREES_PER_KM2 per km²."""
+    current_aqi, current_pi, area = (np.asarray(v, dtype=np.float64) for v in (current_aqi, current_pi, area))
+    # Use pollution index and AQI to determine severity
+    pollution_severity = (current_pi + current_aqi) / 2
+    trees_needed = np.ceil((pollution_severity * area) / TREE_EFFECTIVENESS)
+    limit = np.trunc(area * MAX_TREES_PER_KM2)
+    return np.maximum(1, np.minimum(trees_needed, limit)).astype(np.int64)
+
+def projected_reduction(trees, current_aqi, area) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduction percentage and projected AQI after planting.
+    `trees` may be fractional, e.g. scaled by an effectiveness factor.
+    """
+    trees, current_aqi, area = (np.asarray(v, dtype=np.float64) for v in (trees, current_aqi, area))
+    with np.errstate(divide="ignore"):
+        reduction_per_tree = np.where(area > 0, REDUCTION_PER_TREE_PERCENT / area, REDUCTION_PER_TREE_PERCENT)
+    total_reduction = np.minimum(trees * reduction_per_tree, MAX_REDUCTION_PERCENT)
+    projected_aqi = np.maximum(0, np.trunc(current_aqi * (1 - total_reduction / 100)))
+    return total_reduction, projected_aqi.astype(np.int64)
@@ -0,0 +1,311 @@
+"""
+Bulk ingest of sensor readings.
+
+Bodies are parsed a batch of lines at a time into NumPy columns and
+validated column-wise with the same rules as PollutionDataBase, so no
+per-row model objects are built. Valid rows are appended to the
+per-location time-series stores, update each location's model features and
+are copied into the PollutionData table.
+"""
+from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator, Optional
+import csv
+import json
+import math
+import uuid
+import numpy as np
+from app.services.aqi import compute_aqi
+from app.services.features import get_feature_store
+from app.services.history import get_series_registry
+from app.services.stations import get_station_index
+from app.services.timeseries import SeriesRegistry
+
+NUMERIC_FIELDS = ("latitude", "longitude", "pm25", "pm10", "no2", "o3", "co", "temperature", "humidity")
+POLLUTANT_FIELDS = ("pm25", "pm10", "no2", "o3", "co")
+STORE_FIELDS = POLLUTANT_FIELDS
+
+# Rejected lines listed per batch; the counts always cover every reject
+MAX_ERRORS_PER_BATCH = 20
+
+class BatchResult:
+    """Outcome of one ingested batch."""
+
+    def __init__(self, batch: int, rows: int):
+        self.batch = batch
+        self.rows = rows
+        self.accepted = 0
+        self.errors: list[tuple[int, str]] = []
+
+    @property
+    def rejected(self) -> int:
+        return self.rows - self.accepted
+
+    def reject(self, lines: np.ndarray, message: str) -> None:
+        room = MAX_ERRORS_PER_BATCH - len(self.errors)
+        self.errors.extend((int(line), message) for line in lines[:max(room, 0)])
+
+    def to_dict(self) -> dict:
+        return {
+            "batch": self.batch,
+            "rows": self.rows,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "errors": [{"line": line, "error": error} for line, error in self.errors],
+        }
+
+def _to_float(values: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert raw values to float64 with NaN for blanks.
+    Returns the array and a mask of values that could not be parsed.
+    """
+    parsed = np.zeros(len(values), dtype=bool)
+    try:
+        # Numbers, None and numeric strings convert in one call
+        return np.array(values, dtype=np.float64), parsed
+    except (TypeError, ValueError):
+        pass
+
+    raw = np.array(values, dtype=object)
+    raw[np.equal(raw, None) | (raw == "")] = np.nan  # type: ignore[call-overload]
+    try:
+        return raw.astype(np.float64), parsed
+    except (TypeError, ValueError):
+        pass
+
+    # Slow path: only batches containing garbage get here
+    result = np.full(len(raw), np.nan)
+    invalid = np.zeros(len(raw), dtype=bool)
+    for i, value in enumerate(raw.tolist()):
+        try:
+            result[i] = float(value)
+        except (TypeError, ValueError):
+            invalid[i] = True
+    return result, invalid
+
+def _to_datetime(values: list, default: np.datetime64) -> tuple[np.ndarray, np.ndarray]:
+    """Convert ISO timestamps to datetime64[s]; blanks take the default."""
+    cleaned: list[Any] = [
+        default if v is None or v == "" else (v[:-1] if isinstance(v, str) and v.endswith("Z") else v)
+        for v in values
+    ]
+    try:
+        return np.array(cleaned, dtype="datetime64[s]"), np.zeros(len(cleaned), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+
+    result = np.full(len(cleaned), default, dtype="datetime64[s]")
+    invalid = np.zeros(len(cleaned), dtype=bool)
+    for i, value in enumerate(cleaned):
+        try:
+            result[i] = np.datetime64(value, "s")
+        except (TypeError, ValueError):
+            invalid[i] = True
+    return result, invalid
+
+def parse_csv(lines: list[str], header: list[str]) -> tuple[dict[str, list], np.ndarray]:
+    """Split CSV lines into raw columns; returns the columns and a mask of malformed rows."""
+    rows = list(csv.reader(lines))
+    width = len(header)
+    malformed = np.array([len(row) != width for row in rows], dtype=bool)
+    if malformed.any():
+        rows = [row if len(row) == width else [""] * width for row in rows]
+
+    columns = dict(zip(header, (list(col) for col in zip(*rows)))) if rows else {}
+    return columns, malformed
+
+def parse_ndjson(lines: list[str]) -> tuple[dict[str, list], np.ndarray]:
+    """Split NDJSON lines into raw columns; returns the columns and a mask of malformed rows."""
+    records = []
+    malformed = np.zeros(len(lines), dtype=bool)
+    for i, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            malformed[i] = True
+            record = {}
+        records.append(record)
+
+    keys = set().union(*records) if records else set()
+    columns = {key: [record.get(key) for record in records] for key in keys}
+    return columns, malformed
+
+def validate(
+    columns: dict[str, list],
+    malformed: np.ndarray,
+    line_numbers: np.ndarray,
+    result: BatchResult,
+    undecodable: Optional[np.ndarray] = None
+) -> Optional[dict]:
+    """
+    Validate raw columns against PollutionDataBase rules.
+    Records rejects on the result and returns the accepted rows as arrays.
+    `undecodable` marks lines that weren't UTF-8, which are also malformed.
+    """
+    count = len(line_numbers)
+    if undecodable is None:
+        undecodable = np.zeros(count, dtype=bool)
+    valid = ~malformed
+    result.reject(line_numbers[malformed & ~undecodable], "Malformed record")
+    result.reject(line_numbers[undecodable], "Line is not valid UTF-8")
+
+    location = np.array([
+        v.strip() if isinstance(v, str) else "" for v in columns.get("location", [None] * count)
+    ], dtype=object)
+    missing_location = valid & (location == "")
+    result.reject(line_numbers[missing_location], "location is required")
+    valid &= ~missing_location
+
+    values = {}
+    for field in NUMERIC_FIELDS:
+        values[field], invalid = _to_float(columns.get(field, [None] * count))
+        bad = valid & invalid
+        result.reject(line_numbers[bad], f"{field} must be a number")
+        valid &= ~invalid
+
+    for field, limit in (("latitude", 90), ("longitude", 180)):
+        bad = valid & ~(np.abs(values[field]) <= limit)
+        result.reject(line_numbers[bad], f"{field} is required and must be within ±{limit}")
+        valid &= ~bad
+
+    for field in POLLUTANT_FIELDS:
+        bad = valid & (values[field] < 0)
+        result.reject(line_numbers[bad], f"{field} must not be negative")
+        valid &= ~bad
+
+    now = np.datetime64(datetime.now(), "s")
+    times, invalid = _to_datetime(columns.get("date", [None] * count), now)
+    bad = valid & invalid
+    result.reject(line_numbers[bad], "date must be an ISO 8601 timestamp")
+    valid &= ~bad
+
+    if not valid.any():
+        return None
+
+    accepted = {field: values[field][valid] for field in NUMERIC_FIELDS}
+    accepted["location"] = location[valid]
+    accepted["date"] = times[valid]
+    accepted["line"] = line_numbers[valid]
+    return accepted
+
+def store_batch(rows: dict, result: BatchResult) -> np.ndarray:
+    """
+    Append accepted rows to each location's series and register new stations.
+    Returns the indices of the rows that were stored.
+    """
+    registry = get_series_registry()
+    index = get_station_index()
+    features = get_feature_store()
+
+    locations, groups = np.unique(rows["location"].astype(str), return_inverse=True)
+    order = np.argsort(groups, kind="stable")
+    bounds = np.searchsorted(groups[order], np.arange(len(locations) + 1))
+    stored = []
+
+    for group, location in enumerate(locations.tolist()):
+        members = order[bounds[group]:bounds[group + 1]]
+        store = registry.get(location, backfill=False)
+
+        # Stores are append-only; late readings for a location are rejected
+        if store.last_time is not None:
+            stale = rows["date"][members] < store.last_time
+            result.reject(rows["line"][members[stale]], "date precedes readings already stored for this location")
+            members = members[~stale]
+        if len(members) == 0:
+            continue
+
+        # Register the station first so a failure can't leave readings half
+        # stored. Names differing only in case or punctuation share one
+        # series and so one station, found by its generated id.
+        station_id = f"ingest_{SeriesRegistry.key(location)}"
+        if index.find(location) is None and index.find(station_id) is None:
+            pm25 = rows["pm25"][members]
+            index.insert(
+                station_id,
+                location,
+                float(rows["latitude"][members[0]]),
+                float(rows["longitude"][members[0]]),
+                base_pm25=float(np.nanmean(pm25)) if np.isfinite(pm25).any() else np.nan
+            )
+
+        store.append(rows["date"][members], **{field: rows[field][members] for field in STORE_FIELDS})
+        members = members[np.argsort(rows["date"][members], kind="stable")]
+        features.update(location, rows["date"][members], rows["pm25"][members], store)
+        result.accepted += len(members)
+        stored.append(members)
+
+    return np.sort(np.concatenate(stored)) if stored else np.zeros(0, dtype=np.intp)
+
+def _nullable(values: np.ndarray) -> list:
+    """Python values with NaN as None, for the database."""
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+def pollution_records(rows: dict, members: np.ndarray) -> list[tuple]:
+    """Build PollutionData rows, ordered as database.POLLUTION_COLUMNS, for the stored readings."""
+    count = len(members)
+    if count == 0:
+        return []
+
+    aqi = compute_aqi(**{field: rows[field][members] for field in POLLUTANT_FIELDS})["aqi"]
+    now = datetime.now()
+    columns = [
+        [f"ing_{uuid.uuid4().hex}" for _ in range(count)],
+        rows["location"][members].tolist(),
+        rows["latitude"][members].tolist(),
+        rows["longitude"][members].tolist(),
+        rows["date"][members].astype("datetime64[us]").tolist(),
+        *(_nullable(rows[field][members]) for field in ("pm25", "pm10", "no2", "o3", "co", "temperature", "humidity")),
+        [None if value < 0 else value for value in aqi.tolist()],
+        [None] * count,
+        ["ingest"] * count,
+        [now] * count,
+        [now] * count,
+    ]
+    return list(zip(*columns))
+
+def prepare_batch(
+    batch: int,
+    lines: list[Optional[str]],
+    line_numbers: list[int],
+    fmt: str,
+    header: Optional[list[str]] = None
+) -> tuple[BatchResult, Optional[dict]]:
+    """
+    Parse and validate one batch of lines; None stands for a line that
+    wasn't valid UTF-8. Touches no shared state, so it can run off the
+    event loop.
+    """
+    result = BatchResult(batch, len(lines))
+    undecodable = np.array([line is None for line in lines], dtype=bool)
+    # Empty lines parse as malformed in both formats
+    text = ["" if line is None else line for line in lines]
+
+    if fmt == "csv":
+        if header is None:
+            raise ValueError("CSV batches need the header")
+        columns, malformed = parse_csv(text, header)
+    else:
+        columns, malformed = parse_ndjson(text)
+
+    return result, validate(columns, malformed | undecodable, np.array(line_numbers), result, undecodable)
+
+def _decode(line: bytes) -> Optional[str]:
+    try:
+        return line.decode("utf-8", errors="strict").rstrip("\r")
+    except UnicodeDecodeError:
+        return None
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Optional[str]]:
+    """
+    Yield complete decoded lines from a stream of byte chunks, or None for a
+    line that isn't valid UTF-8 so it can be rejected on its own.
+    """
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        for line in complete:
+            yield _decode(line)
+    if pending:
+        yield _decode(pending)
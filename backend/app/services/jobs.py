@@ -0,0 +1,712 @@
+"""
+Background jobs for long-running simulations.
+
+A job is submitted with a kind and a payload, queued, and run by one of a
+fixed number of in-process workers, so heavy what-if runs don't hold an HTTP
+request open. Clients poll the job for status and progress, cancel it, and
+fetch its result once it has succeeded.
+
+Job kinds are registered by the modules that implement them (see
+register_job). Jobs are kept in memory, or in a SQLite file under JOBS_DIR
+so that queued jobs survive a restart; jobs interrupted while running are
+queued again when the server starts.
+
+A submitted job waits unowned in the store until a process with a free
+worker claims it, which records the process id as its owner. Processes
+sharing a JOBS_DIR (the workers of app.server) therefore never run the same
+job twice: the pre-fork master queues an exited worker's jobs again for the
+others to claim, and a cancellation received by a process that doesn't own
+the job is left in the store for the owner to carry out.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Generic, Optional, TypeVar
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pydantic import BaseModel
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# How often a running job's progress is written to the store, where other processes read it
+PROGRESS_SAVE_SECONDS = 1.0
+
+Progress = Callable[[float, Optional[str]], None]
+
+# The request schema of a job kind
+Payload = TypeVar("Payload", bound=BaseModel)
+
+class JobKind(Generic[Payload]):
+    """How to validate and run one kind of job."""
+
+    def __init__(
+        self,
+        schema: type[Payload],
+        run: Callable[[Payload, Progress], Coroutine[Any, Any, Any]],
+        validate: Optional[Callable[[Payload], None]] = None
+    ):
+        self.schema = schema
+        self.run = run
+        self.validate = validate
+
+JOB_KINDS: dict[str, JobKind[Any]] = {}
+
+def register_job(
+    kind: str,
+    schema: type[Payload],
+    run: Callable[[Payload, Progress], Coroutine[Any, Any, Any]],
+    validate: Optional[Callable[[Payload], None]] = None
+) -> None:
+    """
+    Make a job kind available. `run` receives the parsed payload and a
+    progress callback taking a fraction done and an optional message, and
+    returns a JSON-serializable result. `validate` runs at submit time and
+    raises to reject the payload.
+    """
+    JOB_KINDS[kind] = JobKind(schema, run, validate)
+
+# recent() filter matching jobs of every user, anonymous ones included
+ALL_USERS = object()
+
+class QueueFullError(Exception):
+    pass
+
+class JobStore(ABC):
+    """
+    Where job records live. Records are dicts; `result` is only loaded on
+    request. `owner` is the id of the process that claimed a job, or None;
+    `userId` the user who submitted it, or None when submitted anonymously.
+    """
+
+    # Whether calls do blocking I/O, so JobManager makes them from a thread
+    blocking = False
+
+    @abstractmethod
+    def save(self, job: dict) -> None:
+        ...
+
+    @abstractmethod
+    def update_progress(self, job_id: str, progress: float, message: Optional[str]) -> None:
+        """Record the progress of a job, if it is still running."""
+
+    @abstractmethod
+    def get(self, job_id: str, with_result: bool = False) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def recent(self, status: Optional[str] = None, limit: int = 100, user_id: Any = ALL_USERS) -> list[dict]:
+        """Most recent jobs first, of one user (None for anonymous jobs) unless `user_id` is ALL_USERS."""
+
+    @abstractmethod
+    def unfinished(self) -> list[dict]:
+        """Queued and running jobs, oldest first."""
+
+    @abstractmethod
+    def count(self, status: str) -> int:
+        ...
+
+    @abstractmethod
+    def claim(self, owner: int, limit: int) -> list[dict]:
+        """Make `owner` the owner of up to `limit` of the oldest unowned queued jobs, and return them."""
+
+    @abstractmethod
+    def release(self, owner: Optional[int] = None) -> int:
+        """
+        Queue again the unfinished jobs of an owner that has gone, or of every
+        owner, for another to claim. Jobs whose cancellation was requested are
+        cancelled instead. Returns how many jobs were changed.
+        """
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job no one has claimed yet, returning True; a claimed
+        unfinished job is instead flagged for its owner to cancel.
+        """
+
+    @abstractmethod
+    def cancel_requested(self, owner: int) -> list[str]:
+        """Unfinished jobs of an owner flagged for cancellation."""
+
+    @abstractmethod
+    def purge(self, before: datetime) -> int:
+        """Drop finished jobs that finished before a time."""
+
+    def close(self) -> None:
+        pass
+
+def _released(job: dict) -> dict:
+    """A job whose owner has gone: cancelled when that was requested, queued again otherwise."""
+    if job.get("cancelRequested"):
+        job.update({"status": CANCELLED, "finishedAt": datetime.now()})
+    else:
+        job.update({"status": QUEUED, "progress": 0.0, "message": None, "startedAt": None})
+    job["owner"] = None
+    return job
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self.jobs: dict[str, dict] = {}
+
+    def save(self, job: dict) -> None:
+        # Keeps a pending cancellation request, which isn't part of the caller's record
+        self.jobs[job["id"]] = {**self.jobs.get(job["id"], {}), **job}
+
+    def _public(self, job: dict, with_result: bool = False) -> dict:
+        return {k: v for k, v in job.items() if k != "cancelRequested" and (with_result or k != "result")}
+
+    def update_progress(self, job_id: str, progress: float, message: Optional[str]) -> None:
+        job = self.jobs.get(job_id)
+        if job is not None and job["status"] == RUNNING:
+            job.update({"progress": progress, "message": message})
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        return self._public(job, with_result) if job is not None else None
+
+    def recent(self, status: Optional[str] = None, limit: int = 100, user_id: Any = ALL_USERS) -> list[dict]:
+        jobs = [
+            job for job in self.jobs.values()
+            if (status is None or job["status"] == status) and (user_id is ALL_USERS or job.get("userId") == user_id)
+        ]
+        jobs.sort(key=lambda job: job["createdAt"], reverse=True)
+        return [self._public(job) for job in jobs[:limit]]
+
+    def unfinished(self) -> list[dict]:
+        jobs = [self._public(job) for job in self.jobs.values() if job["status"] not in FINISHED]
+        return sorted(jobs, key=lambda job: job["createdAt"])
+
+    def count(self, status: str) -> int:
+        return sum(1 for job in self.jobs.values() if job["status"] == status)
+
+    def claim(self, owner: int, limit: int) -> list[dict]:
+        waiting = [job for job in self.jobs.values() if job["status"] == QUEUED and job.get("owner") is None]
+        waiting.sort(key=lambda job: job["createdAt"])
+        for job in waiting[:limit]:
+            job["owner"] = owner
+        return [self._public(job) for job in waiting[:limit]]
+
+    def release(self, owner: Optional[int] = None) -> int:
+        released = 0
+        for job in self.jobs.values():
+            if job["status"] in FINISHED or job.get("owner") is None or owner not in (None, job["owner"]):
+                continue
+            _released(job)
+            released += 1
+        return released
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return False
+        if job.get("owner") is None:
+            job.update({"status": CANCELLED, "finishedAt": datetime.now()})
+            return True
+        job["cancelRequested"] = True
+        return False
+
+    def cancel_requested(self, owner: int) -> list[str]:
+        return [
+            job_id for job_id, job in self.jobs.items()
+            if job.get("owner") == owner and job.get("cancelRequested") and job["status"] not in FINISHED
+        ]
+
+    def purge(self, before: datetime) -> int:
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["status"] in FINISHED and job["finishedAt"] < before
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+        return len(expired)
+
+class SQLiteJobStore(JobStore):
+    """
+    Jobs in `jobs.sqlite3` under a directory; payloads and results as JSON
+    text. Several processes can share the file: claims and cancellations
+    each run in one write transaction.
+    """
+
+    COLUMNS = (
+        "id", "kind", "status", "progress", "message", "payload", "result", "error",
+        "createdAt", "startedAt", "finishedAt", "owner", "userId",
+    )
+    JSON_COLUMNS = ("payload", "result")
+    TIME_COLUMNS = ("createdAt", "startedAt", "finishedAt")
+    blocking = True
+
+    def __init__(self, directory: str):
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path / "jobs.sqlite3", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT, status TEXT, progress REAL, message TEXT, "
+            "payload TEXT, result TEXT, error TEXT, createdAt TEXT, startedAt TEXT, finishedAt TEXT, "
+            "owner INTEGER, userId TEXT, cancelRequested INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Files written before jobs had owners and users
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+        if "userId" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN userId TEXT")
+        if "cancelRequested" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN cancelRequested INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, createdAt)")
+        self._db.commit()
+
+    def _encode(self, job: dict) -> tuple:
+        values = []
+        for column in self.COLUMNS:
+            value = job.get(column)
+            if value is not None and column in self.JSON_COLUMNS:
+                value = json.dumps(value)
+            elif value is not None and column in self.TIME_COLUMNS:
+                value = value.isoformat()
+            values.append(value)
+        return tuple(values)
+
+    def _decode(self, columns: tuple, row: tuple) -> dict:
+        job = dict(zip(columns, row))
+        for column in self.JSON_COLUMNS:
+            if job.get(column) is not None:
+                job[column] = json.loads(job[column])
+        for column in self.TIME_COLUMNS:
+            if job.get(column) is not None:
+                job[column] = datetime.fromisoformat(job[column])
+        return job
+
+    def _select(self, with_result: bool, where: str, params: tuple) -> list[dict]:
+        columns = tuple(c for c in self.COLUMNS if with_result or c != "result")
+        names = ", ".join(columns)
+        with self._lock:
+            rows = self._db.execute(f"SELECT {names} FROM jobs {where}", params).fetchall()
+        return [self._decode(columns, row) for row in rows]
+
+    def _transaction(self, statements: Callable[[], Any]) -> Any:
+        """Run statements in one write transaction, holding the file's write lock throughout."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                value = statements()
+            except BaseException:
+                self._db.rollback()
+                raise
+            self._db.commit()
+        return value
+
+    def save(self, job: dict) -> None:
+        names = ", ".join(self.COLUMNS)
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        # An upsert, so a pending cancellation request survives the owner's saves
+        updates = ", ".join(f"{c} = excluded.{c}" for c in self.COLUMNS[1:])
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO jobs ({names}) VALUES ({placeholders}) ON CONFLICT (id) DO UPDATE SET {updates}",
+                self._encode(job)
+            )
+            self._db.commit()
+
+    def update_progress(self, job_id: str, progress: float, message: Optional[str]) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET progress = ?, message = ? WHERE id = ? AND status = ?",
+                (progress, message, job_id, RUNNING)
+            )
+            self._db.commit()
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[dict]:
+        rows = self._select(with_result, "WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def recent(self, status: Optional[str] = None, limit: int = 100, user_id: Any = ALL_USERS) -> list[dict]:
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if user_id is not ALL_USERS:
+            # IS also matches NULL, for anonymous jobs
+            conditions.append("userId IS ?")
+            params.append(user_id)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        return self._select(False, f"{where}ORDER BY createdAt DESC LIMIT ?", (*params, limit))
+
+    def unfinished(self) -> list[dict]:
+        return self._select(False, "WHERE status IN (?, ?) ORDER BY createdAt", (QUEUED, RUNNING))
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def claim(self, owner: int, limit: int) -> list[dict]:
+        def claim() -> list[str]:
+            ids = [row[0] for row in self._db.execute(
+                "SELECT id FROM jobs WHERE status = ? AND owner IS NULL ORDER BY createdAt LIMIT ?",
+                (QUEUED, limit)
+            )]
+            self._db.executemany("UPDATE jobs SET owner = ? WHERE id = ?", [(owner, job_id) for job_id in ids])
+            return ids
+
+        ids = self._transaction(claim)
+        if not ids:
+            return []
+        placeholders = ", ".join("?" for _ in ids)
+        return self._select(False, f"WHERE id IN ({placeholders}) ORDER BY createdAt", tuple(ids))
+
+    def release(self, owner: Optional[int] = None) -> int:
+        where = "status IN (?, ?) AND owner IS NOT NULL" + ("" if owner is None else " AND owner = ?")
+        params = (QUEUED, RUNNING) if owner is None else (QUEUED, RUNNING, owner)
+
+        def release() -> int:
+            cancelled = self._db.execute(
+                f"UPDATE jobs SET status = ?, finishedAt = ?, owner = NULL WHERE {where} AND cancelRequested = 1",
+                (CANCELLED, datetime.now().isoformat(), *params)
+            ).rowcount
+            return cancelled + self._db.execute(
+                f"UPDATE jobs SET status = ?, progress = 0.0, message = NULL, startedAt = NULL, owner = NULL WHERE {where}",
+                (QUEUED, *params)
+            ).rowcount
+
+        return self._transaction(release)
+
+    def cancel(self, job_id: str) -> bool:
+        def cancel() -> bool:
+            if self._db.execute(
+                "UPDATE jobs SET status = ?, finishedAt = ? WHERE id = ? AND status = ? AND owner IS NULL",
+                (CANCELLED, datetime.now().isoformat(), job_id, QUEUED)
+            ).rowcount:
+                return True
+            self._db.execute(
+                "UPDATE jobs SET cancelRequested = 1 WHERE id = ? AND status IN (?, ?)",
+                (job_id, QUEUED, RUNNING)
+            )
+            return False
+
+        return self._transaction(cancel)
+
+    def cancel_requested(self, owner: int) -> list[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE owner = ? AND cancelRequested = 1 AND status IN (?, ?)",
+                (owner, QUEUED, RUNNING)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge(self, before: datetime) -> int:
+        with self._lock:
+            removed = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finishedAt < ?",
+                (*FINISHED, before.isoformat())
+            ).rowcount
+            self._db.commit()
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+class JobManager:
+    """
+    Runs jobs on a fixed number of worker tasks, claiming them from the
+    store as workers come free.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int,
+        max_queued: int,
+        retention: float,
+        poll_interval: float = 1.0,
+        owner: Optional[int] = None
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self.owner = owner if owner is not None else os.getpid()
+        # Claimed jobs, queued here or running; others are only in the store
+        self._active: dict[str, dict] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        # Progress and message of running jobs as last written to the store
+        self._saved_progress: dict[str, tuple] = {}
+        self._progress_saved_at = 0.0
+        self._wake: Optional[asyncio.Event] = None
+        self._workers: list[asyncio.Task] = []
+        self.submitted = 0
+        self.completed = {SUCCEEDED: 0, FAILED: 0, CANCELLED: 0}
+
+    async def _call(self, method: Callable[..., Any], *args) -> Any:
+        """Call a store method, from a thread when the store blocks on I/O."""
+        if self.store.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def start(self, resume: bool = True) -> None:
+        """
+        Start the workers and, with `resume`, queue again whatever a previous
+        run left unfinished. Pass resume=False when other processes share the
+        store, as one of them may be running those jobs.
+        """
+        if self._workers:
+            return
+        queue: asyncio.Queue = asyncio.Queue()
+        self._wake = wake = asyncio.Event()
+        wake.set()
+        if resume:
+            released = await self._call(self.store.release)
+            if released:
+                logger.info("Requeued %d unfinished jobs", released)
+        self._workers = [asyncio.create_task(self._work(queue)) for _ in range(self.workers)]
+        self._workers.append(asyncio.create_task(self._poll(wake, queue)))
+
+    async def stop(self) -> None:
+        """
+        Stop the workers. Running jobs are interrupted and stay marked as
+        running, so a persistent store queues them again on the next start
+        (or, under app.server, once the master sees this process exit).
+        """
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._wake = None
+        self._active.clear()
+        self._saved_progress.clear()
+        await self._call(self.store.close)
+
+    async def queued(self) -> int:
+        return await self._call(self.store.count, QUEUED)
+
+    async def submit(self, kind: str, payload: dict, user_id: Optional[str] = None) -> dict:
+        """
+        Queue a job for a user (None when anonymous). Raises KeyError for an unknown kind, QueueFullError when
+        the queue is at its limit, and whatever the kind's schema or validator
+        raises for a bad payload.
+        """
+        if not self._workers:
+            await self.start()
+        job_kind = JOB_KINDS[kind]
+        request = job_kind.schema(**payload)
+        if job_kind.validate is not None:
+            job_kind.validate(request)
+        if await self.queued() >= self.max_queued:
+            raise QueueFullError(f"The job queue is full ({self.max_queued} jobs waiting)")
+
+        await self._call(self.store.purge, datetime.now() - timedelta(seconds=self.retention))
+        job = {
+            "id": f"job_{uuid.uuid4().hex[:16]}",
+            "kind": kind,
+            "status": QUEUED,
+            "progress": 0.0,
+            "message": None,
+            "payload": request.model_dump(mode="json"),
+            "error": None,
+            "createdAt": datetime.now(),
+            "startedAt": None,
+            "finishedAt": None,
+            "owner": None,
+            "userId": user_id,
+        }
+        await self._call(self.store.save, dict(job))
+        if self._wake is not None:
+            self._wake.set()
+        self.submitted += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self._active.get(job_id)
+        return dict(job) if job is not None else await self._call(self.store.get, job_id)
+
+    async def result(self, job_id: str) -> Optional[dict]:
+        """The job record including its result."""
+        if job_id in self._active:
+            return dict(self._active[job_id])
+        return await self._call(self.store.get, job_id, True)
+
+    async def recent(self, status: Optional[str] = None, limit: int = 100, user_id: Any = ALL_USERS) -> list[dict]:
+        return await self._call(self.store.recent, status, limit, user_id)
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        """
+        Cancel a queued or running job; finished jobs are returned unchanged.
+        A job claimed by another process is cancelled by that process at its
+        next poll and shows "Cancelling" until then.
+        """
+        job = self._active.get(job_id)
+        if job is None:
+            return await self._cancel_elsewhere(job_id)
+        task = self._tasks.get(job_id)
+        if task is not None:
+            # The worker records the cancellation once the task unwinds
+            task.cancel()
+            job["message"] = "Cancelling"
+        else:
+            await self._finish(job, CANCELLED)
+        return dict(job)
+
+    async def _cancel_elsewhere(self, job_id: str) -> Optional[dict]:
+        job = await self._call(self.store.get, job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+        if await self._call(self.store.cancel, job_id):
+            self.completed[CANCELLED] += 1
+        job = await self._call(self.store.get, job_id)
+        if job["status"] not in FINISHED:
+            job["message"] = "Cancelling"
+        return job
+
+    async def _finish(self, job: dict, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        job.update({"status": status, "error": error, "finishedAt": datetime.now()})
+        if status == SUCCEEDED:
+            job.update({"progress": 1.0, "message": None, "result": result})
+        self._saved_progress.pop(job["id"], None)
+        await self._call(self.store.save, dict(job))
+        self._active.pop(job["id"], None)
+        self.completed[status] += 1
+        if self._wake is not None:
+            # A worker may have come free
+            self._wake.set()
+
+    async def _poll(self, wake: asyncio.Event, queue: asyncio.Queue) -> None:
+        """
+        Claim jobs for free workers, write the progress of running jobs for
+        other processes to read and carry out cancellations they asked for.
+        """
+        # wait_for can swallow a cancellation arriving as the wait ends, so stop() also empties _workers
+        while self._workers:
+            try:
+                await asyncio.wait_for(wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+            try:
+                await self._claim(queue)
+                if self._active:
+                    await self._save_progress()
+                    for job_id in await self._call(self.store.cancel_requested, self.owner):
+                        if job_id in self._active:
+                            await self.cancel(job_id)
+            except Exception:
+                logger.exception("Polling the job store failed")
+
+    async def _claim(self, queue: asyncio.Queue) -> None:
+        free = self.workers - len(self._active)
+        if free <= 0:
+            return
+        for job in await self._call(self.store.claim, self.owner, free):
+            if job["kind"] not in JOB_KINDS:
+                await self._finish(job, FAILED, error=f"Unknown job kind: {job['kind']}")
+                continue
+            self._active[job["id"]] = job
+            queue.put_nowait(job["id"])
+
+    async def _save_progress(self) -> None:
+        now = time.monotonic()
+        if now - self._progress_saved_at < PROGRESS_SAVE_SECONDS:
+            return
+        self._progress_saved_at = now
+        for job_id in list(self._tasks):
+            job = self._active.get(job_id)
+            if job is None:
+                continue
+            progress = (job["progress"], job["message"])
+            if self._saved_progress.get(job_id) != progress:
+                self._saved_progress[job_id] = progress
+                # Only updates a running job, so it can't undo a finish saved meanwhile
+                await self._call(self.store.update_progress, job_id, *progress)
+
+    @staticmethod
+    def _progress(job: dict) -> Progress:
+        """The progress callback handed to a job's run function."""
+        def progress(fraction: float, message: Optional[str] = None) -> None:
+            job["progress"] = round(min(max(fraction, 0.0), 1.0), 4)
+            if message is not None:
+                job["message"] = message
+        return progress
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            job_id = await queue.get()
+            job = self._active.get(job_id)
+            if job is None or job["status"] != QUEUED:
+                continue
+
+            job.update({"status": RUNNING, "startedAt": datetime.now(), "message": None})
+
+            # The task exists before the save yields, so a cancel in the meantime reaches it
+            kind = JOB_KINDS[job["kind"]]
+            task = asyncio.create_task(kind.run(kind.schema(**job["payload"]), self._progress(job)))
+            self._tasks[job_id] = task
+            try:
+                await self._call(self.store.save, dict(job))
+                # Wait without letting the worker's own cancellation reach the job task first
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                self._tasks.pop(job_id, None)
+
+            if task.cancelled():
+                await self._finish(job, CANCELLED)
+            elif task.exception() is not None:
+                error = task.exception()
+                logger.warning("Job %s failed: %r", job_id, error)
+                await self._finish(job, FAILED, error=getattr(error, "detail", None) or str(error) or type(error).__name__)
+            else:
+                await self._finish(job, SUCCEEDED, result=task.result())
+
+    async def stats(self) -> dict:
+        return {
+            "backend": type(self.store).__name__,
+            "workers": self.workers,
+            "maxQueued": self.max_queued,
+            "queued": await self.queued(),
+            "running": len(self._tasks),
+            "submitted": self.submitted,
+            "succeeded": self.completed[SUCCEEDED],
+            "failed": self.completed[FAILED],
+            "cancelled": self.completed[CANCELLED],
+            "kinds": sorted(JOB_KINDS),
+        }
+
+_job_manager: Optional[JobManager] = None
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager."""
+    global _job_manager
+    if _job_manager is None:
+        store = SQLiteJobStore(settings.JOBS_DIR) if settings.JOBS_DIR else MemoryJobStore()
+        _job_manager = JobManager(
+            store,
+            settings.JOBS_WORKERS,
+            settings.JOBS_MAX_QUEUED,
+            settings.JOBS_RETENTION_SECONDS,
+            settings.JOBS_POLL_SECONDS
+        )
+    return _job_manager
+
+async def close_job_manager() -> None:
+    global _job_manager
+    if _job_manager is not None:
+        await _job_manager.stop()
+        _job_manager = None
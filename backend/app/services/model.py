@@ -0,0 +1,206 @@
+"""
+Pollution prediction model.
+
+Predictions are made from a feature matrix with one row per (location,
+target date). The model estimates the baseline PM2.5 level for each row;
+the seasonal adjustment, AQI and confidence are then applied to the whole
+batch as array operations.
+
+By default the model runs on a pure-NumPy runtime from the weights file
+exported by scripts/export_model.py (MODEL_PATH/PREDICTION_WEIGHTS_NAME), so
+serving never imports TensorFlow. MODEL_RUNTIME=tensorflow loads the Keras
+model at MODEL_PATH/PREDICTION_MODEL_NAME instead. When the configured file
+is missing, a baseline model built on the station index stands in.
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional, Protocol, Union
+import logging
+import numpy as np
+from app.core.config import settings
+from app.services.aqi import ArrayLike, sub_index
+from app.services.features import get_feature_store
+from app.services.stations import get_station_index
+from app.services.synthetic import seasonal_factor
+
+logger = logging.getLogger(__name__)
+
+# Columns of the feature matrix, in order. Serving and
+# scripts/build_training_set.py both build it with build_features.
+FEATURES = ("latitude", "longitude", "dayOfYearSin", "dayOfYearCos", "daysAhead", "logTypicalPM25")
+
+BASELINE_VERSION = "v1.0.0-beta"
+
+# Typical PM2.5 for places without a nearby station level
+FALLBACK_PM25 = 80.0
+
+# Confidence starts at 1 and loses this much per year of horizon, down to MIN_CONFIDENCE
+CONFIDENCE_DECAY_PER_YEAR = 0.3
+MIN_CONFIDENCE = 0.5
+
+def recent_typical(mean_30d: ArrayLike, hours: np.ndarray) -> np.ndarray:
+    """
+    Typical PM2.5 from 30-day means ending at `hours`, with their season taken
+    out, since summarize() applies the target date's season. NaN where the
+    mean is missing or not positive.
+    """
+    typical = np.asarray(mean_30d, dtype=np.float64) / seasonal_factor(np.asarray(hours, dtype="datetime64[h]"))
+    with np.errstate(invalid="ignore"):
+        return np.where(typical > 0, typical, np.nan)
+
+def typical_pm25(latitude: float, longitude: float, location: Optional[str] = None) -> float:
+    """
+    Typical PM2.5 for a prediction: the location's recent 30-day mean when
+    its readings are tracked by the feature store, otherwise the level of the
+    station nearest to the point.
+    """
+    if location is not None:
+        features = get_feature_store().get(location)
+        if features is not None:
+            hour = np.array([features.hour], dtype="datetime64[h]")
+            recent = recent_typical([features.long.mean()], hour)[0]
+            if np.isfinite(recent):
+                return float(recent)
+
+    index = get_station_index()
+    rows, _ = index.nearest(latitude, longitude, 1)
+    if len(rows) == 0:
+        return FALLBACK_PM25
+    level = float(index.column("base_pm25")[rows[0]])
+    return level if np.isfinite(level) else FALLBACK_PM25
+
+def build_features(
+    latitudes: ArrayLike,
+    longitudes: ArrayLike,
+    dates: np.ndarray,
+    typical: ArrayLike,
+    now: Union[datetime, np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Build the feature matrix for arrays of points and target dates, as of
+    `now` (the current time by default; an array gives each row its own).
+    Scalars broadcast, so one location can be paired with many dates.
+    """
+    dates = np.asarray(dates, dtype="datetime64[s]")
+    now = np.asarray(datetime.now() if now is None else now, dtype="datetime64[s]")
+
+    day_of_year = (dates - dates.astype("datetime64[Y]")).astype(np.int64) / 86400
+    angle = 2 * np.pi * day_of_year / 365.25
+    days_ahead = (dates - now).astype(np.int64) / 86400
+
+    columns = np.broadcast_arrays(
+        np.asarray(latitudes, dtype=np.float64),
+        np.asarray(longitudes, dtype=np.float64),
+        np.sin(angle),
+        np.cos(angle),
+        days_ahead,
+        np.log(np.asarray(typical, dtype=np.float64)),
+    )
+    return np.stack(columns, axis=-1).reshape(-1, len(FEATURES))
+
+class PredictionModel(Protocol):
+    """A loaded model: its version and PM2.5 for each row of a feature matrix."""
+
+    version: str
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        ...
+
+class BaselineModel:
+    """Predicts each location's typical PM2.5 level."""
+
+    version = BASELINE_VERSION
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return np.exp(features[:, FEATURES.index("logTypicalPM25")])
+
+# Activations supported by the NumPy runtime, by Keras name
+ACTIVATIONS: dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "exponential": np.exp,
+    "softplus": lambda x: np.logaddexp(0, x),
+}
+
+class NumpyModel:
+    """
+    Forward pass of an exported dense network in NumPy.
+    The weights file holds `feature_mean`/`feature_std` for input scaling,
+    `kernel_{i}`/`bias_{i}` per layer, the layer `activations` and the `version`.
+    """
+
+    def __init__(self, path: Path):
+        with np.load(path, allow_pickle=False) as weights:
+            self.version = str(weights["version"])
+            self.mean = weights["feature_mean"].astype(np.float32)
+            self.scale = (1 / weights["feature_std"]).astype(np.float32)
+            activations = [str(name) for name in weights["activations"]]
+            self.layers = [
+                (weights[f"kernel_{i}"].astype(np.float32), weights[f"bias_{i}"].astype(np.float32), ACTIVATIONS[name])
+                for i, name in enumerate(activations)
+            ]
+        if self.layers[0][0].shape[0] != len(FEATURES):
+            raise ValueError(f"{path} expects {self.layers[0][0].shape[0]} features, not {len(FEATURES)}")
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        x = (features.astype(np.float32) - self.mean) * self.scale
+        for kernel, bias, activation in self.layers:
+            x = activation(x @ kernel + bias)
+        return x.reshape(len(features)).astype(np.float64)
+
+class KerasModel:
+    """Wraps a trained Keras model taking the FEATURES matrix and returning PM2.5; needs TensorFlow."""
+
+    def __init__(self, path: Path):
+        from tensorflow import keras
+
+        self.model = keras.models.load_model(path)
+        self.version = path.stem
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict(features, verbose=0)).reshape(len(features))
+
+def load_model() -> PredictionModel:
+    """Load the model for the configured runtime, falling back to the baseline model."""
+    loader: Callable[[Path], PredictionModel]
+    if settings.MODEL_RUNTIME == "tensorflow":
+        path = Path(settings.MODEL_PATH) / settings.PREDICTION_MODEL_NAME
+        loader = KerasModel
+    elif settings.MODEL_RUNTIME == "numpy":
+        path = Path(settings.MODEL_PATH) / settings.PREDICTION_WEIGHTS_NAME
+        loader = NumpyModel
+    else:
+        raise ValueError(f"Unknown MODEL_RUNTIME: {settings.MODEL_RUNTIME}")
+
+    if not path.exists():
+        logger.info("No model at %s; using the baseline model", path)
+        return BaselineModel()
+
+    model = loader(path)
+    logger.info("Loaded prediction model %s (%s runtime)", path, settings.MODEL_RUNTIME)
+    return model
+
+def summarize(pm25: np.ndarray, features: np.ndarray, dates: np.ndarray) -> dict[str, np.ndarray]:
+    """Apply the seasonal adjustment, AQI and confidence decay to model output."""
+    dates = np.asarray(dates, dtype="datetime64[h]").reshape(len(features))
+    pm25 = np.clip(np.asarray(pm25) * seasonal_factor(dates), 0, 500)
+
+    days_ahead = features[:, FEATURES.index("daysAhead")]
+    confidence = np.clip(1.0 - days_ahead / 365 * CONFIDENCE_DECAY_PER_YEAR, MIN_CONFIDENCE, 1.0)
+
+    return {
+        "predictedAQI": sub_index("pm25", pm25).astype(np.int64),
+        "predictedPM25": np.round(pm25, 2),
+        "confidence": np.round(confidence, 2),
+    }
+
+_model: Optional[PredictionModel] = None
+
+def get_model() -> PredictionModel:
+    """Return the process-wide prediction model, loading it on first use."""
+    global _model
+    if _model is None:
+        _model = load_model()
+    return _model
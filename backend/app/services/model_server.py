@@ -0,0 +1,178 @@
+"""
+Micro-batching model server.
+
+Concurrent prediction requests are queued and merged into one feature
+matrix, so the model runs once per batch instead of once per request.
+A batch closes when it reaches `max_batch_size` rows or when its first
+request has waited `max_wait_ms`. Inference runs in a worker thread so the
+event loop keeps accepting requests while the model is busy.
+"""
+from typing import Optional
+import asyncio
+import logging
+import time
+import numpy as np
+from app.core.config import settings
+from app.services.model import FEATURES, PredictionModel, get_model
+
+logger = logging.getLogger(__name__)
+
+class _Request:
+    __slots__ = ("features", "future", "queued_at")
+
+    def __init__(self, features: np.ndarray, future: asyncio.Future):
+        self.features = features
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+class ModelServer:
+    """Loads the model once and serves predictions in micro-batches."""
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.model: Optional[PredictionModel] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.requests = 0
+        self.max_batch_rows = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.inference_total = 0.0
+
+    @property
+    def version(self) -> str:
+        if self.model is None:
+            raise RuntimeError("The model server has not been started")
+        return self.model.version
+
+    async def start(self) -> None:
+        """Load the model, run a warmup inference and start batching."""
+        async with self._start_lock:
+            if self._task is not None:
+                return
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            self.model = model = await loop.run_in_executor(None, get_model)
+            # The first call pays for lazy initialisation inside the model
+            await loop.run_in_executor(None, model.predict, np.zeros((1, len(FEATURES))))
+            logger.info("Model %s ready in %.2fs", model.version, time.perf_counter() - started)
+
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(model, self._queue))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._queue = None
+
+    async def predict(self, features: np.ndarray) -> np.ndarray:
+        """
+        Predict PM2.5 for each row of a feature matrix. Raises ValueError
+        for a matrix that isn't rows × len(FEATURES), which couldn't be
+        batched with other requests.
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim != 2 or features.shape[1] != len(FEATURES):
+            raise ValueError(f"Expected a (rows, {len(FEATURES)}) feature matrix, got shape {features.shape}")
+        if self._task is None:
+            await self.start()
+        if self._queue is None:
+            raise RuntimeError("The model server has been stopped")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Request(features, future))
+        return await future
+
+    async def _collect(self, queue: asyncio.Queue) -> list[_Request]:
+        """Wait for a request, then gather more until the batch is full or the wait runs out."""
+        batch = [await queue.get()]
+        rows = len(batch[0].features)
+        deadline = batch[0].queued_at + self.max_wait
+
+        while rows < self.max_batch_size:
+            if queue.empty():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                request = queue.get_nowait()
+            batch.append(request)
+            rows += len(request.features)
+        return batch
+
+    async def _run(self, model: PredictionModel, queue: asyncio.Queue) -> None:
+        while True:
+            batch = await self._collect(queue)
+            batch = [request for request in batch if not request.future.done()]
+            if not batch:
+                continue
+            try:
+                await self._serve(model, batch)
+            except Exception as e:
+                # Fail this batch only; the loop must keep serving later requests
+                logger.exception("Model batch of %d requests failed", len(batch))
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    async def _serve(self, model: PredictionModel, batch: list[_Request]) -> None:
+        started = time.perf_counter()
+        features = np.concatenate([request.features for request in batch])
+        output = await asyncio.get_running_loop().run_in_executor(None, model.predict, features)
+        finished = time.perf_counter()
+
+        offset = 0
+        for request in batch:
+            size = len(request.features)
+            if not request.future.done():
+                request.future.set_result(output[offset:offset + size])
+            offset += size
+            wait = started - request.queued_at
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+        self.batches += 1
+        self.requests += len(batch)
+        self.rows += len(features)
+        self.max_batch_rows = max(self.max_batch_rows, len(features))
+        self.inference_total += finished - started
+
+    def stats(self) -> dict:
+        batches = max(self.batches, 1)
+        requests = max(self.requests, 1)
+        return {
+            "modelVersion": self.model.version if self.model is not None else None,
+            "maxBatchSize": self.max_batch_size,
+            "maxWaitMs": self.max_wait * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "avgBatchRequests": round(self.requests / batches, 2),
+            "avgBatchRows": round(self.rows / batches, 2),
+            "maxBatchRows": self.max_batch_rows,
+            "avgQueueWaitMs": round(self.wait_total / requests * 1000, 3),
+            "maxQueueWaitMs": round(self.wait_max * 1000, 3),
+            "avgInferenceMs": round(self.inference_total / batches * 1000, 3),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+_model_server: Optional[ModelServer] = None
+
+def get_model_server() -> ModelServer:
+    """Return the process-wide model server."""
+    global _model_server
+    if _model_server is None:
+        _model_server = ModelServer(settings.MODEL_BATCH_MAX_SIZE, settings.MODEL_BATCH_MAX_WAIT_MS)
+    return _model_server
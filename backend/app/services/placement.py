@@ -0,0 +1,229 @@
+"""
+Tree placement within a simulation area.
+
+The area is modelled as a square of `area` km² centred on the requested
+point. Two strategies are available:
+
+- `grid` (the default): the original jittered square grid, vectorized.
+- `optimized` (opt-in): trees are placed against a pollution intensity raster for the
+  area. Positions are first drawn by systematic weighted sampling, so each
+  part of the area gets trees in proportion to its pollution. Weighted
+  k-means then pulls them towards the pollution centroids they serve, for as
+  long as the time budget allows.
+
+Placements can be rendered as the legacy list of dicts, GeoJSON, packed
+float32 coordinates or an Arrow stream (see PLACEMENT_MEDIA_TYPES).
+"""
+from typing import Optional
+import json
+import math
+import time
+import numpy as np
+from app.services.spatial import haversine_km
+from app.services.stations import get_station_index
+
+STRATEGIES = ("grid", "optimized")
+
+# Formats of the placements sub-resource, by media type; the first is the default
+GEOJSON = "application/geo+json"
+PACKED = "application/octet-stream"
+ARROW = "application/vnd.apache.arrow.stream"
+PLACEMENT_MEDIA_TYPES = ("application/json", GEOJSON, PACKED, ARROW)
+
+KM_PER_DEGREE = 111.0
+
+# Stations interpolated into the intensity raster
+RASTER_STATIONS = 8
+
+# Candidate points drawn per raster cell for sampling and k-means
+CANDIDATES_PER_CELL = 4
+
+# Distances (point count × tree count) computed per k-means assignment chunk
+KMEANS_CHUNK_ELEMENTS = 4_000_000
+
+# Rough cost of one point-to-tree distance in an assignment step, used to
+# predict whether the first k-means iteration fits in the time budget
+KMEANS_SECONDS_PER_ELEMENT = 3e-9
+
+def area_extent(latitude: float, longitude: float, area: float) -> tuple[float, float]:
+    """Half-widths (degrees of latitude, longitude) of the square simulation area."""
+    half_km = math.sqrt(area) / 2
+    lat_half = half_km / KM_PER_DEGREE
+    lon_half = half_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return lat_half, lon_half
+
+def pollution_raster(latitude: float, longitude: float, area: float, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Typical PM2.5 over a size×size grid covering the area, by inverse-distance
+    weighting of the nearest stations. Returns cell-centre latitudes,
+    longitudes and intensities, each of shape (size, size).
+    """
+    lat_half, lon_half = area_extent(latitude, longitude, area)
+    steps = (np.arange(size) + 0.5) / size * 2 - 1
+    lats, lons = np.meshgrid(latitude + steps * lat_half, longitude + steps * lon_half, indexing="ij")
+
+    index = get_station_index()
+    rows, _ = index.nearest(latitude, longitude, RASTER_STATIONS)
+    levels = index.column("base_pm25")[rows]
+    known = np.isfinite(levels)
+    rows, levels = rows[known], levels[known]
+    if len(rows) == 0:
+        return lats, lons, np.ones_like(lats)
+
+    station_lat = index.latitudes[rows]
+    station_lon = index.longitudes[rows]
+    distances = np.stack([
+        haversine_km(float(a), float(b), lats.ravel(), lons.ravel()) for a, b in zip(station_lat, station_lon)
+    ], axis=1)
+    # A 0.5 km floor keeps a station's own cell from taking all the weight
+    weights = 1 / np.maximum(distances, 0.5) ** 2
+    intensity = (weights @ levels) / weights.sum(axis=1)
+    return lats, lons, intensity.reshape(size, size)
+
+def grid_placements(latitude: float, longitude: float, trees: int, area: float) -> tuple[np.ndarray, np.ndarray]:
+    """Trees on a jittered ceil(sqrt(n))² grid, filled row by row."""
+    grid_size = math.ceil(math.sqrt(trees))
+    # 1 degree ≈ 111 km
+    offset = math.sqrt(area) / KM_PER_DEGREE / grid_size
+
+    cells = np.arange(trees)
+    i, j = np.divmod(cells, grid_size)
+    jitter = np.random.uniform(-offset / 4, offset / 4, (2, trees))
+    lats = latitude + (i - grid_size / 2) * offset + jitter[0]
+    lons = longitude + (j - grid_size / 2) * offset + jitter[1]
+    return lats, lons
+
+def _systematic_sample(weights: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Indices drawn in proportion to weights with one random offset, so draws are evenly spread."""
+    cumulative = np.cumsum(weights)
+    positions = (rng.random() + np.arange(count)) * (cumulative[-1] / count)
+    return np.minimum(np.searchsorted(cumulative, positions, side="right"), len(weights) - 1)
+
+def _assign(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Index of the nearest center for every point, in memory-bounded chunks."""
+    chunk = max(1, KMEANS_CHUNK_ELEMENTS // len(centers))
+    center_norms = (centers ** 2).sum(axis=1)
+    labels = np.empty(len(points), dtype=np.intp)
+    for lo in range(0, len(points), chunk):
+        block = points[lo:lo + chunk]
+        # |p - c|² = |p|² - 2p·c + |c|²; |p|² doesn't change the argmin
+        distances = center_norms - 2 * block @ centers.T
+        labels[lo:lo + chunk] = distances.argmin(axis=1)
+    return labels
+
+def optimized_placements(
+    latitude: float,
+    longitude: float,
+    trees: int,
+    area: float,
+    raster_size: int,
+    time_budget: float,
+    rng: Optional[np.random.Generator] = None
+) -> dict:
+    """
+    Place trees against the area's pollution raster within a time budget (seconds).
+    Returns the tree coordinates plus how much refinement the budget allowed.
+    """
+    started = time.perf_counter()
+    rng = rng or np.random.default_rng()
+    lats, lons, intensity = pollution_raster(latitude, longitude, area, raster_size)
+    lat_half, lon_half = area_extent(latitude, longitude, area)
+
+    # Candidate points jittered inside each raster cell, weighted by its intensity;
+    # dense enough that every tree gets its own candidates. Coordinates are in
+    # units of the half-width so both axes count equally
+    per_cell = max(CANDIDATES_PER_CELL, math.ceil(2 * trees / intensity.size))
+    cell_lat = lat_half * 2 / raster_size
+    cell_lon = lon_half * 2 / raster_size
+    points = np.empty((intensity.size * per_cell, 2), dtype=np.float32)
+    points[:, 0] = (np.repeat(lats.ravel(), per_cell) - latitude + rng.uniform(-0.5, 0.5, len(points)) * cell_lat) / lat_half
+    points[:, 1] = (np.repeat(lons.ravel(), per_cell) - longitude + rng.uniform(-0.5, 0.5, len(points)) * cell_lon) / lon_half
+    weights = np.repeat(intensity.ravel(), per_cell).astype(np.float32)
+
+    centers = points[_systematic_sample(weights, trees, rng)].copy()
+
+    iterations = 0
+    converged = False
+    estimate = len(points) * trees * KMEANS_SECONDS_PER_ELEMENT
+    while not converged:
+        elapsed = time.perf_counter() - started
+        if elapsed + estimate > time_budget:
+            break
+        step_started = time.perf_counter()
+
+        labels = _assign(points, centers)
+        totals = np.bincount(labels, weights, minlength=trees)
+        moved = np.stack([
+            np.bincount(labels, weights * points[:, axis], minlength=trees) for axis in range(2)
+        ], axis=1)
+        # Trees left without points keep their position
+        occupied = totals > 0
+        updated = centers.copy()
+        updated[occupied] = moved[occupied] / totals[occupied, None]
+
+        shift = np.abs(updated - centers).max()
+        centers = updated
+        iterations += 1
+        converged = shift < 1e-3
+        estimate = time.perf_counter() - step_started
+
+    return {
+        "latitudes": latitude + centers[:, 0].astype(np.float64) * lat_half,
+        "longitudes": longitude + centers[:, 1].astype(np.float64) * lon_half,
+        "iterations": iterations,
+        "converged": converged,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+def placements_to_dicts(lats: np.ndarray, lons: np.ndarray) -> list[dict]:
+    """Placement dicts in the TreePlacement shape."""
+    return [
+        {"latitude": lat, "longitude": lon, "treeCount": 1}
+        for lat, lon in zip(np.round(lats, 6).tolist(), np.round(lons, 6).tolist())
+    ]
+
+def placements_from_json(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Coordinates back out of a stored `treePlacements` string."""
+    placements = json.loads(text or "[]")
+    lats = np.array([p["latitude"] for p in placements], dtype=np.float64)
+    lons = np.array([p["longitude"] for p in placements], dtype=np.float64)
+    return lats, lons
+
+def placements_geojson(lats: np.ndarray, lons: np.ndarray, properties: Optional[dict] = None) -> dict:
+    """
+    A FeatureCollection with one MultiPoint feature holding every tree, in
+    GeoJSON's longitude, latitude order.
+    """
+    coordinates = np.round(np.stack([lons, lats], axis=1), 6).tolist()
+    return {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "geometry": {"type": "MultiPoint", "coordinates": coordinates},
+            "properties": {"treeCount": len(coordinates), **(properties or {})},
+        }],
+    }
+
+def pack_placements(lats: np.ndarray, lons: np.ndarray) -> bytes:
+    """
+    Little-endian float32 (latitude, longitude) pairs, 8 bytes per tree.
+    float32 keeps coordinates to within about a metre.
+    """
+    packed = np.empty((len(lats), 2), dtype="<f4")
+    packed[:, 0] = lats
+    packed[:, 1] = lons
+    return packed.tobytes()
+
+def placements_arrow(lats: np.ndarray, lons: np.ndarray) -> bytes:
+    """An Arrow IPC stream with float32 `latitude` and `longitude` columns."""
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    table = pa.table({
+        "latitude": np.asarray(lats, dtype=np.float32),
+        "longitude": np.asarray(lons, dtype=np.float32),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
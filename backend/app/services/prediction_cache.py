@@ -0,0 +1,230 @@
+"""
+Prediction cache keyed on (geo cell, target date, days ahead, model version,
+typical PM2.5).
+
+Model output for a cell and day is kept in an in-process LRU and, when
+PREDICTION_CACHE_DIR is set, in a SQLite file that survives restarts and
+can be filled ahead of time by scripts/prewarm_predictions.py. The model
+version is part of every key, so deploying a new model never serves
+predictions made by the old one; stale versions are purged from disk when
+the new model loads. The typical PM2.5 the features were built from is part
+of the key too: it follows the feature store's 30-day mean for tracked
+locations, so new readings move predictions to new keys instead of serving
+ones made from the old level. How many days ahead the target date is, also
+a model input, is counted in whole calendar days from the day of the
+request, so the same target day asked for on different days doesn't share
+an entry.
+
+Only the LRU tier is consulted on the event loop. Disk reads run in a worker
+thread, and disk writes are queued to a writer thread that commits whatever
+has accumulated in one transaction.
+
+What is cached is the model's PM2.5 estimate. Seasonal adjustment, AQI and
+confidence depend on when the request is made and are recomputed from it.
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+import numpy as np
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Decimal places of typical PM2.5 kept in keys; finer changes share entries
+TYPICAL_PRECISION = 1
+
+class PredictionCache:
+    """Two-tier cache of model output per (cell, day, days ahead, model version, typical PM2.5)."""
+
+    def __init__(self, max_entries: int, ttl: float, precision: int, directory: Optional[str] = None):
+        self.ttl = ttl
+        self.precision = precision
+        self.memory = TTLCache(max_entries, ttl)
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        if directory:
+            path = Path(directory)
+            path.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path / "predictions.sqlite3", check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(predictions)")]
+            if columns and "ahead" not in columns:
+                # Written before typical PM2.5 and days ahead were part of the key
+                self._db.execute("DROP TABLE predictions")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "lat REAL, lon REAL, day TEXT, ahead INTEGER, version TEXT, typical REAL, pm25 REAL, created REAL, "
+                "PRIMARY KEY (lat, lon, version, typical, day, ahead))"
+            )
+            self._db.commit()
+
+    def cell(self, lat: float, lon: float) -> tuple[float, float]:
+        return round(lat, self.precision), round(lon, self.precision)
+
+    @staticmethod
+    def days(days: np.ndarray, now: Optional[datetime]) -> list[tuple[str, int]]:
+        """(target day, whole days ahead of `now`'s day) keys for an array of dates."""
+        days = np.asarray(days, dtype="datetime64[D]")
+        today = np.datetime64(datetime.now() if now is None else now, "D")
+        return list(zip((str(day) for day in days.tolist()), (days - today).astype(np.int64).tolist()))
+
+    async def lookup(
+        self,
+        lat: float,
+        lon: float,
+        days: np.ndarray,
+        version: str,
+        typical: float,
+        now: Optional[datetime] = None
+    ) -> np.ndarray:
+        """Cached model output for each day (datetime64[D]) as predicted on `now`'s day; NaN where missing."""
+        lat, lon = self.cell(lat, lon)
+        typical = round(typical, TYPICAL_PRECISION)
+        keys = self.days(days, now)
+        values = np.array([
+            self.memory.get((lat, lon, day, ahead, version, typical), np.nan) for day, ahead in keys
+        ], dtype=np.float64)
+
+        missing = np.isnan(values)
+        if self._db is None or not missing.any():
+            return values
+
+        wanted = [keys[i][0] for i in np.flatnonzero(missing)]
+        found = await asyncio.to_thread(self._read, self._db, lat, lon, version, typical, min(wanted), max(wanted))
+
+        for i in np.flatnonzero(missing):
+            if keys[i] not in found:
+                self.disk_misses += 1
+                continue
+            self.disk_hits += 1
+            values[i] = value = found[keys[i]]
+            self.memory.set((lat, lon, *keys[i], version, typical), value)
+        return values
+
+    def _read(
+        self,
+        db: sqlite3.Connection,
+        lat: float,
+        lon: float,
+        version: str,
+        typical: float,
+        first: str,
+        last: str
+    ) -> dict[tuple[str, int], float]:
+        with self._lock:
+            rows = db.execute(
+                "SELECT day, ahead, pm25 FROM predictions "
+                "WHERE lat = ? AND lon = ? AND version = ? AND typical = ? AND day BETWEEN ? AND ? AND created > ?",
+                (lat, lon, version, typical, first, last, time.time() - self.ttl)
+            ).fetchall()
+        return {(day, ahead): pm25 for day, ahead, pm25 in rows}
+
+    def store(
+        self,
+        lat: float,
+        lon: float,
+        days: np.ndarray,
+        version: str,
+        typical: float,
+        values: np.ndarray,
+        now: Optional[datetime] = None
+    ) -> None:
+        """Cache model output for each day as predicted on `now`'s day; the disk write happens on the writer thread."""
+        lat, lon = self.cell(lat, lon)
+        typical = round(typical, TYPICAL_PRECISION)
+        keys = self.days(days, now)
+        values = np.asarray(values, dtype=np.float64).tolist()
+        for (day, ahead), value in zip(keys, values):
+            self.memory.set((lat, lon, day, ahead, version, typical), value)
+
+        if self._db is not None:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write, args=(self._db,), name="prediction-cache-writer", daemon=True
+                )
+                self._writer.start()
+            created = time.time()
+            self._writes.put([
+                (lat, lon, day, ahead, version, typical, value, created) for (day, ahead), value in zip(keys, values)
+            ])
+
+    def _write(self, db: sqlite3.Connection) -> None:
+        """Commit queued rows, everything pending in one transaction, until close() sends None."""
+        while True:
+            batches = [self._writes.get()]
+            while not self._writes.empty():
+                batches.append(self._writes.get_nowait())
+            rows = [row for batch in batches if batch is not None for row in batch]
+            if rows:
+                with self._lock:
+                    db.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                    db.commit()
+            if None in batches:
+                return
+
+    def purge(self, version: str) -> int:
+        """Drop on-disk entries made by other model versions or past their TTL."""
+        self.memory.clear()
+        if self._db is None:
+            return 0
+        with self._lock:
+            removed = self._db.execute(
+                "DELETE FROM predictions WHERE version != ? OR created <= ?",
+                (version, time.time() - self.ttl)
+            ).rowcount
+            self._db.commit()
+        return removed
+
+    def flush(self) -> None:
+        """Wait for queued disk writes to be committed."""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def close(self) -> None:
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        stats.update({
+            "diskEnabled": self._db is not None,
+            "diskHits": self.disk_hits,
+            "diskMisses": self.disk_misses,
+            "diskPendingWrites": self._writes.qsize(),
+        })
+        if self._db is not None:
+            with self._lock:
+                stats["diskEntries"] = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        return stats
+
+_prediction_cache: Optional[PredictionCache] = None
+
+def get_prediction_cache() -> PredictionCache:
+    """Return the process-wide prediction cache."""
+    global _prediction_cache
+    if _prediction_cache is None:
+        _prediction_cache = PredictionCache(
+            settings.PREDICTION_CACHE_MAX_ENTRIES,
+            settings.PREDICTION_CACHE_TTL_SECONDS,
+            settings.PREDICTION_CACHE_GEO_PRECISION,
+            settings.PREDICTION_CACHE_DIR
+        )
+    return _prediction_cache
+
+def close_prediction_cache() -> None:
+    global _prediction_cache
+    if _prediction_cache is not None:
+        _prediction_cache.close()
+        _prediction_cache = None
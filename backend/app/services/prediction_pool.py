@@ -0,0 +1,89 @@
+"""
+Process pool for bulk prediction.
+
+Large multi-location requests are split into shards that run in worker
+processes, so CPU-bound inference neither holds the GIL of the API process
+nor blocks its event loop. Each worker loads the model once when it starts,
+and a shard is predicted with a single model call.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+import multiprocessing
+import numpy as np
+from app.core.config import settings
+from app.services.model import FEATURES, build_features, get_model, summarize
+
+def _init_worker() -> None:
+    # Load and warm up the model before the first shard arrives
+    get_model().predict(np.zeros((1, len(FEATURES))))
+
+def predict_shard(items: list[dict]) -> list[dict]:
+    """
+    Predict a shard of items in one model call.
+    Each item carries its index, coordinates, typical PM2.5, first date
+    (ISO date string) and number of days.
+    """
+    model = get_model()
+    days = np.array([item["days"] for item in items])
+    starts = np.array([item["start"] for item in items], dtype="datetime64[D]")
+
+    # Expand every item to its daily dates, then predict all rows together
+    owner = np.repeat(np.arange(len(items)), days)
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(days) - days, days)
+    dates = starts[owner] + offsets.astype("timedelta64[D]")
+
+    def column(name: str) -> np.ndarray:
+        return np.array([item[name] for item in items], dtype=np.float64)[owner]
+
+    features = build_features(column("latitude"), column("longitude"), dates, column("typical"))
+    prediction = summarize(model.predict(features), features, dates)
+
+    dates = [str(date) for date in dates.tolist()]
+    aqi = prediction["predictedAQI"].tolist()
+    pm25 = prediction["predictedPM25"].tolist()
+    confidence = prediction["confidence"].tolist()
+
+    results = []
+    bounds = np.r_[0, np.cumsum(days)].tolist()
+    for i, item in enumerate(items):
+        rows = range(bounds[i], bounds[i + 1])
+        results.append({
+            "index": item["index"],
+            "location": item["location"],
+            "latitude": item["latitude"],
+            "longitude": item["longitude"],
+            "modelVersion": model.version,
+            "predictions": [
+                {
+                    "date": dates[row],
+                    "predictedAQI": aqi[row],
+                    "predictedPM25": pm25[row],
+                    "confidence": confidence[row],
+                }
+                for row in rows
+            ],
+        })
+    return results
+
+_pool: Optional[Executor] = None
+
+def get_prediction_pool() -> Executor:
+    """Return the process-wide prediction pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        if settings.PREDICTION_POOL_WORKERS > 0:
+            # Spawned workers don't inherit the event loop or threads of the API process
+            _pool = ProcessPoolExecutor(
+                settings.PREDICTION_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        else:
+            _pool = ThreadPoolExecutor(1, initializer=_init_worker)
+    return _pool
+
+def shutdown_prediction_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
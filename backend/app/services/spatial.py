@@ -0,0 +1,251 @@
+"""
+In-memory spatial index of monitoring stations.
+
+Stations live in columnar NumPy arrays and are bucketed into a uniform
+lat/lon grid, so nearest-neighbour and bounding-box queries only touch the
+handful of cells around the query instead of every station. Grid columns
+wrap around at the antimeridian, so queries near ±180° also search the
+cells on the other side.
+"""
+from collections import defaultdict
+from itertools import chain
+from typing import Optional, Sequence, Union
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Rings searched around the query cell before nearest() gives up on the grid
+# and falls back to scanning every station
+MAX_SEARCH_RINGS = 32
+
+# Above this many cells a bbox query scans the coordinate arrays directly
+MAX_BBOX_CELLS = 4096
+
+# Map thinning divides every web-map tile into CELLS_PER_TILE² buckets
+CELLS_PER_TILE = 16
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance in km from one point to arrays of points."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class StationIndex:
+    """Grid-bucketed station index supporting incremental inserts."""
+
+    def __init__(self, cell_size: float = 0.25, capacity: int = 1024):
+        self.cell_size = cell_size
+        # Columns count from -180°; column indices are taken modulo this
+        self._n_cols = math.ceil(360 / cell_size)
+        self.ids: list[str] = []
+        self.names: list[str] = []
+        self._lat = np.empty(capacity)
+        self._lon = np.empty(capacity)
+        self._columns: dict[str, np.ndarray] = {}
+        self._size = 0
+        self._cells: dict[tuple[int, int], list[int]] = defaultdict(list)
+        self._rows_by_id: dict[str, int] = {}
+        self._rows_by_name: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def latitudes(self) -> np.ndarray:
+        return self._lat[:self._size]
+
+    @property
+    def longitudes(self) -> np.ndarray:
+        return self._lon[:self._size]
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a numeric attribute column aligned with the station rows."""
+        return self._columns[name][:self._size]
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._size + extra
+        if needed <= len(self._lat):
+            return
+
+        capacity = max(needed, 2 * len(self._lat))
+        self._lat = np.resize(self._lat, capacity)
+        self._lon = np.resize(self._lon, capacity)
+        for name, values in self._columns.items():
+            self._columns[name] = np.resize(values, capacity)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_size), math.floor((lon + 180) / self.cell_size) % self._n_cols
+
+    def insert(self, station_id: str, name: str, lat: float, lon: float, **columns: float) -> int:
+        """Add a single station and return its row."""
+        return int(self.insert_many([station_id], [name], [lat], [lon], **{k: [v] for k, v in columns.items()})[0])
+
+    def insert_many(
+        self,
+        ids: Sequence[str],
+        names: Sequence[str],
+        lats: Union[Sequence[float], np.ndarray],
+        lons: Union[Sequence[float], np.ndarray],
+        **columns: Union[Sequence[float], np.ndarray]
+    ) -> np.ndarray:
+        """Add stations in bulk and return their rows."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        count = len(ids)
+
+        if not (len(names) == len(lats) == len(lons) == count):
+            raise ValueError("ids, names, lats and lons must have the same length")
+        if np.any(np.abs(lats) > 90) or np.any(np.abs(lons) > 180):
+            raise ValueError("Coordinates out of range")
+        duplicates = [i for i in ids if i in self._rows_by_id]
+        if duplicates or len(set(ids)) != count:
+            raise ValueError(f"Duplicate station ids: {', '.join(duplicates[:5]) or 'within batch'}")
+
+        self._reserve(count)
+        start, end = self._size, self._size + count
+        self._lat[start:end] = lats
+        self._lon[start:end] = lons
+
+        for name, values in columns.items():
+            if name not in self._columns:
+                self._columns[name] = np.full(len(self._lat), np.nan)
+            self._columns[name][start:end] = values
+        for name in self._columns.keys() - columns.keys():
+            self._columns[name][start:end] = np.nan
+
+        rows = np.arange(start, end)
+        cell_rows = np.floor(lats / self.cell_size).astype(np.int64).tolist()
+        cell_cols = (np.floor((lons + 180) / self.cell_size).astype(np.int64) % self._n_cols).tolist()
+        for row, cell in zip(rows.tolist(), zip(cell_rows, cell_cols)):
+            self._cells[cell].append(row)
+
+        for row, station_id, name in zip(rows.tolist(), ids, names):
+            self._rows_by_id[station_id] = row
+            self._rows_by_name.setdefault(name.lower(), row)
+
+        self.ids.extend(ids)
+        self.names.extend(names)
+        self._size = end
+        return rows
+
+    def find(self, key: str) -> Optional[int]:
+        """Look up a station row by id or case-insensitive name."""
+        if key in self._rows_by_id:
+            return self._rows_by_id[key]
+
+        name = key.strip().lower()
+        row = self._rows_by_name.get(name)
+        if row is None and "," in name:
+            # "New Delhi, India" should still match "New Delhi"
+            row = self._rows_by_name.get(name.split(",")[0].strip())
+        return row
+
+    def _gather(self, cells) -> np.ndarray:
+        # Wrapped columns can repeat a cell when rings span the globe
+        cells = {(i, j % self._n_cols) for i, j in cells}
+        buckets = [self._cells[c] for c in cells if c in self._cells]
+        return np.fromiter(chain.from_iterable(buckets), dtype=np.int64)
+
+    def nearest(self, lat: float, lon: float, n: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """Return the rows and distances (km) of the n stations nearest to a point."""
+        n = min(n, self._size)
+        if n <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        ci, cj = self._cell(lat, lon)
+        candidates = self._gather([(ci, cj)])
+
+        for ring in range(1, MAX_SEARCH_RINGS + 1):
+            if len(candidates) >= n:
+                distances = haversine_km(lat, lon, self._lat[candidates], self._lon[candidates])
+                kth = np.partition(distances, n - 1)[n - 1]
+
+                # Anything outside the searched rings is at least this far away
+                reach = math.radians((ring - 1) * self.cell_size)
+                shrink = math.cos(math.radians(min(89.9, abs(lat) + ring * self.cell_size)))
+                if kth <= EARTH_RADIUS_KM * reach * shrink:
+                    break
+
+            ring_cells = [
+                (ci + di, cj + dj)
+                for di in range(-ring, ring + 1)
+                for dj in range(-ring, ring + 1)
+                if max(abs(di), abs(dj)) == ring
+            ]
+            found = self._gather(ring_cells)
+            if len(found):
+                # Unique, as rings can wrap back onto cells already searched
+                candidates = np.unique(np.concatenate([candidates, found]))
+        else:
+            candidates = np.arange(self._size)
+
+        distances = haversine_km(lat, lon, self._lat[candidates], self._lon[candidates])
+        order = np.argpartition(distances, n - 1)[:n]
+        order = order[np.argsort(distances[order])]
+        return candidates[order], distances[order]
+
+    def within_bbox(self, north: float, south: float, east: float, west: float) -> np.ndarray:
+        """Return the rows of every station inside a bounding box."""
+        if north < south:
+            raise ValueError("north must be greater than or equal to south")
+
+        # A box crossing the antimeridian is two boxes
+        if west > east:
+            return np.concatenate([
+                self.within_bbox(north, south, 180.0, west),
+                self.within_bbox(north, south, east, -180.0),
+            ])
+
+        # Unwrapped columns, so a box ending at 180° still runs west to east
+        i0, j0 = math.floor(south / self.cell_size), math.floor((west + 180) / self.cell_size)
+        i1, j1 = math.floor(north / self.cell_size), math.floor((east + 180) / self.cell_size)
+        n_cells = (i1 - i0 + 1) * (j1 - j0 + 1)
+
+        if n_cells > min(MAX_BBOX_CELLS, len(self._cells)):
+            candidates = np.arange(self._size)
+        else:
+            candidates = self._gather(
+                (i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)
+            )
+
+        lats, lons = self._lat[candidates], self._lon[candidates]
+        inside = (lats >= south) & (lats <= north) & (lons >= west) & (lons <= east)
+        return candidates[inside]
+
+def zoom_for_bbox(north: float, south: float, east: float, west: float) -> int:
+    """Estimate the web-map zoom level at which a bounding box fills one tile."""
+    lon_span = (east - west) % 360 or 360
+    span = max(north - south, lon_span, 1e-6)
+    return int(min(20, max(0, math.floor(math.log2(360 / span)))))
+
+def thin_points(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    zoom: int,
+    per_cell: int,
+    priority: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Keep at most per_cell points in each screen cell at the given zoom level.
+    Points with a higher priority win; returns the indices of the kept points.
+    """
+    if len(lats) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    cell_size = 360 / (2 ** zoom) / CELLS_PER_TILE
+    rows = np.floor((lats + 90) / cell_size).astype(np.int64)
+    cols = np.floor((lons + 180) / cell_size).astype(np.int64)
+    keys = rows * (int(360 / cell_size) + 1) + cols
+
+    rank_by = -priority if priority is not None else np.arange(len(keys))
+    order = np.lexsort((rank_by, keys))
+    sorted_keys = keys[order]
+
+    # Position of each point within its cell after sorting by priority
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    group_sizes = np.diff(np.r_[starts, len(keys)])
+    rank = np.arange(len(keys)) - np.repeat(starts, group_sizes)
+
+    return np.sort(order[rank < per_cell])
@@ -0,0 +1,93 @@
+"""
+Station registry backing the pollution endpoints.
+
+Stations come from the dataset configured by DATASET_DIR when there is one;
+otherwise the registry seeds synthetic monitoring stations around the cities
+in the gazetteer below.
+"""
+from typing import Optional
+import numpy as np
+from app.core.config import settings
+from app.services.spatial import StationIndex
+
+# City gazetteer: (name, latitude, longitude, population in millions, typical PM2.5)
+CITIES = [
+    ("New Delhi", 28.6139, 77.2090, 32.9, 110.0),
+    ("Mumbai", 19.0760, 72.8777, 21.3, 55.0),
+    ("Kolkata", 22.5726, 88.3639, 15.3, 75.0),
+    ("Bangalore", 12.9716, 77.5946, 13.6, 40.0),
+    ("Chennai", 13.0827, 80.2707, 11.8, 38.0),
+    ("Hyderabad", 17.3850, 78.4867, 10.8, 45.0),
+    ("Ahmedabad", 23.0225, 72.5714, 8.7, 65.0),
+    ("Pune", 18.5204, 73.8567, 7.2, 50.0),
+    ("Surat", 21.1702, 72.8311, 7.8, 55.0),
+    ("Lucknow", 26.8467, 80.9462, 4.0, 100.0),
+    ("Jaipur", 26.9124, 75.7873, 4.1, 75.0),
+    ("Kanpur", 26.4499, 80.3319, 3.2, 105.0),
+    ("Nagpur", 21.1458, 79.0882, 3.0, 55.0),
+    ("Patna", 25.5941, 85.1376, 2.6, 110.0),
+    ("Indore", 22.7196, 75.8577, 3.3, 50.0),
+    ("Bhopal", 23.2599, 77.4126, 2.5, 55.0),
+    ("Ludhiana", 30.9010, 75.8573, 2.0, 90.0),
+    ("Agra", 27.1767, 78.0081, 2.3, 95.0),
+    ("Varanasi", 25.3176, 82.9739, 1.8, 95.0),
+    ("Chandigarh", 30.7333, 76.7794, 1.2, 70.0),
+    ("Guwahati", 26.1445, 91.7362, 1.2, 60.0),
+    ("Kochi", 9.9312, 76.2673, 2.3, 30.0),
+    ("Beijing", 39.9042, 116.4074, 21.9, 40.0),
+    ("Dhaka", 23.8103, 90.4125, 23.2, 80.0),
+    ("Lahore", 31.5204, 74.3587, 13.5, 100.0),
+    ("Karachi", 24.8607, 67.0011, 17.2, 60.0),
+    ("Bangkok", 13.7563, 100.5018, 11.2, 25.0),
+    ("Jakarta", -6.2088, 106.8456, 11.3, 40.0),
+    ("Cairo", 30.0444, 31.2357, 22.2, 65.0),
+    ("Mexico City", 19.4326, -99.1332, 22.3, 22.0),
+    ("London", 51.5074, -0.1278, 9.6, 10.0),
+    ("New York", 40.7128, -74.0060, 18.9, 8.0),
+]
+
+DEFAULT_CITY = "New Delhi"
+
+# Synthetic stations are scattered within this radius (degrees) of the city centre
+CITY_SPREAD_DEGREES = 0.3
+
+def build_station_index(stations_per_city: int, seed: int = 0) -> StationIndex:
+    """Build an index holding every gazetteer city plus synthetic stations around it."""
+    rng = np.random.default_rng(seed)
+    index = StationIndex()
+
+    names = [c[0] for c in CITIES]
+    lats = np.array([c[1] for c in CITIES])
+    lons = np.array([c[2] for c in CITIES])
+    base = np.array([c[4] for c in CITIES])
+    index.insert_many([f"city_{i:03d}" for i in range(len(CITIES))], names, lats, lons, base_pm25=base)
+
+    if stations_per_city > 0:
+        city = np.repeat(np.arange(len(CITIES)), stations_per_city)
+        count = len(city)
+        offsets = rng.normal(0, CITY_SPREAD_DEGREES / 2, (2, count)).clip(-CITY_SPREAD_DEGREES, CITY_SPREAD_DEGREES)
+        index.insert_many(
+            [f"stn_{i:06d}" for i in range(count)],
+            [f"{names[c]} #{i % stations_per_city + 1}" for i, c in enumerate(city.tolist())],
+            lats[city] + offsets[0],
+            lons[city] + offsets[1],
+            base_pm25=base[city] * rng.lognormal(0, 0.25, count)
+        )
+
+    return index
+
+_station_index: Optional[StationIndex] = None
+
+def get_station_index() -> StationIndex:
+    """Return the process-wide station index, building it on first use."""
+    global _station_index
+    if _station_index is None:
+        # Imported here because the dataset module builds on this one
+        from app.services.synthetic import get_dataset
+        
+        dataset = get_dataset()
+        if dataset is not None:
+            _station_index = dataset.station_index()
+        else:
+            _station_index = build_station_index(settings.STATIONS_PER_CITY)
+    return _station_index
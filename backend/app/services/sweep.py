@@ -0,0 +1,102 @@
+"""
+Parameter sweeps over tree planting scenarios.
+
+A scenario is a tree count for an area. Each one is evaluated against the
+same Monte Carlo draws of the uncertain inputs (baseline AQI, tree
+effectiveness), so differences between scenarios come from the scenarios
+themselves and not from sampling noise. Scenarios are evaluated as one
+(scenarios × samples) array per shard, and shards run on a process pool.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+import multiprocessing
+import numpy as np
+from app.core.config import settings
+from app.services.impact import projected_reduction
+
+DISTRIBUTIONS = ("fixed", "normal", "lognormal", "uniform")
+
+def draw(spec: dict, samples: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Samples of an uncertain input. `spec` has a `distribution` and its
+    parameters: `mean` (fixed, normal, lognormal), `std` (normal, lognormal)
+    or `low`/`high` (uniform). Lognormal takes the mean and std of the value
+    itself, not of its logarithm.
+    """
+    kind = spec["distribution"]
+    if kind == "fixed":
+        return np.full(samples, float(spec["mean"]))
+    if kind == "normal":
+        return rng.normal(spec["mean"], spec["std"], samples)
+    if kind == "lognormal":
+        variance = np.log1p((spec["std"] / spec["mean"]) ** 2)
+        return rng.lognormal(np.log(spec["mean"]) - variance / 2, np.sqrt(variance), samples)
+    if kind == "uniform":
+        return rng.uniform(spec["low"], spec["high"], samples)
+    raise ValueError(f"Unknown distribution: {kind}")
+
+def evaluate_scenarios(areas: np.ndarray, trees: np.ndarray, spec: dict) -> dict[str, np.ndarray]:
+    """
+    Monte Carlo statistics for each (area, trees) scenario.
+    `spec` holds the `currentAQI` and `effectiveness` distributions, the
+    number of `samples`, the `seed` and the `confidence` level of the bands.
+    """
+    rng = np.random.default_rng(spec["seed"])
+    samples = spec["samples"]
+    aqi = np.clip(np.round(draw(spec["currentAQI"], samples, rng)), 0, 500)
+    effectiveness = np.maximum(draw(spec["effectiveness"], samples, rng), 0)
+
+    areas = np.asarray(areas, dtype=np.float64)[:, None]
+    trees = np.asarray(trees, dtype=np.float64)[:, None]
+    # Effectiveness scales what each tree achieves, i.e. the effective tree count
+    reduction, projected = projected_reduction(trees * effectiveness, aqi, areas)
+    drop = aqi - projected
+
+    tail = (1 - spec["confidence"]) / 2 * 100
+    percentiles = [tail, 50, 100 - tail]
+    reduction_bands = np.percentile(reduction, percentiles, axis=1)
+    projected_bands = np.percentile(projected, percentiles, axis=1)
+    return {
+        "meanReduction": reduction.mean(axis=1),
+        "reductionLow": reduction_bands[0],
+        "reductionMedian": reduction_bands[1],
+        "reductionHigh": reduction_bands[2],
+        "meanProjectedAQI": projected.mean(axis=1),
+        "projectedAQILow": projected_bands[0],
+        "projectedAQIMedian": projected_bands[1],
+        "projectedAQIHigh": projected_bands[2],
+        "meanAQIDrop": drop.mean(axis=1),
+        "probabilityOfImprovement": (drop > 0).mean(axis=1),
+    }
+
+def pareto_frontier(cost: np.ndarray, benefit: np.ndarray) -> np.ndarray:
+    """
+    Indices of the scenarios no other scenario beats on both lower cost and
+    higher benefit, ordered by cost.
+    """
+    order = np.lexsort((-benefit, cost))
+    ordered = benefit[order]
+    best_before = np.r_[-np.inf, np.maximum.accumulate(ordered)[:-1]]
+    return order[ordered > best_before]
+
+_pool: Optional[Executor] = None
+
+def get_sweep_pool() -> Executor:
+    """Return the process-wide sweep pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        if settings.SWEEP_POOL_WORKERS > 0:
+            # Spawned workers don't inherit the event loop or threads of the API process
+            _pool = ProcessPoolExecutor(
+                settings.SWEEP_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _pool = ThreadPoolExecutor(1)
+    return _pool
+
+def shutdown_sweep_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
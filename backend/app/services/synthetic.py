@@ -0,0 +1,293 @@
+"""
+Seeded synthetic pollution dataset generator.
+
+Builds hourly readings for every station in the gazetteer-seeded station
+index with winter/monsoon seasonality, morning and evening rush-hour peaks,
+and noise shared by stations of the same city. Readings are generated a block
+of stations at a time and written straight to disk, so datasets larger than
+memory can be produced. The same seed always produces the same dataset.
+
+Datasets are stored station-major: station `s` owns rows
+[s * hours, (s + 1) * hours).
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Union
+import json
+import numpy as np
+from app.core.config import settings
+from app.services.spatial import StationIndex
+from app.services.stations import CITIES, build_station_index
+
+FORMAT_VERSION = 1
+
+FORMATS = ("npy", "parquet", "arrow")
+
+# Monthly PM2.5 multipliers: winter smog peaks, monsoon washout troughs
+SEASONAL_FACTORS = np.array([1.3, 1.3, 1.0, 1.0, 1.0, 0.7, 0.7, 0.7, 0.7, 1.0, 1.3, 1.3])
+
+READING_COLUMNS = {
+    "station": np.int32,
+    "time": np.int64,
+    "pm25": np.float32,
+    "pm10": np.float32,
+    "no2": np.float32,
+    "o3": np.float32,
+    "co": np.float32,
+    "temperature": np.float32,
+    "humidity": np.float32,
+}
+
+def seasonal_factor(hours: np.ndarray) -> np.ndarray:
+    """Smoothly interpolated monthly multiplier for datetime64[h] timestamps."""
+    day_of_year = (hours.astype("datetime64[h]") - hours.astype("datetime64[Y]")).astype(np.int64) / 24
+    # Anchor each month's factor at its midpoint and wrap around the year end
+    anchors = (np.arange(12) + 0.5) * 365.25 / 12
+    return np.interp(day_of_year, anchors, SEASONAL_FACTORS, period=365.25)
+
+def diurnal_factor(hours: np.ndarray) -> np.ndarray:
+    """Traffic-driven daily cycle peaking mid-morning and late evening."""
+    hour_of_day = hours.astype("datetime64[h]").astype(np.int64) % 24
+    return (
+        1
+        + 0.2 * np.cos(2 * np.pi * (hour_of_day - 9) / 24)
+        + 0.1 * np.cos(4 * np.pi * (hour_of_day - 21) / 24)
+    )
+
+def pm25_series(typical: Union[float, np.ndarray], hours: np.ndarray, noise: np.ndarray) -> np.ndarray:
+    """PM2.5 for each (station, hour) from typical levels and log-space noise."""
+    cycle = seasonal_factor(hours) * diurnal_factor(hours)
+    return np.asarray(typical)[..., None] * cycle * np.exp(noise)
+
+def regional_noise(rng: np.random.Generator, regions: int, hours: int, phi: float = 0.97, sigma: float = 0.25) -> np.ndarray:
+    """AR(1) log-space noise per region, so weather episodes last for days."""
+    shocks = rng.normal(0, sigma * np.sqrt(1 - phi ** 2), (hours, regions))
+    noise = np.empty((hours, regions))
+    noise[0] = rng.normal(0, sigma, regions)
+    for t in range(1, hours):
+        noise[t] = phi * noise[t - 1] + shocks[t]
+    return noise.T
+
+def _generate_block(
+    rng: np.random.Generator,
+    typical: np.ndarray,
+    cities: np.ndarray,
+    hours: np.ndarray,
+    regional: np.ndarray
+) -> dict[str, np.ndarray]:
+    """Generate every column for a block of stations, flattened station-major."""
+    count, n_hours = len(typical), len(hours)
+    noise = regional[cities] + rng.normal(0, 0.15, (count, n_hours))
+    pm25 = pm25_series(typical, hours, noise)
+
+    hour_of_day = hours.astype(np.int64) % 24
+    season = seasonal_factor(hours)
+    traffic = diurnal_factor(hours)
+    # Ozone forms in afternoon sunlight and is suppressed in the smoggy winter months
+    sunlight = np.clip(np.cos(2 * np.pi * (hour_of_day - 14) / 24), 0, None)
+    # ppb, as the AQI tables expect
+    no2 = 35 * traffic * season * rng.lognormal(0, 0.3, (count, n_hours))
+    o3 = (20 + 45 * sunlight / season) * rng.lognormal(0, 0.2, (count, n_hours))
+    temperature = 27 - 8 * (season - 1) / 0.3 + 5 * np.cos(2 * np.pi * (hour_of_day - 15) / 24)
+    humidity = 60 - 20 * (season - 1) / 0.3 - 15 * np.cos(2 * np.pi * (hour_of_day - 15) / 24)
+
+    columns = {
+        "pm25": pm25,
+        "pm10": pm25 * rng.uniform(1.3, 1.8, (count, n_hours)),
+        "no2": no2,
+        "o3": o3,
+        "co": 0.3 + pm25 / 60 * rng.lognormal(0, 0.2, (count, n_hours)),
+        "temperature": temperature + rng.normal(0, 1.5, (count, n_hours)),
+        "humidity": np.clip(humidity + rng.normal(0, 5, (count, n_hours)), 5, 100),
+    }
+    return {name: values.reshape(-1) for name, values in columns.items()}
+
+def generate_dataset(
+    directory: Path,
+    stations_per_city: int,
+    days: int,
+    start: Optional[datetime] = None,
+    seed: int = 0,
+    fmt: str = "npy",
+    block_stations: int = 256
+) -> dict:
+    """
+    Generate a dataset into a directory and return its manifest.
+    Memory use is bounded by `block_stations` × hours, not by the dataset size.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format must be one of: {', '.join(FORMATS)}")
+    if fmt != "npy":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError(f"Writing {fmt} datasets requires pyarrow")
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    index = build_station_index(stations_per_city, seed)
+    n_stations = len(index)
+
+    first_hour = np.datetime64(start or datetime(2025, 1, 1), "h")
+    hours = first_hour + np.arange(days * 24).astype("timedelta64[h]")
+    n_hours = len(hours)
+
+    # Stations are inserted city by city: first one row per city, then
+    # stations_per_city synthetic rows per city
+    cities = np.r_[np.arange(len(CITIES)), np.repeat(np.arange(len(CITIES)), stations_per_city)]
+    regional = regional_noise(rng, len(CITIES), n_hours)
+    typical = index.column("base_pm25")
+
+    np.save(directory / "station_lat.npy", index.latitudes)
+    np.save(directory / "station_lon.npy", index.longitudes)
+    np.save(directory / "station_base_pm25.npy", typical)
+    np.save(directory / "station_city.npy", cities.astype(np.int32))
+    (directory / "stations.json").write_text(json.dumps({"ids": index.ids, "names": index.names}))
+
+    total_rows = n_stations * n_hours
+    writer = _open_writer(directory, fmt, total_rows)
+    seconds = hours.astype("datetime64[s]").astype(np.int64)
+
+    try:
+        for lo in range(0, n_stations, block_stations):
+            hi = min(lo + block_stations, n_stations)
+            block = _generate_block(rng, typical[lo:hi], cities[lo:hi], hours, regional)
+            block["station"] = np.repeat(np.arange(lo, hi), n_hours)
+            block["time"] = np.tile(seconds, hi - lo)
+            writer.write(lo * n_hours, {
+                name: block[name].astype(dtype, copy=False) for name, dtype in READING_COLUMNS.items()
+            })
+    finally:
+        writer.close()
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "format": fmt,
+        "seed": seed,
+        "start": str(first_hour),
+        "hours": n_hours,
+        "stations": n_stations,
+        "stationsPerCity": stations_per_city,
+        "rows": total_rows,
+        "columns": list(READING_COLUMNS),
+    }
+    (directory / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+class _NpyWriter:
+    """Writes each column into a preallocated memory-mapped .npy file."""
+
+    def __init__(self, directory: Path, rows: int):
+        self.columns = {
+            name: np.lib.format.open_memmap(directory / f"{name}.npy", mode="w+", dtype=dtype, shape=(rows,))
+            for name, dtype in READING_COLUMNS.items()
+        }
+
+    def write(self, offset: int, block: dict[str, np.ndarray]) -> None:
+        for name, values in block.items():
+            self.columns[name][offset:offset + len(values)] = values
+
+    def close(self) -> None:
+        for column in self.columns.values():
+            column.flush()
+
+class _ArrowWriter:
+    """Streams blocks into a Parquet file or an Arrow IPC file."""
+
+    def __init__(self, directory: Path, fmt: str):
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        self.pa = pa
+        self.schema = pa.schema([(name, pa.from_numpy_dtype(dtype)) for name, dtype in READING_COLUMNS.items()])
+        if fmt == "parquet":
+            self.writer = pa.parquet.ParquetWriter(directory / "readings.parquet", self.schema)
+        else:
+            self.writer = pa.ipc.new_file(str(directory / "readings.arrow"), self.schema)
+
+    def write(self, offset: int, block: dict[str, np.ndarray]) -> None:
+        self.writer.write_table(self.pa.table(block, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+def _open_writer(directory: Path, fmt: str, rows: int):
+    if fmt == "npy":
+        return _NpyWriter(directory, rows)
+    return _ArrowWriter(directory, fmt)
+
+class Dataset:
+    """A generated dataset opened for reading; NPY columns are memory-mapped."""
+
+    def __init__(self, directory: Union[str, Path]):
+        directory = Path(directory)
+        self.directory = directory
+        self.manifest = json.loads((directory / "manifest.json").read_text())
+        self.hours = self.manifest["hours"]
+
+        stations = json.loads((directory / "stations.json").read_text())
+        self.station_ids: list[str] = stations["ids"]
+        self.station_names: list[str] = stations["names"]
+        self.station_lat = np.load(directory / "station_lat.npy")
+        self.station_lon = np.load(directory / "station_lon.npy")
+        self.station_base_pm25 = np.load(directory / "station_base_pm25.npy")
+
+        self.readings = self._open_readings()
+
+    def _open_readings(self) -> dict[str, np.ndarray]:
+        fmt = self.manifest["format"]
+        if fmt == "npy":
+            return {
+                name: np.load(self.directory / f"{name}.npy", mmap_mode="r")
+                for name in self.manifest["columns"]
+            }
+
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        if fmt == "parquet":
+            table = pa.parquet.read_table(self.directory / "readings.parquet", memory_map=True)
+        else:
+            table = pa.ipc.open_file(pa.memory_map(str(self.directory / "readings.arrow"))).read_all()
+        return {name: table.column(name).to_numpy() for name in self.manifest["columns"]}
+
+    def __len__(self) -> int:
+        return self.manifest["rows"]
+
+    def station_index(self) -> StationIndex:
+        """Build a station index whose rows match the dataset's station numbers."""
+        index = StationIndex()
+        index.insert_many(
+            self.station_ids,
+            self.station_names,
+            self.station_lat,
+            self.station_lon,
+            base_pm25=self.station_base_pm25
+        )
+        return index
+
+    def station_rows(self, station: int) -> slice:
+        """Row range holding one station's readings."""
+        return slice(station * self.hours, (station + 1) * self.hours)
+
+    def station_readings(self, station: int) -> dict[str, np.ndarray]:
+        """Every column for one station, as views into the underlying files."""
+        rows = self.station_rows(station)
+        return {name: values[rows] for name, values in self.readings.items()}
+
+def load_dataset(directory: Union[str, Path]) -> Dataset:
+    """Open a dataset produced by generate_dataset."""
+    return Dataset(directory)
+
+_dataset: Optional[Dataset] = None
+
+def get_dataset() -> Optional[Dataset]:
+    """Return the dataset configured by DATASET_DIR, opening it on first use."""
+    global _dataset
+    if _dataset is None and settings.DATASET_DIR:
+        _dataset = load_dataset(settings.DATASET_DIR)
+    return _dataset
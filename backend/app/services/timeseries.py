@@ -0,0 +1,283 @@
+"""
+Columnar time-series store for pollution readings.
+
+Each location keeps its raw readings in append-only NumPy columns together
+with hourly, daily and monthly min/max/mean rollups that are maintained on
+every append. Range queries are answered by binary search and slicing, and a
+store can be saved to disk and reopened as memory-mapped arrays.
+"""
+from pathlib import Path
+from typing import Callable, Literal, Optional, Sequence, Union, overload
+import json
+import numpy as np
+
+# Rollup resolutions and the datetime64 unit each one buckets readings into
+RESOLUTIONS = {"hour": "h", "day": "D", "month": "M"}
+
+DEFAULT_FIELDS = ("pm25", "pm10", "no2", "o3", "co")
+
+class _Column:
+    """Growable 1-D array with amortised O(1) appends."""
+
+    def __init__(self, dtype, values: Optional[np.ndarray] = None):
+        self.values = values if values is not None else np.empty(256, dtype=dtype)
+        self.size = len(values) if values is not None else 0
+
+    @property
+    def data(self) -> np.ndarray:
+        return self.values[:self.size]
+
+    def extend(self, values: np.ndarray) -> None:
+        needed = self.size + len(values)
+        if needed > len(self.values) or not self.values.flags.writeable:
+            # Memory-mapped columns are read-only; the first append copies them
+            grown = np.empty(max(needed, 2 * len(self.values), 256), dtype=self.values.dtype)
+            grown[:self.size] = self.values[:self.size]
+            self.values = grown
+        self.values[self.size:needed] = values
+        self.size = needed
+
+    def set_last(self, value) -> None:
+        if not self.values.flags.writeable:
+            self.values = np.array(self.values)
+        self.values[self.size - 1] = value
+
+class Rollup:
+    """Per-bucket count/sum/min/max aggregates of every field at one resolution."""
+
+    STATS = ("count", "sum", "min", "max")
+
+    def __init__(self, unit: str, fields: Sequence[str]):
+        self.unit = unit
+        self.fields = tuple(fields)
+        self.buckets = _Column(np.int64)
+        self.columns = {
+            (field, stat): _Column(np.int64 if stat == "count" else np.float64)
+            for field in self.fields
+            for stat in self.STATS
+        }
+
+    def __len__(self) -> int:
+        return self.buckets.size
+
+    def update(self, seconds: np.ndarray, values: dict[str, np.ndarray]) -> None:
+        """Fold a time-sorted batch of readings into the rollup."""
+        buckets = seconds.astype("datetime64[s]").astype(f"datetime64[{self.unit}]").astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        batch_buckets = buckets[starts]
+
+        aggregates = {}
+        for field in self.fields:
+            v = values[field].astype(np.float64)
+            present = ~np.isnan(v)
+            aggregates[field, "count"] = np.add.reduceat(present.astype(np.int64), starts)
+            aggregates[field, "sum"] = np.add.reduceat(np.where(present, v, 0.0), starts)
+            aggregates[field, "min"] = np.minimum.reduceat(np.where(present, v, np.inf), starts)
+            aggregates[field, "max"] = np.maximum.reduceat(np.where(present, v, -np.inf), starts)
+
+        # The batch may continue the last bucket already stored
+        merge = len(self) > 0 and self.buckets.data[-1] == batch_buckets[0]
+        if merge:
+            for key, column in self.columns.items():
+                stat = key[1]
+                last, first = column.data[-1], aggregates[key][0]
+                if stat in ("count", "sum"):
+                    column.set_last(last + first)
+                elif stat == "min":
+                    column.set_last(min(last, first))
+                else:
+                    column.set_last(max(last, first))
+
+        skip = 1 if merge else 0
+        self.buckets.extend(batch_buckets[skip:])
+        for key, column in self.columns.items():
+            column.extend(aggregates[key][skip:])
+
+    def slice(self, start: int, end: int) -> dict:
+        """Return min/max/mean/count arrays for buckets in [start, end)."""
+        buckets = self.buckets.data
+        lo, hi = np.searchsorted(buckets, [start, end], side="left")
+        result = {"time": buckets[lo:hi].astype(f"datetime64[{self.unit}]")}
+
+        for field in self.fields:
+            count = self.columns[field, "count"].data[lo:hi]
+            empty = count == 0
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result[field] = np.where(empty, np.nan, self.columns[field, "sum"].data[lo:hi] / count)
+            result[f"{field}_min"] = np.where(empty, np.nan, self.columns[field, "min"].data[lo:hi])
+            result[f"{field}_max"] = np.where(empty, np.nan, self.columns[field, "max"].data[lo:hi])
+            result[f"{field}_count"] = count
+
+        return result
+
+class SeriesStore:
+    """Append-only readings for one location plus their rollups."""
+
+    def __init__(self, fields: Sequence[str] = DEFAULT_FIELDS):
+        self.fields = tuple(fields)
+        self.time = _Column(np.int64)
+        self.columns = {field: _Column(np.float32) for field in self.fields}
+        self.rollups = {name: Rollup(unit, self.fields) for name, unit in RESOLUTIONS.items()}
+
+    def __len__(self) -> int:
+        return self.time.size
+
+    @property
+    def last_time(self) -> Optional[np.datetime64]:
+        """Timestamp of the newest stored reading."""
+        return self.time.data[-1].astype("datetime64[s]") if len(self) else None
+
+    def append(self, times: np.ndarray, **values: Union[Sequence[float], np.ndarray]) -> int:
+        """
+        Append a batch of readings and update the rollups.
+        Readings may arrive unsorted within a batch but must not precede the
+        newest stored reading. Fields that are not provided are stored as NaN.
+        """
+        unknown = set(values) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        seconds = np.asarray(times).astype("datetime64[s]").astype(np.int64)
+        if len(seconds) == 0:
+            return 0
+
+        order = np.argsort(seconds, kind="stable")
+        seconds = seconds[order]
+        if len(self) and seconds[0] < self.time.data[-1]:
+            raise ValueError("Readings must not precede the newest stored reading")
+
+        batch = {}
+        for field in self.fields:
+            if field in values:
+                column = np.asarray(values[field], dtype=np.float64)
+                if len(column) != len(seconds):
+                    raise ValueError(f"Field {field} has {len(column)} values, expected {len(seconds)}")
+                batch[field] = column[order]
+            else:
+                batch[field] = np.full(len(seconds), np.nan)
+
+        self.time.extend(seconds)
+        for field in self.fields:
+            self.columns[field].extend(batch[field].astype(np.float32))
+        for rollup in self.rollups.values():
+            rollup.update(seconds, batch)
+
+        return len(seconds)
+
+    def raw(self, start: np.datetime64, end: np.datetime64) -> dict:
+        """Return the raw readings in [start, end)."""
+        bounds = np.array([start, end]).astype("datetime64[s]").astype(np.int64)
+        lo, hi = np.searchsorted(self.time.data, bounds, side="left")
+        result = {"time": self.time.data[lo:hi].astype("datetime64[s]")}
+        for field in self.fields:
+            result[field] = self.columns[field].data[lo:hi]
+        return result
+
+    def range(self, start: np.datetime64, end: np.datetime64, resolution: str = "day") -> dict:
+        """Return rollup buckets whose start lies in [start, end) at the given resolution."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Resolution must be one of: {', '.join(RESOLUTIONS)}")
+
+        unit = RESOLUTIONS[resolution]
+        bounds = np.array([start, end]).astype(f"datetime64[{unit}]").astype(np.int64)
+        return self.rollups[resolution].slice(int(bounds[0]), int(bounds[1]))
+
+    def save(self, directory: Path) -> None:
+        """Write every column to .npy files in a directory."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        np.save(directory / "time.npy", self.time.data)
+        for field, column in self.columns.items():
+            np.save(directory / f"{field}.npy", column.data)
+        for name, rollup in self.rollups.items():
+            np.save(directory / f"{name}.buckets.npy", rollup.buckets.data)
+            for (field, stat), column in rollup.columns.items():
+                np.save(directory / f"{name}.{field}.{stat}.npy", column.data)
+
+        (directory / "meta.json").write_text(json.dumps({"fields": list(self.fields)}))
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "SeriesStore":
+        """Open a saved store, memory-mapping its columns unless mmap is False."""
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text())
+        mode: Optional[Literal["r"]] = "r" if mmap else None
+
+        def read(name: str, dtype) -> _Column:
+            return _Column(dtype, np.load(directory / f"{name}.npy", mmap_mode=mode))
+
+        store = cls(meta["fields"])
+        store.time = read("time", np.int64)
+        store.columns = {field: read(field, np.float32) for field in store.fields}
+        for name, rollup in store.rollups.items():
+            rollup.buckets = read(f"{name}.buckets", np.int64)
+            for field, stat in rollup.columns:
+                rollup.columns[field, stat] = read(f"{name}.{field}.{stat}", None)
+
+        return store
+
+class SeriesRegistry:
+    """
+    Per-location stores, opened from disk when a directory is configured.
+    Locations seen for the first time are seeded through the backfill callable.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path, None] = None,
+        backfill: Optional[Callable[[str], Optional[SeriesStore]]] = None
+    ):
+        self.directory = Path(directory) if directory else None
+        self.backfill = backfill
+        self._stores: dict[str, SeriesStore] = {}
+
+    @staticmethod
+    def key(location: str) -> str:
+        """Normalise a location name into a filesystem-safe store key."""
+        return "".join(ch if ch.isalnum() else "_" for ch in location.strip().lower()) or "_"
+
+    def __contains__(self, location: str) -> bool:
+        return self.key(location) in self._stores
+
+    @overload
+    def get(self, location: str, backfill: Literal[False]) -> SeriesStore:
+        ...
+
+    @overload
+    def get(self, location: str, backfill: bool = True) -> Optional[SeriesStore]:
+        ...
+
+    def get(self, location: str, backfill: bool = True) -> Optional[SeriesStore]:
+        """
+        Return the store for a location, loading it on first use.
+        New locations are seeded through the backfill callable, or None is
+        returned when it has nothing for them. With `backfill` False they
+        start empty instead.
+        """
+        key = self.key(location)
+        store = self._stores.get(key)
+        if store is not None:
+            return store
+
+        path = self.directory / key if self.directory else None
+        if path is not None and (path / "meta.json").exists():
+            store = SeriesStore.load(path)
+        elif backfill and self.backfill is not None:
+            store = self.backfill(location)
+            if store is None:
+                return None
+            if path is not None:
+                store.save(path)
+        else:
+            store = SeriesStore()
+
+        self._stores[key] = store
+        return store
+
+    def flush(self) -> None:
+        """Save every in-memory store to the configured directory."""
+        if self.directory is None:
+            return
+        for key, store in self._stores.items():
+            store.save(self.directory / key)
@@ -0,0 +1,38 @@
+"""
+User accounts, stored in the database (the "User" table with Postgres).
+
+Users are looked up by email for sign-in and by id for authenticated
+requests, whose tokens carry the id. Lookups by id are cached like verified
+token claims, for up to AUTH_CLAIMS_CACHE_TTL_SECONDS.
+"""
+from typing import Optional
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.core.database import get_database
+
+# Role allowed to use the admin endpoints and X-Profile
+ADMIN_ROLE = "ADMIN"
+
+user_cache = TTLCache(settings.AUTH_CLAIMS_CACHE_MAX_ENTRIES, settings.AUTH_CLAIMS_CACHE_TTL_SECONDS)
+
+async def add_user(user_data: dict) -> bool:
+    """Store a new user; False when the email is already registered."""
+    return await get_database().insert_user(user_data)
+
+async def get_user(user_id: str) -> Optional[dict]:
+    user = user_cache.get(user_id)
+    if user is MISSING:
+        user = await get_database().get_user(user_id)
+        if user is not None:
+            user_cache.set(user_id, user)
+    return user
+
+async def get_user_by_email(email: str) -> Optional[dict]:
+    return await get_database().get_user_by_email(email)
+
+async def update_password(user_id: str, password: str) -> None:
+    await get_database().update_user_password(user_id, password)
+    user_cache.delete(user_id)
+
+def is_admin(user: Optional[dict]) -> bool:
+    return user is not None and user.get("role") == ADMIN_ROLE
@@ -0,0 +1,372 @@
+"""
+Throughput and latency of every API route.
+
+Usage (from the backend directory):
+    python benchmarks/api_bench.py --output results.json
+    python benchmarks/api_bench.py --transport uvicorn --concurrency 32 --router prediction
+    python benchmarks/api_bench.py --baseline results.json --tolerance 0.15
+
+Drives app.main:app either in-process through httpx's ASGI transport
+(no network, measures the app itself) or through a real uvicorn process
+(adds the server and HTTP parsing). Each scenario sends `--requests`
+requests from `--concurrency` concurrent clients, after a short warmup;
+request inputs are drawn from a generator seeded by `--seed` and the
+scenario name, and prediction dates are offsets from `--anchor-date`, so
+runs with the same seed and anchor send the same requests. The anchor
+defaults to the baseline's with `--baseline` and to tomorrow otherwise; it
+must lie within the next ANCHOR_MAX_DAYS days, as the API only predicts up
+to a year ahead.
+
+Results are printed and, with `--output`, saved as JSON. With
+`--baseline`, each scenario is compared with a saved run and the exit
+status is 1 when its p50 or p95 latency grew, or its throughput fell, by
+more than `--tolerance`. Compare runs made with the same transport,
+concurrency and machine.
+
+The SSE stream (/pollution/stream) never completes and is not covered.
+"""
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Callable
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import zlib
+import httpx
+import numpy as np
+from common import BACKEND, free_port, percentiles, start_server
+
+CITIES = [
+    ("New Delhi", 28.6139, 77.2090),
+    ("Mumbai", 19.0760, 72.8777),
+    ("Beijing", 39.9042, 116.4074),
+    ("Lahore", 31.5204, 74.3587),
+    ("London", 51.5074, -0.1278),
+    ("New York", 40.7128, -74.0060),
+]
+
+# Settings for the server under test; a low bcrypt cost keeps sign-in from dominating a run
+SERVER_ENV = {
+    "BCRYPT_ROUNDS": "8",
+}
+
+# Prediction dates run up to 300 days past the anchor, which must leave them within the API's year
+ANCHOR_MAX_DAYS = 65
+
+def city(rng: np.random.Generator) -> tuple[str, float, float]:
+    return CITIES[rng.integers(len(CITIES))]
+
+def future_date(rng: np.random.Generator, anchor: datetime) -> str:
+    return (anchor + timedelta(days=int(rng.integers(0, 300)), hours=int(rng.integers(24)))).isoformat()
+
+def current(rng, ctx):
+    name, lat, lon = city(rng)
+    return {"params": {"latitude": lat + rng.normal(0, 0.05), "longitude": lon + rng.normal(0, 0.05)}}
+
+def history(rng, ctx):
+    return {"params": {"location": city(rng)[0], "days": int(rng.integers(7, 90)), "resolution": "day"}}
+
+def features(rng, ctx):
+    return {"params": {"location": city(rng)[0]}}
+
+def pollution_map(rng, ctx):
+    _, lat, lon = city(rng)
+    return {"params": {"north": lat + 1, "south": lat - 1, "east": lon + 1, "west": lon - 1, "zoom": 8, "limit": 20}}
+
+def pollution_batch(rng, ctx):
+    n = 500
+    return {"json": {"pm25": rng.uniform(5, 300, n).round(1).tolist(), "pm10": rng.uniform(10, 400, n).round(1).tolist()}}
+
+def ingest(rng, ctx):
+    rows = ["location,latitude,longitude,pm25,pm10"]
+    for i in range(100):
+        rows.append(f"Bench Station {i % 10},{28 + i % 10 / 10},{77 + i % 10 / 10},{rng.uniform(5, 300):.1f},{rng.uniform(10, 400):.1f}")
+    return {"content": "\n".join(rows), "headers": {"Content-Type": "text/csv"}}
+
+def predict(rng, ctx):
+    name, lat, lon = city(rng)
+    return {"json": {"location": name, "latitude": lat, "longitude": lon, "predictionDate": future_date(rng, ctx["anchor"])}}
+
+def prediction_batch(rng, ctx):
+    items = []
+    for _ in range(20):
+        name, lat, lon = city(rng)
+        start = ctx["anchor"] + timedelta(days=int(rng.integers(0, 200)))
+        items.append({
+            "location": name,
+            "latitude": lat,
+            "longitude": lon,
+            "startDate": start.isoformat(),
+            "endDate": (start + timedelta(days=6)).isoformat(),
+        })
+    return {"json": {"items": items}}
+
+def forecast(rng, ctx):
+    name, lat, lon = city(rng)
+    return {"params": {"location": name, "latitude": lat, "longitude": lon, "days": 7}}
+
+def yearly(rng, ctx):
+    name, lat, lon = city(rng)
+    return {"params": {"location": name, "latitude": lat, "longitude": lon, "year": ctx["anchor"].year}}
+
+def simulation_body(rng) -> dict:
+    name, lat, lon = city(rng)
+    aqi = int(rng.integers(50, 400))
+    return {
+        "location": name,
+        "latitude": lat,
+        "longitude": lon,
+        "area": round(float(rng.uniform(0.5, 20)), 2),
+        "currentAQI": aqi,
+        "currentPI": aqi / 2,
+    }
+
+def simulate(rng, ctx):
+    return {"json": simulation_body(rng), "params": {"inline_placements": "false"}}
+
+def dispersion(rng, ctx):
+    return {"json": {**simulation_body(rng), "windSpeed": float(rng.uniform(0, 8)), "windDirection": float(rng.uniform(0, 360)), "gridSize": 200}}
+
+def placements(rng, ctx):
+    return {"path": f"/api/simulation/{ctx['simulationId']}/placements", "headers": {"Accept": "application/geo+json"}}
+
+def recommendations(rng, ctx):
+    name, lat, lon = city(rng)
+    return {"params": {"location": name, "latitude": lat, "longitude": lon, "current_aqi": int(rng.integers(50, 400)), "area": 5.0}}
+
+def sweep(rng, ctx):
+    return {"json": {
+        "location": city(rng)[0],
+        "areas": [1.0, 5.0, 10.0],
+        "currentAQI": {"distribution": "normal", "mean": float(rng.uniform(100, 300)), "std": 30},
+        "treeCounts": {"min": 1, "max": 1000, "steps": 50},
+        "samples": 500,
+        "seed": int(rng.integers(1 << 31)),
+    }}
+
+def signin(rng, ctx):
+    return {"json": ctx["credentials"]}
+
+def nothing(rng, ctx):
+    return {}
+
+# (router, name, method, path, inputs)
+SCENARIOS: list[tuple[str, str, str, str, Callable]] = [
+    ("pollution", "current", "GET", "/api/pollution/current", current),
+    ("pollution", "history", "GET", "/api/pollution/history", history),
+    ("pollution", "features", "GET", "/api/pollution/features", features),
+    ("pollution", "map", "GET", "/api/pollution/map", pollution_map),
+    ("pollution", "batch", "POST", "/api/pollution/batch", pollution_batch),
+    ("pollution", "ingest", "POST", "/api/pollution/ingest", ingest),
+    ("pollution", "cache-stats", "GET", "/api/pollution/cache/stats", nothing),
+    ("pollution", "stream-stats", "GET", "/api/pollution/stream/stats", nothing),
+    ("prediction", "predict", "POST", "/api/prediction/predict", predict),
+    ("prediction", "batch", "POST", "/api/prediction/batch", prediction_batch),
+    ("prediction", "forecast", "GET", "/api/prediction/forecast", forecast),
+    ("prediction", "yearly", "GET", "/api/prediction/yearly", yearly),
+    ("prediction", "stats", "GET", "/api/prediction/stats", nothing),
+    ("prediction", "cache-stats", "GET", "/api/prediction/cache/stats", nothing),
+    ("simulation", "simulate", "POST", "/api/simulation/simulate", simulate),
+    ("simulation", "placements", "GET", "", placements),
+    ("simulation", "recommendations", "GET", "/api/simulation/recommendations", recommendations),
+    ("simulation", "dispersion", "POST", "/api/simulation/dispersion", dispersion),
+    ("simulation", "sweep", "POST", "/api/simulation/sweep", sweep),
+    ("jobs", "list", "GET", "/api/jobs", nothing),
+    ("jobs", "stats", "GET", "/api/jobs/stats", nothing),
+    ("auth", "signin", "POST", "/api/auth/signin", signin),
+    ("auth", "me", "GET", "/api/auth/me", nothing),
+    ("app", "health", "GET", "/health", nothing),
+]
+
+ROUTERS = sorted({router for router, *_ in SCENARIOS})
+
+async def prepare(client: httpx.AsyncClient) -> dict:
+    """Create what scenarios depend on: a signed-in user and a stored simulation."""
+    credentials = {"email": "bench@example.com", "password": "bench-password"}
+    response = await client.post("/api/auth/signup", json={**credentials, "name": "Benchmark"})
+    if response.status_code == 400:
+        response = await client.post("/api/auth/signin", json=credentials)
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    body = simulation_body(np.random.default_rng(0))
+    response = await client.post("/api/simulation/simulate", json=body, params={"inline_placements": "false"})
+    response.raise_for_status()
+    return {"credentials": credentials, "simulationId": response.json()["id"]}
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: tuple,
+    ctx: dict,
+    requests: int,
+    warmup: int,
+    concurrency: int,
+    seed: int
+) -> dict:
+    router, name, method, path, inputs = scenario
+    rng = np.random.default_rng([seed, zlib.crc32(f"{router}/{name}".encode())])
+    calls = [inputs(rng, ctx) for _ in range(warmup + requests)]
+
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    next_call = 0
+
+    async def worker(measure: bool, stop: int) -> None:
+        nonlocal next_call
+        while next_call < stop:
+            call = dict(calls[next_call])
+            next_call += 1
+            url = call.pop("path", path)
+            started = time.perf_counter()
+            response = await client.request(method, url, **call)
+            elapsed = time.perf_counter() - started
+            if measure:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(worker(False, warmup) for _ in range(min(concurrency, warmup))))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(True, warmup + requests) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    errors = sum(n for code, n in statuses.items() if code >= 400)
+    return {
+        "router": router,
+        **percentiles(latencies),
+        "errors": errors,
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+        "requestsPerSecond": round(requests / elapsed, 1),
+    }
+
+@asynccontextmanager
+async def asgi_client():
+    """A client calling the app in this process, with its lifespan running."""
+    os.environ.update(SERVER_ENV)
+    sys.path.insert(0, str(BACKEND))
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            yield client
+
+@asynccontextmanager
+async def uvicorn_client(concurrency: int):
+    """A client calling a uvicorn process started for the run."""
+    port = free_port()
+    server = await asyncio.to_thread(start_server, port, SERVER_ENV)
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+            yield client
+    finally:
+        server.terminate()
+        server.wait()
+
+async def run(args: argparse.Namespace) -> dict:
+    selected = [
+        s for s in SCENARIOS
+        if (not args.router or s[0] in args.router) and (not args.scenario or f"{s[0]}/{s[1]}" in args.scenario)
+    ]
+    connect = asgi_client() if args.transport == "asgi" else uvicorn_client(args.concurrency)
+    results = {}
+    async with connect as client:
+        ctx = await prepare(client)
+        ctx["anchor"] = datetime.combine(args.anchor_date, datetime.min.time())
+        for scenario in selected:
+            key = f"{scenario[0]}/{scenario[1]}"
+            results[key] = await run_scenario(
+                client, scenario, ctx, args.requests, args.warmup, args.concurrency, args.seed
+            )
+            print(format_row(key, results[key]), file=sys.stderr)
+
+    return {
+        "meta": {
+            "transport": args.transport,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+            "anchorDate": args.anchor_date.isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "commit": git_commit(),
+            "startedAt": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+def git_commit() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, capture_output=True, text=True)
+    return result.stdout.strip()
+
+def format_row(key: str, result: dict) -> str:
+    return (
+        f"{key:<28} {result['requestsPerSecond']:>9.1f} req/s"
+        f"  p50 {result.get('p50Ms', 0):>8.2f}  p95 {result.get('p95Ms', 0):>8.2f}"
+        f"  p99 {result.get('p99Ms', 0):>8.2f} ms  errors {result['errors']}"
+    )
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of `current` against `baseline`, one line each."""
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        for metric in ("p50Ms", "p95Ms"):
+            if metric in result and metric in base and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{key}: {metric} {base[metric]} -> {result[metric]}")
+        if result["requestsPerSecond"] < base["requestsPerSecond"] * (1 - tolerance):
+            regressions.append(f"{key}: requestsPerSecond {base['requestsPerSecond']} -> {result['requestsPerSecond']}")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{key}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--router", action="append", choices=ROUTERS, help="only scenarios of this router (repeatable)")
+    parser.add_argument("--scenario", action="append", help="only this scenario, e.g. pollution/map (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor-date", type=date.fromisoformat, help="first prediction date, YYYY-MM-DD")
+    parser.add_argument("--output", help="save results as JSON here")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.anchor_date is None:
+        anchor = baseline and baseline["meta"].get("anchorDate")
+        args.anchor_date = date.fromisoformat(anchor) if anchor else date.today() + timedelta(days=1)
+    if not date.today() < args.anchor_date <= date.today() + timedelta(days=ANCHOR_MAX_DAYS):
+        parser.error(f"--anchor-date must be within the next {ANCHOR_MAX_DAYS} days, not {args.anchor_date}")
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        if baseline["meta"]["transport"] != args.transport or baseline["meta"]["concurrency"] != args.concurrency:
+            print("warning: baseline used a different transport or concurrency", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} of {args.baseline}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Helpers shared by the benchmarks: a uvicorn server to test and latency percentiles."""
+from pathlib import Path
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port: int, env: dict, args: tuple[str, ...] = ()) -> subprocess.Popen:
+    """Run the API under uvicorn with extra environment settings and wait until it answers."""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning", *args],
+        cwd=BACKEND,
+        env={**os.environ, **env},
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.TransportError:
+            if server.poll() is not None:
+                raise SystemExit("server exited during startup")
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("server did not start within 60s")
+
+def percentiles(samples: list[float]) -> dict:
+    """p50/p95/p99 and max of latencies in seconds, reported in milliseconds."""
+    if len(samples) < 2:
+        return {"requests": len(samples)}
+    cuts = statistics.quantiles(samples, n=100)
+    return {
+        "requests": len(samples),
+        "p50Ms": round(cuts[49] * 1000, 2),
+        "p95Ms": round(cuts[94] * 1000, 2),
+        "p99Ms": round(cuts[98] * 1000, 2),
+        "maxMs": round(max(samples) * 1000, 2),
+    }
@@ -0,0 +1,125 @@
+"""
+Response encoding speed of the list-heavy endpoints.
+
+Usage (from the backend directory):
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --rows 10000 --repeat 50
+
+For payloads shaped like /pollution/map points, /pollution/history series
+and /prediction/forecast arrays, times turning the endpoint's columns into
+response bytes:
+
+- "fastapi-json": the previous path, building a list of dicts and passing it
+  through jsonable_encoder and the stdlib JSON encoder, as FastAPI does for
+  a returned dict.
+- "json", "msgpack", "arrow": app.core.responses.table_response for each
+  Accept header.
+
+Prints one JSON line per endpoint and format with the median time, body
+size and speedup over fastapi-json.
+"""
+from typing import Callable
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+from app.core.responses import ARROW, JSON, MSGPACK, records, table_response
+
+def map_payload(rows: int, rng: np.random.Generator) -> tuple[dict, str, dict]:
+    columns = {
+        "latitude": rng.uniform(28, 29, rows).round(4),
+        "longitude": rng.uniform(77, 78, rows).round(4),
+        "pm25": rng.uniform(5, 300, rows).round(2),
+        "aqi": rng.integers(0, 500, rows),
+    }
+    fields = {"bounds": {"north": 29.0, "south": 28.0, "east": 78.0, "west": 77.0}, "zoom": 10}
+    return fields, "points", columns
+
+def history_payload(rows: int, rng: np.random.Generator) -> tuple[dict, str, dict]:
+    pm25 = rng.uniform(5, 300, rows).round(2)
+    pm25[rng.random(rows) < 0.05] = np.nan
+    aqi = rng.integers(0, 500, rows)
+    columns = {
+        "date": (np.datetime64("2026-01-01T00") + np.arange(rows).astype("timedelta64[h]")).astype("datetime64[s]").astype(str),
+        "pm25": pm25,
+        "pm25Min": (pm25 * 0.8).round(2),
+        "pm25Max": (pm25 * 1.2).round(2),
+        "aqi": np.where(np.isnan(pm25), None, aqi),
+        "location": ["New Delhi"] * rows,
+    }
+    return {"location": "New Delhi", "resolution": "hour"}, "history", columns
+
+def forecast_payload(rows: int, rng: np.random.Generator) -> tuple[dict, str, dict]:
+    dates = np.datetime64("2026-01-01T09:30:00.123456") + (np.arange(rows) + 1).astype("timedelta64[D]")
+    columns = {
+        "date": [date.isoformat() for date in dates.tolist()],
+        "predictedAQI": rng.integers(0, 500, rows),
+        "predictedPM25": rng.uniform(5, 300, rows).round(2),
+        "confidence": rng.uniform(0.5, 1, rows).round(2),
+    }
+    return {"location": "New Delhi", "latitude": 28.61, "longitude": 77.21}, "forecast", columns
+
+PAYLOADS = {"map": map_payload, "history": history_payload, "forecast": forecast_payload}
+
+def fastapi_json(fields: dict, rows_key: str, columns: dict) -> bytes:
+    # What the endpoints did: NaN -> None and a list of dicts, then FastAPI's encoding
+    values = {
+        name: np.where(np.isnan(column), None, column) if isinstance(column, np.ndarray) and column.dtype.kind == "f" else column
+        for name, column in columns.items()
+    }
+    content = {**fields, rows_key: records(values)}
+    return JSONResponse(jsonable_encoder(content)).body
+
+def negotiated(media_type: str) -> Callable:
+    request = Request({"type": "http", "method": "GET", "headers": [(b"accept", media_type.encode())]})
+    return lambda fields, rows_key, columns: table_response(request, fields, rows_key, columns).body
+
+ENCODERS = {
+    "fastapi-json": fastapi_json,
+    "json": negotiated(JSON),
+    "msgpack": negotiated(MSGPACK),
+    "arrow": negotiated(ARROW),
+}
+
+def measure(encode: Callable, payload: tuple, repeat: int) -> tuple[float, int]:
+    body = encode(*payload)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode(*payload)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), len(body)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="rows per payload")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for name, build in PAYLOADS.items():
+        payload = build(args.rows, np.random.default_rng(args.seed))
+        baseline = None
+        for encoder, encode in ENCODERS.items():
+            seconds, size = measure(encode, payload, args.repeat)
+            baseline = baseline or seconds
+            print(json.dumps({
+                "payload": name,
+                "rows": args.rows,
+                "encoder": encoder,
+                "medianMs": round(seconds * 1000, 3),
+                "bytes": size,
+                "speedup": round(baseline / seconds, 1),
+            }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Latency of unrelated endpoints during a sign-in storm.
+
+Usage (from the backend directory):
+    python benchmarks/signin_storm.py
+    python benchmarks/signin_storm.py --concurrency 64 --seconds 10 --probe /api/prediction/stats
+
+Starts the API under uvicorn, then probes one endpoint at a steady rate
+twice: once on an idle server and once while `--concurrency` clients sign
+in back to back. Password hashing runs on its own thread pool, so the
+probe's p99 should stay close to its idle value; a storm beyond the
+hashing queue is answered with 503 rather than slowing everything down.
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from common import free_port, percentiles, start_server
+
+async def probe(client: httpx.AsyncClient, path: str, rate: float, seconds: float) -> list[float]:
+    """Request `path` `rate` times a second, without waiting for earlier responses."""
+    latencies = []
+
+    async def one() -> None:
+        started = time.perf_counter()
+        await client.get(path)
+        latencies.append(time.perf_counter() - started)
+
+    tasks = []
+    started = time.perf_counter()
+    for i in range(int(rate * seconds)):
+        await asyncio.sleep(max(0.0, started + i / rate - time.perf_counter()))
+        tasks.append(asyncio.create_task(one()))
+    await asyncio.gather(*tasks)
+    return latencies
+
+async def storm(client: httpx.AsyncClient, accounts: list[dict], stop: asyncio.Event, counts: dict) -> None:
+    """Sign in as each account in turn until `stop` is set."""
+    i = 0
+    while not stop.is_set():
+        account = accounts[i % len(accounts)]
+        i += 1
+        response = await client.post("/api/auth/signin", json=account)
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+async def run(args: argparse.Namespace, base_url: str) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency + 64)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        accounts = []
+        for i in range(args.accounts):
+            account = {"email": f"storm{i}@example.com", "password": f"storm-password-{i}"}
+            await client.post("/api/auth/signup", json={**account, "name": f"Storm {i}"})
+            accounts.append(account)
+
+        idle = await probe(client, args.probe, args.rate, args.seconds)
+
+        stop = asyncio.Event()
+        counts: dict[int, int] = {}
+        signins = [asyncio.create_task(storm(client, accounts, stop, counts)) for _ in range(args.concurrency)]
+        started = time.perf_counter()
+        loaded = await probe(client, args.probe, args.rate, args.seconds)
+        stop.set()
+        await asyncio.gather(*signins)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "probe": args.probe,
+        "idle": percentiles(idle),
+        "storm": percentiles(loaded),
+        "signinsPerSecond": round(counts.get(200, 0) / elapsed, 1),
+        "signinStatuses": {str(code): n for code, n in sorted(counts.items())},
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--probe", default="/", help="unrelated endpoint to measure")
+    parser.add_argument("--rate", type=float, default=50.0, help="probe requests per second")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each phase")
+    parser.add_argument("--concurrency", type=int, default=32, help="clients signing in at once")
+    parser.add_argument("--accounts", type=int, default=8)
+    parser.add_argument("--bcrypt-rounds", type=int, help="override BCRYPT_ROUNDS for the server")
+    args = parser.parse_args()
+
+    env = {"BCRYPT_ROUNDS": str(args.bcrypt_rounds)} if args.bcrypt_rounds else {}
+    port = free_port()
+    server = start_server(port, env)
+    try:
+        print(json.dumps(asyncio.run(run(args, f"http://127.0.0.1:{port}"))))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Build a model training set from a generated dataset.
+
+Usage (from the backend directory):
+    python scripts/build_training_set.py ./data/bench ./data/training.npz --horizon-hours 24
+
+For every station and hour, builds the serving model's input row with
+app.services.model.build_features, as of that hour and for the target
+`--horizon-hours` later. The typical level is taken from the station's 30-day
+mean, computed in backfill mode exactly as the live feature store does for
+ingested readings. The target is the PM2.5 reading at the target hour with
+its season taken out, which is what the model predicts before summarize()
+applies the season again.
+
+Writes `features` (rows × len(FEATURES)), `feature_names`, `target`,
+`station` and `time`. A model trained on `features` can be exported with
+scripts/export_model.py and served as is.
+"""
+from pathlib import Path
+from typing import Any
+import argparse
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+from app.services.features import backfill_features
+from app.services.model import FEATURES, build_features, recent_typical
+from app.services.synthetic import load_dataset, seasonal_factor
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", type=Path, help="Directory written by generate_dataset.py")
+    parser.add_argument("output", type=Path, help="Output .npz file")
+    parser.add_argument("--horizon-hours", type=int, default=24, help="How far ahead the target reading is")
+    parser.add_argument("--stations", type=int, help="Only use the first N stations")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    dataset = load_dataset(args.dataset)
+    stations = len(dataset.station_ids) if args.stations is None else min(args.stations, len(dataset.station_ids))
+
+    columns: dict[str, list] = {name: [] for name in ("station", "time", "features", "target")}
+    for station in range(stations):
+        readings = dataset.station_readings(station)
+        times = readings["time"].astype("datetime64[s]")
+        features = backfill_features(times, readings["pm25"])
+
+        # Target: the reading horizon hours after each feature hour, where there is one
+        hours = features["time"].astype(np.int64)
+        lookup = np.searchsorted(hours, hours + args.horizon_hours)
+        found = lookup < len(hours)
+        found[found] &= hours[lookup[found]] == hours[found] + args.horizon_hours
+
+        typical = recent_typical(features["pm25Mean30d"], features["time"])
+        target_time = features["time"][lookup[found]] if found.any() else features["time"][:0]
+        target = features["pm25"][lookup[found]] / seasonal_factor(target_time)
+        keep = np.isfinite(typical[found]) & np.isfinite(target)
+
+        now = features["time"][found][keep]
+        dates = target_time[keep]
+        count = len(dates)
+        columns["station"].append(np.full(count, station, dtype=np.int32))
+        columns["time"].append(now)
+        columns["features"].append(build_features(
+            np.full(count, dataset.station_lat[station]),
+            np.full(count, dataset.station_lon[station]),
+            dates,
+            typical[found][keep],
+            now=now
+        ).astype(np.float32))
+        columns["target"].append(target[keep].astype(np.float32))
+
+    arrays: dict[str, Any] = {name: np.concatenate(values) for name, values in columns.items()}
+    np.savez(args.output, feature_names=np.array(FEATURES), **arrays)
+    print(f"Wrote {len(arrays['target']):,} rows from {stations} stations to {args.output} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
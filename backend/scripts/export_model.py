@@ -0,0 +1,88 @@
+"""
+Export the Keras prediction model to a NumPy weights file.
+
+Usage (from the backend directory, with requirements-ml.txt installed):
+    python scripts/export_model.py
+    python scripts/export_model.py ml-models/model.h5 ml-models/model.npz --version v2.1.0
+
+The output is served by the NumPy runtime (MODEL_RUNTIME=numpy, the
+default), so API workers never import TensorFlow. Dense layers and an
+optional leading Normalization layer are supported. The export is checked
+against Keras on random inputs before it is written.
+"""
+from pathlib import Path
+import argparse
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+from app.core.config import settings
+from app.services.model import ACTIVATIONS, FEATURES, NumpyModel
+
+def export(source: Path, target: Path, version: str) -> dict:
+    from tensorflow import keras
+
+    model = keras.models.load_model(source)
+    mean = np.zeros(len(FEATURES))
+    std = np.ones(len(FEATURES))
+    arrays = {}
+    activations: list[str] = []
+
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind == "InputLayer":
+            continue
+        if kind == "Normalization" and not activations:
+            mean = np.asarray(layer.mean).reshape(-1)
+            std = np.sqrt(np.asarray(layer.variance).reshape(-1))
+            continue
+        if kind == "Dense":
+            kernel, bias = layer.get_weights()
+            activation = layer.get_config()["activation"]
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Layer {layer.name} uses unsupported activation {activation}")
+            arrays[f"kernel_{len(activations)}"] = kernel
+            arrays[f"bias_{len(activations)}"] = bias
+            activations.append(activation)
+            continue
+        raise ValueError(f"Layer {layer.name} ({kind}) is not supported by the NumPy runtime")
+
+    np.savez(
+        target,
+        version=np.array(version),
+        feature_mean=mean,
+        feature_std=np.maximum(std, 1e-12),
+        activations=np.array(activations),
+        **arrays
+    )
+
+    # The exported runtime must agree with Keras
+    sample = np.random.default_rng(0).normal(size=(256, len(FEATURES))) * std + mean
+    expected = np.asarray(model.predict(sample, verbose=0)).reshape(-1)
+    actual = NumpyModel(target).predict(sample)
+    error = float(np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1e-6)))
+    if error > 1e-3:
+        target.unlink()
+        raise ValueError(f"Exported model differs from Keras (max relative error {error:.2e})")
+
+    return {"layers": len(activations), "maxRelativeError": error, "bytes": target.stat().st_size}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", type=Path, nargs="?", default=Path(settings.MODEL_PATH) / settings.PREDICTION_MODEL_NAME)
+    parser.add_argument("target", type=Path, nargs="?", default=Path(settings.MODEL_PATH) / settings.PREDICTION_WEIGHTS_NAME)
+    parser.add_argument("--version", help="Model version served in responses; defaults to the source file name")
+    args = parser.parse_args()
+
+    try:
+        import tensorflow  # noqa: F401
+    except ImportError:
+        sys.exit("Exporting reads the Keras model and needs TensorFlow: pip install -r requirements-ml.txt")
+
+    result = export(args.source, args.target, args.version or args.source.stem)
+    print(f"Wrote {args.target} ({result['layers']} layers, {result['bytes']:,} bytes, "
+          f"max relative error {result['maxRelativeError']:.1e})")
+
+if __name__ == "__main__":
+    main()
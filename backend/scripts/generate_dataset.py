@@ -0,0 +1,49 @@
+"""
+Generate a reproducible synthetic pollution dataset.
+
+Usage (from the backend directory):
+    python scripts/generate_dataset.py ./data/bench --stations-per-city 300 --days 365 --seed 42
+
+Point DATASET_DIR at the output directory to serve stations and history
+from it; benchmarks can open it with app.services.synthetic.load_dataset.
+"""
+from datetime import datetime
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.synthetic import FORMATS, generate_dataset
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", type=Path, help="Output directory")
+    parser.add_argument("--stations-per-city", type=int, default=25)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--start", type=datetime.fromisoformat, default=datetime(2025, 1, 1), help="First hour (ISO date)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=FORMATS, default="npy")
+    parser.add_argument("--block-stations", type=int, default=256, help="Stations generated per block; bounds memory use")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    manifest = generate_dataset(
+        args.directory,
+        args.stations_per_city,
+        args.days,
+        start=args.start,
+        seed=args.seed,
+        fmt=args.format,
+        block_stations=args.block_stations
+    )
+    elapsed = time.perf_counter() - started
+
+    size = sum(f.stat().st_size for f in args.directory.iterdir() if f.is_file())
+    print(json.dumps(manifest, indent=2))
+    print(f"Wrote {manifest['rows']:,} readings ({size / 1e9:.2f} GB) in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
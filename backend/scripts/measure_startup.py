@@ -0,0 +1,64 @@
+"""
+Measure API worker startup time and memory for each model runtime.
+
+Usage (from the backend directory):
+    python scripts/measure_startup.py
+    python scripts/measure_startup.py --runtime numpy --runtime tensorflow --runs 5
+
+Each run starts a fresh interpreter that imports the app and loads the
+model, as a uvicorn worker does, then reports the wall time and peak RSS.
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, resource, time
+started = time.perf_counter()
+import app.main
+from app.services.model import get_model
+model = get_model()
+from app.services.model import FEATURES
+model.predict(__import__("numpy").zeros((1, len(FEATURES))))
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "maxRssMb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "model": type(model).__name__,
+    "tensorflowImported": "tensorflow" in __import__("sys").modules,
+}))
+"""
+
+def measure(runtime: str, runs: int) -> dict:
+    env = {**os.environ, "MODEL_RUNTIME": runtime}
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            return {"runtime": runtime, "error": result.stderr.strip().splitlines()[-1]}
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    return {
+        "runtime": runtime,
+        "model": samples[0]["model"],
+        "tensorflowImported": samples[0]["tensorflowImported"],
+        "medianSeconds": round(statistics.median(s["seconds"] for s in samples), 3),
+        "maxRssMb": round(max(s["maxRssMb"] for s in samples), 1),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runtime", action="append", choices=["numpy", "tensorflow"])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for runtime in args.runtime or ["numpy", "tensorflow"]:
+        print(json.dumps(measure(runtime, args.runs)))
+
+if __name__ == "__main__":
+    main()
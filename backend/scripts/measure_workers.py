@@ -0,0 +1,111 @@
+"""
+Measure per-worker memory of the pre-fork server against uvicorn --workers.
+
+Usage (from the backend directory):
+    python scripts/measure_workers.py
+    python scripts/measure_workers.py --workers 1 --workers 2 --workers 4 --mode prefork
+
+For each mode and worker count, starts the API, requests every gazetteer
+city's history a few times per worker so each worker touches the shared
+data, then reads /proc/<pid>/smaps_rollup of every worker (Linux only).
+"private" is memory only that worker uses; "pss" also counts its share of
+pages shared with the other processes. With the pre-fork server both should
+stay flat as workers are added; with uvicorn --workers every worker loads
+its own copy.
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+sys.path.insert(0, str(BACKEND))
+
+from app.services.stations import CITIES
+
+COMMANDS = {
+    # Only stateless endpoints are requested, so workers may keep their own state
+    "prefork": [sys.executable, "-m", "app.server", "--log-level", "warning", "--allow-private-state"],
+    "uvicorn": [sys.executable, "-m", "uvicorn", "app.main:app", "--log-level", "warning"],
+}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def memory(pid: int) -> dict:
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        fields = {line.split(":")[0]: int(line.split()[1]) for line in f.read().splitlines()[1:]}
+    return {
+        "rssMb": fields["Rss"] / 1024,
+        "pssMb": fields["Pss"] / 1024,
+        "privateMb": (fields["Private_Clean"] + fields["Private_Dirty"]) / 1024,
+    }
+
+def children(pid: int) -> list[int]:
+    result = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True)
+    return [int(p) for p in result.stdout.split()]
+
+def measure(mode: str, workers: int, timeout: float) -> dict:
+    port = free_port()
+    command = [*COMMANDS[mode], "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)]
+    server = subprocess.Popen(command, cwd=BACKEND, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        started = time.perf_counter()
+        with httpx.Client(base_url=base, timeout=60) as client:
+            while True:
+                try:
+                    client.get("/health")
+                    break
+                except httpx.TransportError:
+                    if time.perf_counter() - started > timeout:
+                        raise RuntimeError(f"{mode} server did not start")
+                    time.sleep(0.2)
+
+            for _ in range(3 * workers):
+                for city in CITIES:
+                    client.get("/api/pollution/history", params={"location": city[0], "days": 30}, headers={"Connection": "close"})
+
+        # uvicorn --workers also starts a spawn helper process, and serves
+        # in-process when given a single worker
+        pids = [pid for pid in children(server.pid) if "resource_tracker" not in Path(f"/proc/{pid}/cmdline").read_text()]
+        master = memory(server.pid) if pids else {"pssMb": 0.0}
+        samples = [memory(pid) for pid in pids or [server.pid]]
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    return {
+        "mode": mode,
+        "workers": len(samples),
+        "masterPssMb": round(master["pssMb"], 1),
+        "workerRssMb": round(statistics.mean(s["rssMb"] for s in samples), 1),
+        "workerPssMb": round(statistics.mean(s["pssMb"] for s in samples), 1),
+        "workerPrivateMb": round(statistics.mean(s["privateMb"] for s in samples), 1),
+        "totalPssMb": round(master["pssMb"] + sum(s["pssMb"] for s in samples), 1),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", action="append", choices=list(COMMANDS))
+    parser.add_argument("--workers", action="append", type=int)
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for the server to start")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("Needs Linux /proc/<pid>/smaps_rollup")
+    for mode in args.mode or list(COMMANDS):
+        for workers in args.workers or [1, 2, 4]:
+            print(json.dumps(measure(mode, workers, args.timeout)), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Fill the on-disk prediction cache for the most populous cities.
+
+Usage (from the backend directory):
+    python scripts/prewarm_predictions.py --top 20 --days 365
+
+Predictions are written to PREDICTION_CACHE_DIR (or --cache-dir) for every
+day from tomorrow through the horizon, keyed on the current model version
+and the typical PM2.5 of the city's nearest station, so /predict, /forecast
+and /yearly requests for those cities are served from the cache. Entries
+also carry how many days ahead of today they were predicted, so they only
+serve requests made on the day the script ran. Cities the API tracks live
+readings for use their recent level instead, and miss until their first
+request. Run it after deploying a new model and early every day.
+"""
+from datetime import datetime
+from pathlib import Path
+import argparse
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+from app.core.config import settings
+from app.services.model import build_features, get_model, typical_pm25
+from app.services.prediction_cache import PredictionCache
+from app.services.stations import CITIES
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=20, help="Number of cities, by population")
+    parser.add_argument("--days", type=int, default=365, help="Days ahead to cache")
+    parser.add_argument("--cache-dir", default=settings.PREDICTION_CACHE_DIR, help="Defaults to PREDICTION_CACHE_DIR")
+    args = parser.parse_args()
+
+    if not args.cache_dir:
+        parser.error("Set PREDICTION_CACHE_DIR or pass --cache-dir")
+
+    started = time.perf_counter()
+    model = get_model()
+    cache = PredictionCache(
+        settings.PREDICTION_CACHE_MAX_ENTRIES,
+        settings.PREDICTION_CACHE_TTL_SECONDS,
+        settings.PREDICTION_CACHE_GEO_PRECISION,
+        args.cache_dir
+    )
+    cache.purge(model.version)
+
+    cities = sorted(CITIES, key=lambda city: city[3], reverse=True)[:args.top]
+    today = datetime.now()
+    now = np.datetime64(today, "us")
+    dates = now + (np.arange(args.days) + 1).astype("timedelta64[D]")
+
+    # One model call covers every city and day
+    typical = [typical_pm25(lat, lon) for _, lat, lon, _, _ in cities]
+    features = np.concatenate([
+        build_features(lat, lon, dates, level, now=today) for (_, lat, lon, _, _), level in zip(cities, typical)
+    ])
+    pm25 = model.predict(features).reshape(len(cities), len(dates))
+    for (name, lat, lon, _, _), level, values in zip(cities, typical, pm25):
+        cache.store(lat, lon, dates, model.version, level, values, today)
+    cache.flush()
+
+    print(f"Cached {pm25.size:,} predictions for {len(cities)} cities "
+          f"(model {model.version}) in {time.perf_counter() - started:.1f}s")
+    print(cache.stats())
+    cache.close()
+
+if __name__ == "__main__":
+    main()
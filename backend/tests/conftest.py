@@ -0,0 +1,40 @@
+from typing import Optional
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from app.core import security
+from app.core.config import settings
+from app.main import app
+from app.services import users
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(autouse=True)
+def reset_tokens():
+    yield
+    security.claims_cache.clear()
+    security.revoked_tokens.clear()
+    users.user_cache.clear()
+
+def sign_up(client: TestClient, email: Optional[str] = None) -> str:
+    """Register a new user and return their access token."""
+    response = client.post("/api/auth/signup", json={
+        "email": email or f"{uuid.uuid4().hex[:12]}@example.com",
+        "name": "Test User",
+        "password": "correct horse",
+    })
+    assert response.status_code == 201
+    return response.json()["access_token"]
+
+@pytest.fixture
+def token(client) -> str:
+    return sign_up(client)
+
+@pytest.fixture
+def admin_token(client, monkeypatch) -> str:
+    email = f"admin-{uuid.uuid4().hex[:12]}@example.com"
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", [email])
+    return sign_up(client, email)
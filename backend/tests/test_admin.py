@@ -0,0 +1,37 @@
+"""Admin role on /api/admin and X-Profile."""
+import pytest
+from app.core.config import settings
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+def test_admin_endpoints_need_a_token(profiling, client):
+    assert client.get("/api/admin/profiles").status_code == 401
+
+def test_admin_endpoints_refuse_other_users(profiling, client, token):
+    assert client.get("/api/admin/profiles", headers=bearer(token)).status_code == 403
+    assert client.post("/api/admin/profile?seconds=0.1", headers=bearer(token)).status_code == 403
+
+def test_admin_endpoints_accept_admins(profiling, client, admin_token):
+    assert client.get("/api/auth/me", headers=bearer(admin_token)).json()["role"] == "ADMIN"
+    assert client.get("/api/admin/profiles", headers=bearer(admin_token)).status_code == 200
+
+def test_admin_endpoints_are_hidden_when_profiling_is_off(client, admin_token):
+    assert client.get("/api/admin/profiles", headers=bearer(admin_token)).status_code == 404
+
+def test_x_profile_is_ignored_for_other_users(profiling, client, token):
+    for headers in ({}, bearer(token), {"Authorization": "Bearer not-a-token"}):
+        response = client.get("/health", headers={**headers, "X-Profile": "1"})
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+
+def test_x_profile_profiles_admin_requests(profiling, client, admin_token):
+    response = client.get("/health", headers={**bearer(admin_token), "X-Profile": "1"})
+    profile_id = response.headers["X-Profile-Id"]
+    report = client.get(f"/api/admin/profiles/{profile_id}", headers=bearer(admin_token))
+    assert report.status_code == 200
+    assert "function calls" in report.text
@@ -0,0 +1,56 @@
+"""EPA AQI engine: breakpoints, truncation, rounding and clamping."""
+import numpy as np
+import pytest
+from app.services.aqi import BREAKPOINTS, TRUNCATION, compute_aqi, concentration, sub_index
+
+@pytest.mark.parametrize("pollutant, reading, expected", [
+    ("pm25", 0.0, 0),
+    ("pm25", 12.0, 50),
+    ("pm25", 12.1, 51),
+    ("pm25", 35.4, 100),
+    ("pm25", 55.5, 151),
+    ("pm25", 500.4, 500),
+    # Interpolates to 67.61, which EPA publishes as 68
+    ("pm25", 20.0, 68),
+    ("pm10", 154, 100),
+    ("pm10", 155, 101),
+    ("no2", 100, 100),
+    ("o3", 70, 100),
+    ("co", 9.4, 100),
+    ("co", 9.5, 101),
+])
+def test_breakpoints(pollutant, reading, expected):
+    assert sub_index(pollutant, reading)[0] == expected
+
+def test_concentrations_are_truncated_before_the_lookup():
+    # 12.09 µg/m³ truncates to 12.0, still "good"; 35.49 to 35.4
+    assert sub_index("pm25", [12.09, 35.49]).tolist() == [50, 100]
+    assert sub_index("co", 4.49)[0] == 50
+
+def test_readings_beyond_the_tables_are_clamped():
+    assert sub_index("pm25", [900.0, -5.0]).tolist() == [500, 0]
+    assert sub_index("o3", 500)[0] == 300
+
+def test_compute_aqi_takes_the_dominant_pollutant():
+    result = compute_aqi(pm25=[20.0, None, np.nan], pm10=[300, 40, None])
+    assert result["aqi"].tolist() == [173, 37, -1]
+    assert result["dominant"].tolist() == ["pm10", "pm10", None]
+    assert np.isnan(result["subIndices"]["pm25"][1])
+
+def test_compute_aqi_rejects_bad_input():
+    with pytest.raises(ValueError):
+        compute_aqi(so2=[1.0])
+    with pytest.raises(ValueError):
+        compute_aqi()
+    with pytest.raises(ValueError):
+        compute_aqi(pm25=[1.0, 2.0], pm10=[1.0])
+
+@pytest.mark.parametrize("pollutant", sorted(BREAKPOINTS))
+def test_concentration_is_the_lowest_reaching_each_index(pollutant):
+    top = int(BREAKPOINTS[pollutant][-1, 3])
+    aqi = np.arange(top + 1)
+    c = concentration(pollutant, aqi)
+    assert (sub_index(pollutant, c) >= aqi).all()
+    step = 1 / TRUNCATION[pollutant]
+    below = sub_index(pollutant, np.maximum(c - step, 0))
+    assert ((below < aqi) | (c == 0)).all()
@@ -0,0 +1,111 @@
+"""Verified-claims cache, token revocation and AUTH_REQUIRED."""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import time
+import pytest
+from app.core import cache, security
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.security import create_access_token, revoke_token, sync_revocations, token_digest, verify_token_cached
+
+@pytest.fixture
+def auth_required(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_REQUIRED", True)
+
+@pytest.fixture
+def auth_optional(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_REQUIRED", False)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic clock of the TTL caches, advanced by hand."""
+    clock = SimpleNamespace(now=time.monotonic())
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+async def test_cached_claims_expire_with_the_token(clock):
+    assert settings.AUTH_CLAIMS_CACHE_TTL_SECONDS > 60
+    token = create_access_token({"sub": "a@example.com", "user_id": "user_1"}, timedelta(seconds=60))
+    assert (await verify_token_cached(token))["user_id"] == "user_1"
+
+    clock.now += 55
+    assert token_digest(token) in security.claims_cache
+    clock.now += 10
+    assert token_digest(token) not in security.claims_cache
+
+async def test_cached_claims_expire_after_the_cache_ttl(clock):
+    token = create_access_token({"sub": "a@example.com", "user_id": "user_1"}, timedelta(hours=1))
+    await verify_token_cached(token)
+
+    clock.now += settings.AUTH_CLAIMS_CACHE_TTL_SECONDS - 5
+    assert token_digest(token) in security.claims_cache
+    clock.now += 10
+    assert token_digest(token) not in security.claims_cache
+
+async def test_expired_token_is_not_cached():
+    token = create_access_token({"sub": "a@example.com", "user_id": "user_1"}, timedelta(seconds=-1))
+    assert await verify_token_cached(token) is None
+    assert token_digest(token) not in security.claims_cache
+
+async def test_revocation_after_a_cached_hit():
+    token = create_access_token({"sub": "a@example.com", "user_id": "user_1"})
+    await verify_token_cached(token)
+    hits = security.claims_cache.hits
+    assert await verify_token_cached(token) is not None
+    assert security.claims_cache.hits == hits + 1
+
+    await revoke_token(token)
+    assert await verify_token_cached(token) is None
+    # Still refused once the claims would have been re-verified
+    assert await verify_token_cached(token) is None
+
+async def test_revocation_by_another_worker():
+    token = create_access_token({"sub": "a@example.com", "user_id": "user_1"}, timedelta(hours=1))
+    await verify_token_cached(token)
+
+    # What another worker's revoke_token records in the shared database
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    await get_database().revoke_token(token_digest(token).hex(), expires_at)
+    assert await verify_token_cached(token) is not None
+
+    await sync_revocations(force=True)
+    assert await verify_token_cached(token) is None
+
+def test_signout_revokes_a_cached_token(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    assert client.post("/api/auth/signout", headers=headers).status_code == 204
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+    assert client.get("/api/jobs/stats", headers=headers).status_code == 401
+
+PROTECTED = [
+    "/api/pollution/cache/stats",
+    "/api/prediction/stats",
+    "/api/jobs/stats",
+    "/api/simulation/recommendations?location=Delhi&latitude=28.61&longitude=77.21&current_aqi=150",
+    "/api/admin/profiles",
+]
+
+@pytest.mark.parametrize("path", PROTECTED)
+def test_auth_required_refuses_anonymous_requests(auth_required, client, path):
+    response = client.get(path)
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+@pytest.mark.parametrize("path", PROTECTED)
+def test_auth_required_accepts_a_valid_token(auth_required, client, token, path):
+    assert client.get(path, headers={"Authorization": f"Bearer {token}"}).status_code != 401
+
+@pytest.mark.parametrize("path", PROTECTED[:-1])
+def test_anonymous_requests_pass_without_auth_required(auth_optional, client, path):
+    assert client.get(path).status_code == 200
+
+def test_bad_token_is_refused_without_auth_required(auth_optional, client):
+    response = client.get("/api/jobs/stats", headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+
+def test_sign_up_is_open_with_auth_required(auth_required, client, token):
+    # The token fixture signed up while AUTH_REQUIRED was set
+    assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 200
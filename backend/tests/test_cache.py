@@ -0,0 +1,52 @@
+"""TTLCache request coalescing."""
+import asyncio
+import pytest
+from app.core.cache import TTLCache
+
+async def test_concurrent_misses_share_one_fetch():
+    cache = TTLCache(max_entries=10, ttl=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    values = await asyncio.gather(*(cache.get_or_fetch("key", fetch) for _ in range(5)))
+    assert values == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+
+async def test_waiter_takes_over_when_the_fetching_request_is_cancelled():
+    cache = TTLCache(max_entries=10, ttl=60)
+    started = asyncio.Event()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    leader = asyncio.create_task(cache.get_or_fetch("key", fetch))
+    await started.wait()
+    waiter = asyncio.create_task(cache.get_or_fetch("key", fetch))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert await waiter == 2
+    assert cache.get("key") == 2
+    assert cache.stats()["inflight"] == 0
+
+async def test_fetch_errors_reach_every_waiter():
+    cache = TTLCache(max_entries=10, ttl=60)
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*(cache.get_or_fetch("key", fetch) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert "key" not in cache
@@ -0,0 +1,117 @@
+"""
+The Database contract, checked against every backend. Postgres runs only
+when TEST_DATABASE_URL points at a database with the Prisma schema applied.
+"""
+from datetime import datetime, timedelta
+import os
+import uuid
+import pytest
+from app.core.database import POLLUTION_COLUMNS, MemoryDatabase, PostgresDatabase
+
+@pytest.fixture(params=["memory", "postgres"])
+async def database(request):
+    if request.param == "memory":
+        database = MemoryDatabase()
+    else:
+        dsn = os.environ.get("TEST_DATABASE_URL")
+        if not dsn:
+            pytest.skip("TEST_DATABASE_URL is not set")
+        database = PostgresDatabase(dsn, 1, 2, 100, 10, 60)
+    await database.connect()
+    yield database
+    await database.close()
+
+def unique(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:16]}"
+
+def pollution_row(location: str, date: datetime, pm25: float) -> tuple:
+    now = datetime.utcnow()
+    values = {
+        "id": unique("ing"), "location": location, "latitude": 28.6, "longitude": 77.2, "date": date,
+        "pm25": pm25, "pm10": None, "no2": None, "o3": None, "co": None, "temperature": None, "humidity": None,
+        "aqi": 100, "pollutionIndex": None, "source": "test", "createdAt": now, "updatedAt": now,
+    }
+    return tuple(values[column] for column in POLLUTION_COLUMNS)
+
+def user_record(email: str) -> dict:
+    now = datetime.utcnow().replace(microsecond=0)
+    return {
+        "id": unique("user"), "name": "Test User", "email": email, "password": "hash",
+        "role": "USER", "isResearcher": False, "createdAt": now, "updatedAt": now,
+    }
+
+async def test_latest_pollution_is_the_newest_reading(database):
+    location = unique("Location")
+    assert await database.copy_pollution([]) == 0
+    assert await database.latest_pollution(location) is None
+
+    day = datetime(2026, 1, 1)
+    rows = [pollution_row(location, day + timedelta(hours=hour), pm25) for hour, pm25 in ((2, 30.0), (5, 50.0), (1, 10.0))]
+    assert await database.copy_pollution(rows) == 3
+
+    latest = await database.latest_pollution(location)
+    assert latest["date"] == day + timedelta(hours=5)
+    assert latest["pm25"] == 50.0
+    assert latest["source"] == "test"
+
+async def test_simulations_are_stored_by_id(database):
+    record = {
+        "id": unique("sim"), "location": "Delhi", "latitude": 28.6, "longitude": 77.2, "area": 1.5,
+        "currentAQI": 180, "currentPI": 90.0, "treesNeeded": 12, "projectedReduction": 20.0,
+        "projectedAQI": 144, "treePlacements": "[]", "createdAt": datetime.utcnow(),
+        "placementStrategy": "ignored extra field",
+    }
+    await database.insert_simulation(record)
+    stored = await database.get_simulation(record["id"])
+    assert stored["treesNeeded"] == 12 and stored["location"] == "Delhi"
+    assert "placementStrategy" not in stored
+    assert await database.get_simulation(unique("sim")) is None
+
+async def test_users_are_unique_by_email(database):
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    user = user_record(email)
+    assert await database.insert_user(user)
+    assert not await database.insert_user({**user_record(email), "name": "Someone Else"})
+
+    by_id = await database.get_user(user["id"])
+    by_email = await database.get_user_by_email(email)
+    assert by_id == by_email
+    assert by_id["name"] == "Test User"
+    assert await database.get_user(unique("user")) is None
+
+    await database.update_user_password(user["id"], "new hash")
+    updated = await database.get_user(user["id"])
+    assert updated["password"] == "new hash"
+    assert updated["updatedAt"] >= user["updatedAt"]
+
+async def test_user_rows_are_copies(database):
+    user = user_record(f"{uuid.uuid4().hex[:12]}@example.com")
+    await database.insert_user(user)
+    (await database.get_user(user["id"]))["password"] = "tampered"
+    assert (await database.get_user(user["id"]))["password"] == "hash"
+
+async def test_revoked_tokens_since_a_time(database):
+    before = datetime.utcnow() - timedelta(seconds=1)
+    digest, expired = unique("digest"), unique("digest")
+    await database.revoke_token(digest, datetime.utcnow() + timedelta(hours=1))
+    await database.revoke_token(digest, datetime.utcnow() + timedelta(hours=2))
+    await database.revoke_token(expired, datetime.utcnow() - timedelta(seconds=1))
+
+    digests = [row["digest"] for row in await database.revoked_tokens(before)]
+    assert digests.count(digest) == 1
+    assert expired not in digests
+    assert digest not in [row["digest"] for row in await database.revoked_tokens(datetime.utcnow() + timedelta(minutes=1))]
+
+async def test_memory_tables_keep_the_newest_rows():
+    database = MemoryDatabase(max_rows=2)
+    for i in range(3):
+        await database.copy_pollution([pollution_row(f"L{i}", datetime(2026, 1, 1), float(i))])
+        await database.insert_simulation({
+            "id": f"sim_{i}", "location": "X", "latitude": 0, "longitude": 0, "area": 1, "currentAQI": 1,
+            "currentPI": 1, "treesNeeded": 1, "projectedReduction": 1, "projectedAQI": 1,
+            "treePlacements": "[]", "createdAt": datetime.utcnow(),
+        })
+    assert [row["location"] for row in database.pollution] == ["L1", "L2"]
+    assert list(database.latest) == ["L1", "L2"]
+    assert await database.get_simulation("sim_0") is None
+    assert database.stats()["simulationRows"] == 2
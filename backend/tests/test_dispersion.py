@@ -0,0 +1,120 @@
+"""Dispersion engine: mass conservation, the finite-difference equation and plume direction."""
+import numpy as np
+import pytest
+from app.services.dispersion import (
+    DIFFUSIVITY,
+    MAX_REDUCTION,
+    REDUCTION_PER_TREE_KM2,
+    REMOVAL_RATE,
+    _fast_length,
+    disperse,
+    run_dispersion,
+    tree_counts,
+    wind_vector,
+)
+from app.services.placement import area_extent
+
+SIZE = 96
+CELL_KM = 0.05
+
+def planted(rng: np.random.Generator, count: int = 12) -> tuple[np.ndarray, np.ndarray]:
+    """An uneven baseline and a few trees well inside the grid."""
+    baseline = rng.uniform(40, 200, (SIZE, SIZE))
+    trees = np.zeros((SIZE, SIZE))
+    rows, cols = rng.integers(SIZE // 3, 2 * SIZE // 3, (2, count))
+    np.add.at(trees, (rows, cols), 1)
+    return baseline, trees
+
+def removal(baseline: np.ndarray, trees: np.ndarray) -> np.ndarray:
+    return trees * (REDUCTION_PER_TREE_KM2 / CELL_KM ** 2) * baseline
+
+@pytest.mark.parametrize("wind", [(0.0, 0.0), (0.5, 0.0), (-0.3, 0.4)])
+def test_reduction_conserves_the_removed_mass(wind):
+    baseline, trees = planted(np.random.default_rng(1))
+    reduction = baseline - disperse(baseline, trees, CELL_KM, wind)
+    assert (reduction / baseline).max() < MAX_REDUCTION
+    # Light winds keep the plume well inside the grid, so nothing is carried off the edges
+    assert reduction.sum() == pytest.approx(removal(baseline, trees).sum(), rel=1e-3)
+    assert (reduction > -1e-9).all()
+
+@pytest.mark.parametrize("wind", [(0.0, 0.0), (2.5, -1.5)])
+def test_reduction_solves_the_advection_diffusion_equation(wind):
+    baseline, trees = planted(np.random.default_rng(2))
+    r = baseline - disperse(baseline, trees, CELL_KM, wind)
+    u, v = wind
+    h = CELL_KM
+
+    centre = r[1:-1, 1:-1]
+    laplacian = (r[1:-1, 2:] + r[1:-1, :-2] + r[2:, 1:-1] + r[:-2, 1:-1] - 4 * centre) / h ** 2
+    # Upwind differences, rows south to north and columns west to east
+    dx = (centre - r[1:-1, :-2]) / h if u >= 0 else (r[1:-1, 2:] - centre) / h
+    dy = (centre - r[:-2, 1:-1]) / h if v >= 0 else (r[2:, 1:-1] - centre) / h
+    lhs = REMOVAL_RATE * centre - DIFFUSIVITY * laplacian + u * dx + v * dy
+    np.testing.assert_allclose(lhs, REMOVAL_RATE * removal(baseline, trees)[1:-1, 1:-1], atol=1e-6)
+
+def test_wind_carries_the_plume_downwind():
+    baseline = np.full((SIZE, SIZE), 100.0)
+    trees = np.zeros((SIZE, SIZE))
+    trees[SIZE // 2, SIZE // 2] = 5
+    cols = np.arange(SIZE)
+
+    def centroid(wind):
+        reduction = (baseline - disperse(baseline, trees, CELL_KM, wind)).sum(axis=0)
+        return (reduction * cols).sum() / reduction.sum()
+
+    # A westerly (blowing from 270°) pushes the plume east
+    assert wind_vector(2.0, 270.0) == pytest.approx((7.2, 0.0), abs=1e-9)
+    assert centroid(wind_vector(2.0, 270.0)) > SIZE // 2 + 1
+    assert centroid(wind_vector(2.0, 90.0)) < SIZE // 2 - 1
+    assert centroid((0.0, 0.0)) == pytest.approx(SIZE // 2, abs=0.01)
+
+def test_threaded_transforms_match_the_single_threaded_solve():
+    baseline, trees = planted(np.random.default_rng(3))
+    wind = (1.5, 0.5)
+    np.testing.assert_allclose(
+        disperse(baseline, trees, CELL_KM, wind, workers=4), disperse(baseline, trees, CELL_KM, wind), rtol=1e-12
+    )
+
+def test_reduction_is_capped_where_trees_crowd():
+    baseline = np.full((16, 16), 150.0)
+    trees = np.zeros((16, 16))
+    trees[8, 8] = 10_000
+    projected = disperse(baseline, trees, CELL_KM)
+    assert projected.min() == pytest.approx(150.0 * (1 - MAX_REDUCTION))
+    assert (projected <= baseline).all()
+
+def test_without_trees_the_field_is_unchanged():
+    baseline, _ = planted(np.random.default_rng(4))
+    raster, summary = run_dispersion(baseline, np.zeros_like(baseline), CELL_KM, 3.0, 45.0)
+    np.testing.assert_allclose(baseline - disperse(baseline, np.zeros_like(baseline), CELL_KM), 0, atol=1e-9)
+    assert raster.dtype == np.uint16 and raster.shape == baseline.shape
+    assert summary["meanReduction"] == 0 and summary["improvedCells"] == 0
+
+def test_run_dispersion_returns_rows_north_to_south():
+    baseline = np.full((SIZE, SIZE), 100.0)
+    baseline[-10:] = 300.0
+    raster, _ = run_dispersion(baseline, np.zeros_like(baseline), CELL_KM)
+    # The polluted northern rows come first in image order
+    assert raster[0].min() > raster[-1].max()
+
+def test_tree_counts_bin_trees_south_to_north():
+    latitude, longitude, area = 28.6, 77.2, 4.0
+    lat_half, lon_half = area_extent(latitude, longitude, area)
+    lats = np.array([latitude - lat_half * 0.9, latitude + lat_half * 0.9, latitude + lat_half * 0.9, latitude + lat_half * 2])
+    lons = np.array([longitude - lon_half * 0.9, longitude + lon_half * 0.9, longitude + lon_half * 0.9, longitude])
+    counts = tree_counts(lats, lons, latitude, longitude, area, 8)
+    # The tree outside the area is left out
+    assert counts.sum() == 3
+    assert counts[0, 0] == 1 and counts[7, 7] == 2
+
+@pytest.mark.parametrize("n", [1, 7, 97, 1000, 1025])
+def test_fast_lengths_are_5_smooth_and_minimal(n):
+    def smooth(length):
+        for p in (2, 3, 5):
+            while length % p == 0:
+                length //= p
+        return length == 1
+
+    length = _fast_length(n)
+    assert length >= n and smooth(length)
+    assert not any(smooth(m) for m in range(n, length))
@@ -0,0 +1,84 @@
+"""Incremental features against the one-pass backfill and brute-force windows."""
+import numpy as np
+import pytest
+from app.services.features import (
+    FEATURE_NAMES,
+    FeatureStore,
+    LocationFeatures,
+    SlidingWindow,
+    backfill_features,
+)
+from app.services.timeseries import SeriesStore
+
+def series(rng: np.random.Generator, count: int) -> tuple[np.ndarray, np.ndarray]:
+    """Sorted readings, several per hour at times, with gaps of days and missing values."""
+    steps = rng.choice([0, 600, 3600, 7200, 4 * 86400], count, p=[0.2, 0.3, 0.35, 0.13, 0.02])
+    times = np.datetime64("2025-10-20T05:10:00", "s") + np.cumsum(steps).astype("timedelta64[s]")
+    pm25 = rng.uniform(5, 250, count)
+    pm25[rng.random(count) < 0.1] = np.nan
+    return times, pm25
+
+def test_sliding_window_matches_brute_force():
+    rng = np.random.default_rng(3)
+    window = SlidingWindow(24)
+    pushed: list[tuple[int, float]] = []
+    period = 1000
+    for _ in range(3000):
+        period += int(rng.choice([0, 1, 2, 30]))
+        # Now and then a value for a period already behind the head
+        late = period - int(rng.integers(0, 40)) if rng.random() < 0.1 else period
+        value = float(rng.uniform(0, 100)) if rng.random() > 0.05 else np.nan
+        window.push(late, value)
+        if value == value and late > window.head - window.size:
+            pushed.append((late, value))
+
+        inside = [v for p, v in pushed if window.head - window.size < p <= window.head]
+        assert window.count == len(inside)
+        if inside:
+            assert window.mean() == pytest.approx(np.mean(inside))
+            current = [v for p, v in pushed if p == window.head]
+            if current:
+                assert window.period_mean(window.head) == pytest.approx(np.mean(current))
+        else:
+            assert np.isnan(window.mean())
+
+    assert np.isnan(window.period_mean(window.head - window.size))
+    assert np.isnan(window.period_mean(window.head + 1))
+
+def test_incremental_features_match_backfill():
+    times, pm25 = series(np.random.default_rng(5), 4000)
+    backfill = backfill_features(times, pm25)
+    expected = np.column_stack([backfill[name] for name in FEATURE_NAMES])
+    rows = {hour: row for hour, row in zip(backfill["time"].astype(np.int64).tolist(), expected)}
+
+    features = LocationFeatures()
+    hours = times.astype("datetime64[h]").astype(np.int64)
+    checked = 0
+    for i, (time, value) in enumerate(zip(times, pm25)):
+        features.update(np.array([time]), np.array([value]))
+        # Compare once every reading of the hour is in
+        if i + 1 == len(times) or hours[i + 1] != hours[i]:
+            np.testing.assert_allclose(features.vector(), rows[int(hours[i])], rtol=1e-9, equal_nan=True)
+            checked += 1
+    assert checked == len(backfill["time"])
+
+def test_features_without_readings_are_missing():
+    features = LocationFeatures()
+    assert np.isnan(features.vector()).all()
+    assert features.as_dict() == {name: None for name in FEATURE_NAMES}
+
+def test_store_seeds_new_locations_from_their_series():
+    times, pm25 = series(np.random.default_rng(8), 500)
+    store = SeriesStore()
+    store.append(times[:400], pm25=pm25[:400])
+
+    features = FeatureStore()
+    features.update("Pune", times[:400], pm25[:400], store)
+    assert "pune" in features and len(features) == 1
+
+    store.append(times[400:], pm25=pm25[400:])
+    features.update("PUNE", times[400:], pm25[400:], store)
+
+    expected = LocationFeatures()
+    expected.update(times, pm25.astype(np.float32))
+    np.testing.assert_allclose(features.get("Pune").vector(), expected.vector(), rtol=1e-6, equal_nan=True)
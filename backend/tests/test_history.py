@@ -0,0 +1,20 @@
+"""History for stations and for places outside the station index."""
+from app.services import history
+
+def test_unknown_location_gets_a_synthetic_history(client):
+    response = client.get("/api/pollution/history", params={"location": "Nowhere In Particular", "days": 3})
+    assert response.status_code == 200
+    entries = response.json()["history"]
+    assert len(entries) == 3
+    assert all(entry["location"] == "Nowhere In Particular" for entry in entries)
+    assert all(entry["pm25"] is not None for entry in entries)
+
+    # The same place gets the same series, and the registry doesn't keep it
+    again = client.get("/api/pollution/history", params={"location": "nowhere in particular", "days": 3})
+    assert [entry["pm25"] for entry in again.json()["history"]] == [entry["pm25"] for entry in entries]
+    assert "Nowhere In Particular" not in history.get_series_registry()
+
+def test_unknown_location_has_features(client):
+    response = client.get("/api/pollution/features", params={"location": "Nowhere In Particular"})
+    assert response.status_code == 200
+    assert response.json()["features"]["pm25Mean30d"] > 0
@@ -0,0 +1,126 @@
+"""Bulk ingest: validation, line-level rejects (including lines that aren't UTF-8) and storage."""
+import json
+import uuid
+import numpy as np
+from app.core.config import settings
+from app.services.history import get_series_registry
+from app.services.ingest import MAX_ERRORS_PER_BATCH, BatchResult, iter_lines, prepare_batch
+
+def test_invalid_utf8_line_is_rejected(client):
+    location = f"Ingest test {uuid.uuid4().hex[:8]}"
+    body = (
+        b"location,latitude,longitude,pm25,date\n"
+        + f"{location},28.6,77.2,40,2026-01-01T00:00:00\n".encode()
+        + b"\xff\xfebad,28.6,77.2,41,2026-01-01T01:00:00\n"
+        + f"{location},28.6,77.2,42,2026-01-01T02:00:00\n".encode()
+    )
+    response = client.post("/api/pollution/ingest", content=body, headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["accepted"], report["rejected"]) == (2, 1)
+    assert report["batches"][0]["errors"] == [{"line": 3, "error": "Line is not valid UTF-8"}]
+
+def test_invalid_utf8_ndjson_line_is_rejected(client):
+    location = f"Ingest test {uuid.uuid4().hex[:8]}"
+    body = (
+        f'{{"location": "{location}", "latitude": 28.6, "longitude": 77.2, "pm25": 40}}\n'.encode()
+        + b'{"location": "\xc3\x28", "latitude": 28.6, "longitude": 77.2}'
+    )
+    response = client.post("/api/pollution/ingest", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json()["batches"][0]["errors"] == [{"line": 2, "error": "Line is not valid UTF-8"}]
+
+def test_csv_header_must_be_utf8(client):
+    response = client.post("/api/pollution/ingest", content=b"loc\xffation,latitude\n", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 400
+
+def ndjson_batch(*records) -> tuple:
+    lines = [record if isinstance(record, str) else json.dumps(record) for record in records]
+    return prepare_batch(0, lines, list(range(1, len(lines) + 1)), "ndjson")
+
+def errors(result: BatchResult) -> dict[int, str]:
+    return {line: error for line, error in result.errors}
+
+def reading(**fields) -> dict:
+    return {"location": "Somewhere", "latitude": 28.6, "longitude": 77.2, "pm25": 40, **fields}
+
+def test_validation_rejects_each_bad_line_with_its_reason():
+    result, rows = ndjson_batch(
+        reading(),
+        reading(location="  "),
+        reading(pm25="lots"),
+        reading(latitude=91),
+        reading(longitude=None),
+        reading(no2=-1),
+        reading(date="yesterday"),
+        "[1, 2]",
+        "{not json",
+        reading(pm25="", date="2026-01-01T00:00:00Z"),
+    )
+    assert (result.rows, result.accepted) == (10, 0)
+    assert errors(result) == {
+        2: "location is required",
+        3: "pm25 must be a number",
+        4: "latitude is required and must be within ±90",
+        5: "longitude is required and must be within ±180",
+        6: "no2 must not be negative",
+        7: "date must be an ISO 8601 timestamp",
+        8: "Malformed record",
+        9: "Malformed record",
+    }
+    np.testing.assert_array_equal(rows["line"], [1, 10])
+    assert rows["location"].tolist() == ["Somewhere", "Somewhere"]
+    # Blank numbers are missing readings, not errors; a trailing Z is UTC
+    assert np.isnan(rows["pm25"][1])
+    assert rows["date"][1] == np.datetime64("2026-01-01T00:00:00")
+
+def test_csv_rows_of_the_wrong_width_are_malformed():
+    header = ["location", "latitude", "longitude", "pm25"]
+    lines = ["Somewhere,28.6,77.2,40", "Somewhere,28.6", '"Some, where",28.6,77.2,41']
+    result, rows = prepare_batch(3, lines, [2, 3, 4], "csv", header)
+    assert errors(result) == {3: "Malformed record"}
+    assert rows["location"].tolist() == ["Somewhere", "Some, where"]
+    assert result.to_dict()["batch"] == 3
+
+def test_listed_errors_are_capped_but_counted():
+    result, rows = ndjson_batch(*[reading(pm25=-1)] * (MAX_ERRORS_PER_BATCH + 5))
+    assert rows is None
+    assert result.rejected == MAX_ERRORS_PER_BATCH + 5
+    assert len(result.errors) == MAX_ERRORS_PER_BATCH
+
+async def test_lines_are_split_across_chunks():
+    async def chunks():
+        for chunk in (b"first\r\nsec", b"ond\n", b"\n", b"\xe2\x82", b"\xac third"):
+            yield chunk
+
+    assert [line async for line in iter_lines(chunks())] == ["first", "second", "", "€ third"]
+
+def test_readings_are_batched_stored_and_later_stale_ones_rejected(client, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_BATCH_ROWS", 2)
+    location = f"Ingest test {uuid.uuid4().hex[:8]}"
+    body = "\n".join(
+        json.dumps(reading(location=location, pm25=pm25, date=f"2026-01-01T0{hour}:00:00"))
+        for hour, pm25 in enumerate([40, 41, 42, 43, 44])
+    )
+    response = client.post("/api/pollution/ingest", content=body, headers={"Content-Type": "application/x-ndjson"})
+    report = response.json()
+    assert (report["rows"], report["accepted"]) == (5, 5)
+    assert [batch["rows"] for batch in report["batches"]] == [2, 2, 1]
+
+    store = get_series_registry().get(location, backfill=False)
+    assert store.raw(np.datetime64("2026-01-01"), np.datetime64("2026-01-02"))["pm25"].tolist() == [40, 41, 42, 43, 44]
+
+    late = json.dumps(reading(location=location, date="2026-01-01T02:30:00"))
+    report = client.post("/api/pollution/ingest", content=late, headers={"Content-Type": "application/x-ndjson"}).json()
+    assert report["accepted"] == 0
+    assert report["batches"][0]["errors"] == [
+        {"line": 1, "error": "date precedes readings already stored for this location"}
+    ]
+    assert len(store) == 5
+
+def test_unsupported_content_type_and_incomplete_header_are_refused(client):
+    response = client.post("/api/pollution/ingest", content="{}", headers={"Content-Type": "application/json"})
+    assert response.status_code == 415
+    response = client.post("/api/pollution/ingest", content="location,pm25\nX,1\n", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 400
+    assert "latitude, longitude" in response.json()["detail"]
@@ -0,0 +1,276 @@
+"""Job state machine: cancelling, requeueing after a restart, sharing a store between workers and the queue limit."""
+import asyncio
+import time
+from datetime import datetime
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from app.main import app
+from app.services import jobs
+from app.services.jobs import (
+    CANCELLED,
+    JOB_KINDS,
+    QUEUED,
+    RUNNING,
+    SUCCEEDED,
+    JobManager,
+    MemoryJobStore,
+    QueueFullError,
+    SQLiteJobStore,
+    register_job,
+)
+
+class WaitRequest(BaseModel):
+    name: str = "job"
+
+class Gate:
+    """Test job kind that runs until released."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.runs: list[str] = []
+
+    async def run(self, request: WaitRequest, progress) -> dict:
+        self.runs.append(request.name)
+        progress(0.5, "Waiting")
+        await self.release.wait()
+        return {"name": request.name}
+
+@pytest.fixture
+def gate():
+    gate = Gate()
+    register_job("test-wait", WaitRequest, gate.run)
+    yield gate
+    del JOB_KINDS["test-wait"]
+
+async def wait_for(manager: JobManager, job_id: str, *statuses: str) -> dict:
+    for _ in range(200):
+        job = await manager.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} stayed {job['status']}")
+
+async def test_cancel_queued_job(gate):
+    manager = JobManager(MemoryJobStore(), workers=1, max_queued=10, retention=3600)
+    running = await manager.submit("test-wait", {"name": "first"})
+    queued = await manager.submit("test-wait", {"name": "second"})
+    await wait_for(manager, running["id"], RUNNING)
+
+    cancelled = await manager.cancel(queued["id"])
+    assert cancelled["status"] == CANCELLED
+    assert manager.store.get(queued["id"])["status"] == CANCELLED
+
+    gate.release.set()
+    assert (await wait_for(manager, running["id"], SUCCEEDED))["status"] == SUCCEEDED
+    # The cancelled job never reaches a worker
+    assert gate.runs == ["first"]
+    assert (await manager.stats())["cancelled"] == 1
+    await manager.stop()
+
+async def test_cancel_running_job(gate):
+    manager = JobManager(MemoryJobStore(), workers=1, max_queued=10, retention=3600)
+    job = await manager.submit("test-wait", {})
+    await wait_for(manager, job["id"], RUNNING)
+
+    cancelling = await manager.cancel(job["id"])
+    assert cancelling["status"] == RUNNING
+    assert cancelling["message"] == "Cancelling"
+
+    job = await wait_for(manager, job["id"], CANCELLED)
+    assert job["finishedAt"] is not None
+    assert (await manager.stats())["running"] == 0
+    await manager.stop()
+
+async def test_cancel_finished_job_is_unchanged(gate):
+    manager = JobManager(MemoryJobStore(), workers=1, max_queued=10, retention=3600)
+    gate.release.set()
+    job = await manager.submit("test-wait", {})
+    await wait_for(manager, job["id"], SUCCEEDED)
+    assert (await manager.cancel(job["id"]))["status"] == SUCCEEDED
+    assert await manager.cancel("job_missing") is None
+    await manager.stop()
+
+async def test_requeue_on_restart(gate, tmp_path):
+    manager = JobManager(SQLiteJobStore(str(tmp_path)), workers=1, max_queued=10, retention=3600)
+    running = await manager.submit("test-wait", {"name": "running"})
+    queued = await manager.submit("test-wait", {"name": "queued"})
+    await wait_for(manager, running["id"], RUNNING)
+    # Stopping interrupts the running job and leaves it marked as running
+    await manager.stop()
+    store = SQLiteJobStore(str(tmp_path))
+    assert [job["status"] for job in store.unfinished()] == [RUNNING, QUEUED]
+
+    restarted = JobManager(store, workers=1, max_queued=10, retention=3600)
+    await restarted.start()
+    assert (await restarted.get(running["id"]))["status"] in (QUEUED, RUNNING)
+    assert (await restarted.get(queued["id"]))["status"] == QUEUED
+
+    gate.release.set()
+    for job_id in (running["id"], queued["id"]):
+        assert (await wait_for(restarted, job_id, SUCCEEDED))["status"] == SUCCEEDED
+    assert gate.runs == ["running", "running", "queued"]
+    assert (await restarted.result(queued["id"]))["result"] == {"name": "queued"}
+    await restarted.stop()
+
+async def test_restart_without_resume_leaves_jobs(gate, tmp_path):
+    manager = JobManager(SQLiteJobStore(str(tmp_path)), workers=1, max_queued=10, retention=3600)
+    job = await manager.submit("test-wait", {})
+    await wait_for(manager, job["id"], RUNNING)
+    await manager.stop()
+
+    restarted = JobManager(SQLiteJobStore(str(tmp_path)), workers=1, max_queued=10, retention=3600)
+    await restarted.start(resume=False)
+    assert await restarted.queued() == 0
+    assert (await restarted.get(job["id"]))["status"] == RUNNING
+    await restarted.stop()
+
+def shared(tmp_path, owner: int) -> JobManager:
+    """One of several workers sharing a job store, as under app.server."""
+    return JobManager(SQLiteJobStore(str(tmp_path)), workers=1, max_queued=10, retention=3600, poll_interval=0.01, owner=owner)
+
+def test_claim_takes_each_job_once(tmp_path):
+    first, second = SQLiteJobStore(str(tmp_path)), SQLiteJobStore(str(tmp_path))
+    for index in range(3):
+        first.save({"id": f"job_{index}", "kind": "test-wait", "status": QUEUED, "createdAt": datetime(2026, 1, 1, index)})
+    claimed = first.claim(1, 2) + second.claim(2, 2) + first.claim(1, 2)
+    assert [(job["id"], job["owner"]) for job in claimed] == [("job_0", 1), ("job_1", 1), ("job_2", 2)]
+    first.close()
+    second.close()
+
+async def test_cancel_job_of_another_worker(gate, tmp_path):
+    owner, other = shared(tmp_path, 1), shared(tmp_path, 2)
+    await owner.start(resume=False)
+    job = await owner.submit("test-wait", {})
+    await wait_for(owner, job["id"], RUNNING)
+
+    await other.start(resume=False)
+    cancelling = await other.cancel(job["id"])
+    assert cancelling["status"] == RUNNING
+    assert cancelling["message"] == "Cancelling"
+    # The owner picks the request up from the store at its next poll
+    assert (await wait_for(other, job["id"], CANCELLED))["finishedAt"] is not None
+    assert gate.runs == ["job"]
+    await owner.stop()
+    await other.stop()
+
+async def test_cancel_unclaimed_job_from_another_worker(gate, tmp_path):
+    busy = shared(tmp_path, 1)
+    running = await busy.submit("test-wait", {"name": "running"})
+    await wait_for(busy, running["id"], RUNNING)
+    queued = await busy.submit("test-wait", {"name": "queued"})
+
+    other = shared(tmp_path, 2)
+    assert (await other.cancel(queued["id"]))["status"] == CANCELLED
+    gate.release.set()
+    await wait_for(busy, running["id"], SUCCEEDED)
+    assert gate.runs == ["running"]
+    await busy.stop()
+
+async def test_progress_reaches_other_workers(gate, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "PROGRESS_SAVE_SECONDS", 0.0)
+    owner, other = shared(tmp_path, 1), shared(tmp_path, 2)
+    job = await owner.submit("test-wait", {})
+    await wait_for(owner, job["id"], RUNNING)
+    for _ in range(100):
+        seen = await other.get(job["id"])
+        if seen["progress"] == 0.5:
+            break
+        await asyncio.sleep(0.01)
+    assert (seen["progress"], seen["message"]) == (0.5, "Waiting")
+
+    gate.release.set()
+    await wait_for(owner, job["id"], SUCCEEDED)
+    # A late progress write can't turn a finished job back into a running one
+    owner.store.update_progress(job["id"], 0.7, "Late")
+    assert (await other.get(job["id"]))["progress"] == 1.0
+    await owner.stop()
+    await other.stop()
+
+async def test_jobs_of_exited_worker_are_requeued(gate, tmp_path):
+    exited = shared(tmp_path, 1)
+    running = await exited.submit("test-wait", {"name": "running"})
+    await wait_for(exited, running["id"], RUNNING)
+    queued = await exited.submit("test-wait", {"name": "queued"})
+    await exited.stop()
+
+    # Another worker takes the unclaimed job but leaves the one the exited worker owns
+    other = shared(tmp_path, 2)
+    await other.start(resume=False)
+    await wait_for(other, queued["id"], RUNNING)
+    assert (await other.get(running["id"]))["status"] == RUNNING
+    gate.release.set()
+    await wait_for(other, queued["id"], SUCCEEDED)
+    assert gate.runs == ["running", "queued"]
+
+    # What the pre-fork master does once it reaps the worker
+    store = SQLiteJobStore(str(tmp_path))
+    assert store.release(1) == 1
+    store.close()
+    job = await wait_for(other, running["id"], SUCCEEDED)
+    assert job["owner"] == 2
+    assert gate.runs == ["running", "queued", "running"]
+    await other.stop()
+
+async def test_cancel_requested_before_owner_exits(gate, tmp_path):
+    exited = shared(tmp_path, 1)
+    job = await exited.submit("test-wait", {})
+    await wait_for(exited, job["id"], RUNNING)
+    await exited.stop()
+
+    store = SQLiteJobStore(str(tmp_path))
+    assert not store.cancel(job["id"])
+    assert store.release(1) == 1
+    assert store.get(job["id"])["status"] == CANCELLED
+    store.close()
+
+async def test_queue_full(gate):
+    manager = JobManager(MemoryJobStore(), workers=1, max_queued=1, retention=3600)
+    running = await manager.submit("test-wait", {})
+    await wait_for(manager, running["id"], RUNNING)
+    await manager.submit("test-wait", {})
+    with pytest.raises(QueueFullError):
+        await manager.submit("test-wait", {})
+    await manager.stop()
+
+def test_queue_full_returns_429(gate, monkeypatch):
+    monkeypatch.setattr(jobs, "_job_manager", JobManager(MemoryJobStore(), workers=1, max_queued=1, retention=3600))
+    with TestClient(app) as client:
+        running = client.post("/api/jobs", json={"kind": "test-wait", "payload": {}})
+        assert running.status_code == 202
+        for _ in range(200):
+            if client.get(f"/api/jobs/{running.json()['id']}").json()["status"] == RUNNING:
+                break
+            time.sleep(0.01)
+        assert client.post("/api/jobs", json={"kind": "test-wait", "payload": {}}).status_code == 202
+
+        full = client.post("/api/jobs", json={"kind": "test-wait", "payload": {}})
+        assert full.status_code == 429
+        assert full.headers["Retry-After"] == "30"
+        assert client.get("/api/jobs/stats").json()["queued"] == 1
+
+@pytest.fixture
+def job_manager(monkeypatch):
+    # Patched before the client starts, so the app starts and stops this one
+    manager = JobManager(MemoryJobStore(), workers=1, max_queued=10, retention=3600)
+    monkeypatch.setattr(jobs, "_job_manager", manager)
+    return manager
+
+def test_jobs_are_scoped_to_their_user(gate, job_manager, client, token, admin_token):
+    mine = {"Authorization": f"Bearer {token}"}
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    job_id = client.post("/api/jobs", json={"kind": "test-wait", "payload": {}}, headers=mine).json()["id"]
+    anonymous_id = client.post("/api/jobs", json={"kind": "test-wait", "payload": {}}).json()["id"]
+
+    assert client.get(f"/api/jobs/{job_id}", headers=mine).status_code == 200
+    assert [job["id"] for job in client.get("/api/jobs", headers=mine).json()] == [job_id]
+    # Anonymous callers only see anonymous jobs, and the other way round
+    assert client.get(f"/api/jobs/{job_id}").status_code == 403
+    assert client.get(f"/api/jobs/{job_id}/result").status_code == 403
+    assert client.delete(f"/api/jobs/{job_id}").status_code == 403
+    assert [job["id"] for job in client.get("/api/jobs").json()] == [anonymous_id]
+    assert client.get(f"/api/jobs/{anonymous_id}", headers=mine).status_code == 403
+
+    assert {job["id"] for job in client.get("/api/jobs", headers=admin).json()} == {job_id, anonymous_id}
+    assert client.delete(f"/api/jobs/{job_id}", headers=admin).status_code == 200
+    gate.release.set()
@@ -0,0 +1,82 @@
+"""Model server: batching and failures that must not stall the queue."""
+import asyncio
+import numpy as np
+import pytest
+from app.services import model_server
+from app.services.model import FEATURES
+from app.services.model_server import ModelServer
+
+class FakeModel:
+    """Predicts each row's first feature; a row starting with -1 breaks the output."""
+
+    version = "fake"
+
+    def __init__(self):
+        self.calls: list[int] = []
+
+    def predict(self, features: np.ndarray):
+        self.calls.append(len(features))
+        if (features[:, 0] == -1).any():
+            return None
+        return features[:, 0] * 1.0
+
+@pytest.fixture
+async def server(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(model_server, "get_model", lambda: model)
+    server = ModelServer(max_batch_size=64, max_wait_ms=20)
+    await server.start()
+    model.calls.clear()
+    yield server
+    await server.stop()
+
+def rows(*values: float) -> np.ndarray:
+    features = np.zeros((len(values), len(FEATURES)))
+    features[:, 0] = values
+    return features
+
+async def test_bad_shape_is_refused_before_queueing(server):
+    with pytest.raises(ValueError):
+        await server.predict(np.zeros((2, len(FEATURES) + 1)))
+    with pytest.raises(ValueError):
+        await server.predict(np.zeros(len(FEATURES)))
+    assert server.stats()["queued"] == 0
+
+async def test_failed_batch_does_not_block_the_next(server):
+    with pytest.raises(TypeError):
+        await server.predict(rows(-1))
+    result = await asyncio.wait_for(server.predict(rows(3, 4)), 1)
+    assert result.tolist() == [3, 4]
+
+async def test_concurrent_requests_share_one_model_call(server):
+    model = model_server.get_model()
+    results = await asyncio.gather(*(server.predict(rows(i, i + 0.5)) for i in range(5)))
+    assert model.calls == [10]
+    for i, result in enumerate(results):
+        assert result.tolist() == [i, i + 0.5]
+
+    stats = server.stats()
+    assert (stats["batches"], stats["requests"], stats["rows"]) == (1, 5, 10)
+
+async def test_batch_closes_once_it_reaches_the_size_limit(server):
+    model = model_server.get_model()
+    results = await asyncio.gather(*(server.predict(rows(*[i] * 20)) for i in range(5)))
+    # The request that crosses 64 rows still joins; the rest wait for the next batch
+    assert model.calls == [80, 20]
+    assert [result[0] for result in results] == [0, 1, 2, 3, 4]
+
+async def test_lone_request_waits_at_most_max_wait(server):
+    model = model_server.get_model()
+    started = asyncio.get_running_loop().time()
+    await server.predict(rows(1))
+    assert asyncio.get_running_loop().time() - started < 0.5
+    assert model.calls == [1]
+
+async def test_cancelled_requests_are_dropped_from_the_batch(server):
+    model = model_server.get_model()
+    abandoned = asyncio.create_task(server.predict(rows(7, 7, 7)))
+    await asyncio.sleep(0)
+    abandoned.cancel()
+    result = await server.predict(rows(1))
+    assert result.tolist() == [1]
+    assert model.calls == [1]
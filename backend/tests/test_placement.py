@@ -0,0 +1,85 @@
+"""Tree placement: weighted sampling, k-means against brute force and the optimized strategy."""
+import numpy as np
+import pytest
+from app.services import placement
+from app.services.placement import (
+    _assign,
+    _systematic_sample,
+    area_extent,
+    grid_placements,
+    optimized_placements,
+    pollution_raster,
+)
+
+LAT, LON, AREA = 28.6, 77.2, 4.0
+
+def hotspot_raster(latitude, longitude, area, size):
+    """Ten times the pollution in the north-east quadrant of the area."""
+    lat_half, lon_half = area_extent(latitude, longitude, area)
+    steps = (np.arange(size) + 0.5) / size * 2 - 1
+    lats, lons = np.meshgrid(latitude + steps * lat_half, longitude + steps * lon_half, indexing="ij")
+    intensity = np.where((lats > latitude) & (lons > longitude), 10.0, 1.0)
+    return lats, lons, intensity
+
+def test_systematic_sample_is_proportional_to_weights():
+    rng = np.random.default_rng(1)
+    weights = rng.uniform(0, 5, 50)
+    weights[[3, 17]] = 0
+    draws = _systematic_sample(weights, 10_000, rng)
+    counts = np.bincount(draws, minlength=len(weights))
+    # Systematic draws land within one of each index's expected count
+    assert np.abs(counts - weights / weights.sum() * 10_000).max() <= 1
+    assert counts[3] == counts[17] == 0
+
+def test_assign_matches_brute_force(monkeypatch):
+    rng = np.random.default_rng(2)
+    points = rng.uniform(-1, 1, (3000, 2))
+    centers = rng.uniform(-1, 1, (70, 2))
+    # Small chunks so the assignment spans many of them
+    monkeypatch.setattr(placement, "KMEANS_CHUNK_ELEMENTS", 7000)
+    distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    np.testing.assert_array_equal(_assign(points, centers), distances.argmin(axis=1))
+
+def test_grid_places_every_tree_around_the_centre():
+    lats, lons = grid_placements(LAT, LON, 30, AREA)
+    assert len(lats) == len(lons) == 30
+    offset = np.sqrt(AREA) / placement.KM_PER_DEGREE / 6
+    assert np.abs(lats - LAT).max() <= 3 * offset + offset / 4
+    assert np.abs(lons - LON).max() <= 3 * offset + offset / 4
+
+def test_raster_interpolates_station_levels():
+    lats, lons, intensity = pollution_raster(LAT, LON, AREA, 16)
+    assert lats.shape == lons.shape == intensity.shape == (16, 16)
+    lat_half, lon_half = area_extent(LAT, LON, AREA)
+    assert lats.min() > LAT - lat_half and lats.max() < LAT + lat_half
+    assert lons.min() > LON - lon_half and lons.max() < LON + lon_half
+    assert np.isfinite(intensity).all() and (intensity > 0).all()
+
+@pytest.mark.parametrize("trees", [1, 40, 500])
+def test_optimized_trees_follow_the_pollution(monkeypatch, trees):
+    monkeypatch.setattr(placement, "pollution_raster", hotspot_raster)
+    result = optimized_placements(LAT, LON, trees, AREA, 32, 5.0, np.random.default_rng(4))
+    lats, lons = result["latitudes"], result["longitudes"]
+    assert len(lats) == len(lons) == trees
+    assert result["converged"] and result["iterations"] >= 1
+
+    lat_half, lon_half = area_extent(LAT, LON, AREA)
+    assert (np.abs(lats - LAT) <= lat_half).all() and (np.abs(lons - LON) <= lon_half).all()
+    if trees > 1:
+        # The hot quadrant holds 10/13 of the pollution, so roughly that share of trees
+        hot = ((lats > LAT) & (lons > LON)).mean()
+        assert hot == pytest.approx(10 / 13, abs=0.1)
+
+def test_optimized_placement_respects_the_time_budget(monkeypatch):
+    monkeypatch.setattr(placement, "pollution_raster", hotspot_raster)
+    result = optimized_placements(LAT, LON, 200, AREA, 32, 0.0, np.random.default_rng(5))
+    # No time for k-means: the weighted samples are returned as they are
+    assert result["iterations"] == 0 and not result["converged"]
+    assert len(result["latitudes"]) == 200
+
+def test_optimized_placement_is_seeded(monkeypatch):
+    monkeypatch.setattr(placement, "pollution_raster", hotspot_raster)
+    first = optimized_placements(LAT, LON, 60, AREA, 16, 5.0, np.random.default_rng(6))
+    second = optimized_placements(LAT, LON, 60, AREA, 16, 5.0, np.random.default_rng(6))
+    np.testing.assert_array_equal(first["latitudes"], second["latitudes"])
+    np.testing.assert_array_equal(first["longitudes"], second["longitudes"])
@@ -0,0 +1,48 @@
+"""Prediction cache keys and purge."""
+from datetime import datetime
+import numpy as np
+import pytest
+from app.services.prediction_cache import PredictionCache
+
+DAYS = np.array(["2026-03-10", "2026-03-11"], dtype="datetime64[D]")
+TODAY = datetime(2026, 3, 1, 9)
+
+@pytest.fixture(params=["memory", "disk"])
+def cache(request, tmp_path):
+    cache = PredictionCache(1000, 3600, precision=2, directory=str(tmp_path) if request.param == "disk" else None)
+    yield cache
+    cache.close()
+
+async def lookup(cache: PredictionCache, *args, **kwargs) -> list:
+    if cache._db is not None:
+        # Skip the memory tier so the disk tier answers
+        cache.flush()
+        cache.memory.clear()
+    return (await cache.lookup(*args, **kwargs)).tolist()
+
+async def test_hits_the_same_cell_day_and_version(cache):
+    cache.store(28.6139, 77.209, DAYS, "v1", 80.0, [50.0, 60.0], TODAY)
+    # Within the same cell, from later on the same day
+    assert await lookup(cache, 28.6141, 77.2088, DAYS, "v1", 80.04, datetime(2026, 3, 1, 23)) == [50.0, 60.0]
+
+@pytest.mark.parametrize("lat, version, typical, now", [
+    (28.64, "v1", 80.0, TODAY),
+    (28.6139, "v2", 80.0, TODAY),
+    (28.6139, "v1", 85.0, TODAY),
+    # The same target days, asked for a day later: fewer days ahead
+    (28.6139, "v1", 80.0, datetime(2026, 3, 2, 9)),
+])
+async def test_every_key_part_separates_entries(cache, lat, version, typical, now):
+    cache.store(28.6139, 77.209, DAYS, "v1", 80.0, [50.0, 60.0], TODAY)
+    assert np.isnan(await lookup(cache, lat, 77.209, DAYS, version, typical, now)).all()
+
+async def test_purge_drops_other_versions(tmp_path):
+    cache = PredictionCache(1000, 3600, precision=2, directory=str(tmp_path))
+    cache.store(28.6, 77.2, DAYS, "v1", 80.0, [50.0, 60.0], TODAY)
+    cache.store(28.6, 77.2, DAYS, "v2", 80.0, [51.0, 61.0], TODAY)
+    cache.flush()
+    assert cache.purge("v2") == 2
+    assert len(cache.memory) == 0
+    assert await cache.lookup(28.6, 77.2, DAYS, "v2", 80.0, TODAY) == pytest.approx([51.0, 61.0])
+    assert np.isnan(await cache.lookup(28.6, 77.2, DAYS, "v1", 80.0, TODAY)).all()
+    cache.close()
@@ -0,0 +1,69 @@
+"""Station index queries against brute force, including across the antimeridian."""
+import numpy as np
+import pytest
+from app.services.spatial import StationIndex, haversine_km, thin_points, zoom_for_bbox
+
+@pytest.fixture(scope="module")
+def stations():
+    rng = np.random.default_rng(7)
+    count = 3000
+    # Clustered like cities, plus scattered points and some hugging ±180°
+    lats = np.concatenate([rng.normal(28.6, 0.5, 1000), rng.uniform(-80, 80, 1800), rng.uniform(-20, 20, 200)])
+    lons = np.concatenate([rng.normal(77.2, 0.5, 1000), rng.uniform(-180, 180, 1800), rng.uniform(178.5, 180, 100), rng.uniform(-180, -178.5, 100)])
+    index = StationIndex(cell_size=0.25)
+    index.insert_many([f"s{i}" for i in range(count)], [f"Station {i}" for i in range(count)], lats, lons)
+    return index
+
+def brute_nearest(index: StationIndex, lat: float, lon: float, n: int) -> np.ndarray:
+    distances = haversine_km(lat, lon, index.latitudes, index.longitudes)
+    return np.sort(distances)[:n]
+
+@pytest.mark.parametrize("lat, lon", [
+    (28.6, 77.2), (0.0, 0.0), (-45.3, 120.7), (75.0, -30.0), (89.9, 10.0),
+    (5.0, 179.99), (-5.0, -179.99), (0.0, 180.0), (0.0, -180.0),
+])
+@pytest.mark.parametrize("n", [1, 5, 40])
+def test_nearest_matches_brute_force(stations, lat, lon, n):
+    rows, distances = stations.nearest(lat, lon, n)
+    assert len(set(rows.tolist())) == n
+    np.testing.assert_allclose(distances, brute_nearest(stations, lat, lon, n))
+    np.testing.assert_allclose(distances, haversine_km(lat, lon, stations.latitudes[rows], stations.longitudes[rows]))
+
+def test_nearest_across_the_antimeridian():
+    index = StationIndex(cell_size=0.25)
+    index.insert_many(["east", "far"], ["East", "Far"], [0.0, 0.0], [-179.95, 175.0])
+    rows, distances = index.nearest(0.0, 179.95)
+    assert index.ids[rows[0]] == "east"
+    assert distances[0] == pytest.approx(11.1, abs=0.1)
+
+def test_nearest_with_cells_wider_than_the_globe_wraps_once():
+    index = StationIndex(cell_size=100)
+    index.insert_many(["a", "b", "c"], ["A", "B", "C"], [0, 10, -10], [0, 120, -120])
+    rows, _ = index.nearest(0, 179, 3)
+    assert sorted(index.ids[row] for row in rows) == ["a", "b", "c"]
+
+@pytest.mark.parametrize("box", [
+    (29.0, 28.0, 78.0, 77.0),
+    (10.0, -10.0, 10.0, -10.0),
+    (20.0, -20.0, -179.0, 179.0),
+    (20.0, -20.0, 180.0, 179.0),
+    (90.0, -90.0, 180.0, -180.0),
+])
+def test_within_bbox_matches_brute_force(stations, box):
+    north, south, east, west = box
+    lats, lons = stations.latitudes, stations.longitudes
+    in_lon = (lons >= west) & (lons <= east) if west <= east else (lons >= west) | (lons <= east)
+    expected = np.flatnonzero((lats >= south) & (lats <= north) & in_lon)
+    assert sorted(stations.within_bbox(*box).tolist()) == expected.tolist()
+
+def test_thin_points_keeps_the_highest_priority_per_cell():
+    lats = np.array([10.0, 10.001, 10.002, -40.0])
+    lons = np.array([20.0, 20.001, 20.002, 100.0])
+    kept = thin_points(lats, lons, zoom=10, per_cell=1, priority=np.array([1.0, 3.0, 2.0, 0.0]))
+    assert kept.tolist() == [1, 3]
+
+def test_zoom_for_bbox():
+    assert zoom_for_bbox(90, -90, 180, -180) == 0
+    assert zoom_for_bbox(29, 28, 78, 77) == 8
+    # Crossing the antimeridian measures the short way round
+    assert zoom_for_bbox(1, -1, -179, 179) == 7
@@ -0,0 +1,140 @@
+"""Parameter sweeps: the Pareto frontier against brute force, shared draws and the endpoint."""
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.services import sweep
+from app.services.impact import projected_reduction
+from app.services.sweep import draw, evaluate_scenarios, pareto_frontier
+
+def brute_frontier(cost: np.ndarray, benefit: np.ndarray) -> list[int]:
+    """Scenarios nothing else dominates, keeping the first of exact duplicates."""
+    keep = []
+    for i in range(len(cost)):
+        dominated = any(
+            (cost[j] <= cost[i] and benefit[j] >= benefit[i])
+            and (cost[j] < cost[i] or benefit[j] > benefit[i] or j < i)
+            for j in range(len(cost)) if j != i
+        )
+        if not dominated:
+            keep.append(i)
+    return sorted(keep, key=lambda i: cost[i])
+
+def spec(**overrides) -> dict:
+    return {
+        "currentAQI": {"distribution": "normal", "mean": 180, "std": 30},
+        "effectiveness": {"distribution": "uniform", "low": 0.5, "high": 1.2},
+        "samples": 2000,
+        "seed": 9,
+        "confidence": 0.9,
+        **overrides,
+    }
+
+@pytest.mark.parametrize("seed", range(5))
+def test_pareto_frontier_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    # Few distinct values, so ties in cost and benefit are common
+    cost = rng.integers(0, 15, 200).astype(np.float64)
+    benefit = rng.integers(0, 15, 200).astype(np.float64)
+    frontier = pareto_frontier(cost, benefit)
+    assert frontier.tolist() == brute_frontier(cost, benefit)
+    assert (np.diff(cost[frontier]) > 0).all() and (np.diff(benefit[frontier]) > 0).all()
+
+def test_pareto_frontier_of_a_saturating_curve():
+    # Reductions cap at the maximum, so only the cheapest capped scenario survives
+    trees = np.arange(1, 101, dtype=np.float64)
+    benefit = np.minimum(trees * 1.5, 70.0)
+    frontier = pareto_frontier(trees * 500, benefit)
+    assert frontier.tolist() == list(range(47))
+
+@pytest.mark.parametrize("distribution", [
+    {"distribution": "normal", "mean": 150, "std": 20},
+    {"distribution": "lognormal", "mean": 150, "std": 20},
+    {"distribution": "uniform", "low": 120, "high": 180},
+])
+def test_draws_have_the_requested_moments(distribution):
+    samples = draw(distribution, 200_000, np.random.default_rng(1))
+    assert samples.mean() == pytest.approx(150, rel=0.005)
+    std = distribution.get("std", 60 / np.sqrt(12))
+    assert samples.std() == pytest.approx(std, rel=0.02)
+
+def test_fixed_draws_and_unknown_distributions():
+    assert (draw({"distribution": "fixed", "mean": 3}, 4, np.random.default_rng()) == 3).all()
+    with pytest.raises(ValueError):
+        draw({"distribution": "poisson", "mean": 3}, 4, np.random.default_rng())
+
+def test_fixed_inputs_reproduce_the_scalar_estimate():
+    areas = np.array([0.5, 1.0, 2.0, 2.0])
+    trees = np.array([10, 10, 40, 400])
+    fixed = spec(currentAQI={"distribution": "fixed", "mean": 200}, effectiveness={"distribution": "fixed", "mean": 1.0}, samples=50)
+    stats = evaluate_scenarios(areas, trees, fixed)
+
+    reduction, projected = projected_reduction(trees, 200, areas)
+    np.testing.assert_allclose(stats["meanReduction"], reduction)
+    np.testing.assert_allclose(stats["reductionLow"], stats["reductionHigh"])
+    np.testing.assert_allclose(stats["meanProjectedAQI"], projected)
+    np.testing.assert_allclose(stats["probabilityOfImprovement"], (projected < 200).astype(float))
+
+def test_shards_see_the_same_draws():
+    areas = np.repeat([1.0, 3.0], 30)
+    trees = np.tile(np.arange(5, 155, 5), 2)
+    whole = evaluate_scenarios(areas, trees, spec())
+    shards = [evaluate_scenarios(areas[i:i + 7], trees[i:i + 7], spec()) for i in range(0, len(trees), 7)]
+    for name, values in whole.items():
+        np.testing.assert_array_equal(np.concatenate([shard[name] for shard in shards]), values)
+
+    # Common draws make more trees never worse for the same area
+    for area in (1.0, 3.0):
+        ordered = whole["meanReduction"][areas == area]
+        assert (np.diff(ordered) >= 0).all()
+    assert (whole["reductionLow"] <= whole["reductionMedian"]).all()
+    assert (whole["reductionMedian"] <= whole["reductionHigh"]).all()
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    # Shards run on a thread so the test doesn't spawn worker processes
+    sweep.shutdown_sweep_pool()
+    monkeypatch.setattr(settings, "SWEEP_POOL_WORKERS", 0)
+    monkeypatch.setattr(settings, "SWEEP_SHARD_SCENARIOS", 7)
+    yield
+    sweep.shutdown_sweep_pool()
+
+def test_sweep_endpoint_returns_scenarios_and_frontier(client, token, thread_pool):
+    body = {
+        "location": "Delhi",
+        "areas": [1.0, 2.5],
+        "currentAQI": {"distribution": "normal", "mean": 180, "std": 25},
+        "treeCounts": {"min": 10, "max": 300, "steps": 12},
+        "samples": 300,
+        "seed": 4,
+    }
+    response = client.post("/api/simulation/sweep", json=body, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["seed"] == 4 and result["scenarioCount"] == len(result["scenarios"])
+
+    # Each area's recommended count is among its scenarios
+    for recommended in result["recommended"]:
+        assert any(s["area"] == recommended["area"] and s["trees"] == recommended["trees"] for s in result["scenarios"])
+
+    cost = np.array([s["cost"] for s in result["scenarios"]])
+    benefit = np.array([s["meanReduction"] for s in result["scenarios"]])
+    frontier = result["paretoFrontier"]
+    # Rounded reductions can tie, so check no scenario beats a frontier one outright
+    for i in frontier:
+        assert not ((cost < cost[i]) & (benefit > benefit[i])).any()
+    assert cost[frontier].tolist() == sorted(cost[frontier].tolist())
+
+    again = client.post("/api/simulation/sweep", json=body, headers={"Authorization": f"Bearer {token}"}).json()
+    assert again["scenarios"] == result["scenarios"]
+
+@pytest.mark.parametrize("change", [
+    {"currentAQI": {"distribution": "normal", "mean": 180}},
+    {"currentAQI": {"distribution": "lognormal", "mean": -5, "std": 1}},
+    {"currentAQI": {"distribution": "uniform", "low": 200, "high": 100}},
+    {"areas": [0]},
+    {"treeCounts": {"min": 50, "max": 10}},
+])
+def test_sweep_refuses_invalid_requests(client, token, change):
+    body = {"location": "Delhi", "areas": [1.0], "currentAQI": {"distribution": "fixed", "mean": 150}, **change}
+    response = client.post("/api/simulation/sweep", json=body, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400
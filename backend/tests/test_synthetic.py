@@ -0,0 +1,84 @@
+"""Synthetic dataset generation: determinism, layout and formats."""
+from datetime import datetime
+import numpy as np
+import pytest
+from app.services.stations import CITIES
+from app.services.synthetic import (
+    READING_COLUMNS,
+    diurnal_factor,
+    generate_dataset,
+    load_dataset,
+    seasonal_factor,
+)
+
+DAYS = 3
+
+def generate(directory, seed=5, fmt="npy", stations_per_city=2):
+    generate_dataset(directory, stations_per_city, DAYS, start=datetime(2025, 12, 30), seed=seed, fmt=fmt, block_stations=16)
+    return load_dataset(directory)
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    return generate(tmp_path_factory.mktemp("dataset"))
+
+def test_same_seed_gives_the_same_dataset(dataset, tmp_path):
+    again = generate(tmp_path)
+    for name in READING_COLUMNS:
+        np.testing.assert_array_equal(again.readings[name], dataset.readings[name])
+    np.testing.assert_array_equal(again.station_lat, dataset.station_lat)
+    assert again.station_ids == dataset.station_ids
+
+def test_other_seed_gives_other_readings(dataset, tmp_path):
+    other = generate(tmp_path, seed=6)
+    assert not np.array_equal(other.readings["pm25"], dataset.readings["pm25"])
+
+def test_readings_are_station_major(dataset):
+    stations = len(CITIES) * 3
+    hours = DAYS * 24
+    assert dataset.manifest["stations"] == stations
+    assert len(dataset) == stations * hours
+    assert dataset.manifest["start"] == "2025-12-30T00"
+
+    first_hours = np.datetime64("2025-12-30T00", "s") + np.arange(hours).astype("timedelta64[h]")
+    for station in (0, len(CITIES), stations - 1):
+        readings = dataset.station_readings(station)
+        assert (readings["station"] == station).all()
+        np.testing.assert_array_equal(readings["time"], first_hours.astype(np.int64))
+
+def test_columns_have_declared_types_and_plausible_values(dataset):
+    for name, dtype in READING_COLUMNS.items():
+        assert dataset.readings[name].dtype == dtype
+    readings = dataset.readings
+    assert (readings["pm25"] > 0).all()
+    assert (readings["pm10"] > readings["pm25"]).all()
+    assert ((readings["humidity"] >= 5) & (readings["humidity"] <= 100)).all()
+
+def test_station_index_rows_match_station_numbers(dataset):
+    index = dataset.station_index()
+    assert len(index) == dataset.manifest["stations"]
+    assert index.ids == dataset.station_ids
+    np.testing.assert_array_equal(index.column("base_pm25"), dataset.station_base_pm25)
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_arrow_formats_hold_the_same_readings(dataset, tmp_path, fmt):
+    pytest.importorskip("pyarrow")
+    other = generate(tmp_path, fmt=fmt)
+    assert other.manifest["format"] == fmt
+    for name in READING_COLUMNS:
+        np.testing.assert_array_equal(other.readings[name], dataset.readings[name])
+
+def test_unknown_format_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        generate_dataset(tmp_path, 1, 1, fmt="csv")
+
+def test_seasonal_and_diurnal_cycles():
+    winter, monsoon = np.datetime64("2025-01-16T12", "h"), np.datetime64("2025-07-16T12", "h")
+    np.testing.assert_allclose(seasonal_factor(np.array([winter, monsoon])), [1.3, 0.7], atol=0.01)
+    # Wraps smoothly across the year end
+    new_year = np.array(["2024-12-31T23", "2025-01-01T00"], dtype="datetime64[h]")
+    assert abs(np.diff(seasonal_factor(new_year))[0]) < 0.01
+
+    day = np.datetime64("2025-03-01T00", "h") + np.arange(24).astype("timedelta64[h]")
+    traffic = diurnal_factor(day)
+    assert traffic.argmax() in (8, 9, 10)
+    assert traffic[9] > traffic[3]
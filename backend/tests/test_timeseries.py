@@ -0,0 +1,128 @@
+"""Series store rollups against aggregates computed directly from the readings."""
+import numpy as np
+import pytest
+from app.services.timeseries import RESOLUTIONS, SeriesRegistry, SeriesStore
+
+START = np.datetime64("2025-12-30T00:00:00", "s")
+
+def readings(rng: np.random.Generator, count: int = 5000) -> tuple[np.ndarray, dict]:
+    """Readings every few minutes over about two months, with gaps and missing values."""
+    seconds = np.cumsum(rng.integers(1, 1800, count))
+    seconds[count // 2:] += 5 * 86400
+    times = START + seconds.astype("timedelta64[s]")
+    values = {
+        "pm25": rng.uniform(5, 300, count),
+        "no2": rng.uniform(1, 80, count),
+    }
+    values["pm25"][rng.random(count) < 0.1] = np.nan
+    values["no2"][:200] = np.nan
+    return times, values
+
+def brute_rollup(times: np.ndarray, values: np.ndarray, unit: str) -> dict:
+    # The store keeps float32 readings but aggregates the float64 input
+    buckets = times.astype(f"datetime64[{unit}]")
+    expected: dict = {"time": [], "mean": [], "min": [], "max": [], "count": []}
+    for bucket in np.unique(buckets):
+        group = values[buckets == bucket]
+        present = group[~np.isnan(group)]
+        expected["time"].append(bucket)
+        expected["count"].append(len(present))
+        expected["mean"].append(present.mean() if len(present) else np.nan)
+        expected["min"].append(present.min() if len(present) else np.nan)
+        expected["max"].append(present.max() if len(present) else np.nan)
+    return expected
+
+@pytest.fixture(scope="module")
+def series():
+    rng = np.random.default_rng(11)
+    times, values = readings(rng)
+    store = SeriesStore()
+    # Batches split mid-bucket and shuffled within themselves
+    for batch in np.array_split(np.arange(len(times)), 9):
+        shuffled = rng.permutation(batch)
+        store.append(times[shuffled], **{field: column[shuffled] for field, column in values.items()})
+    return store, times, values
+
+@pytest.mark.parametrize("resolution", list(RESOLUTIONS))
+@pytest.mark.parametrize("field", ["pm25", "no2"])
+def test_rollups_match_brute_force(series, resolution, field):
+    store, times, values = series
+    # End bounds are exclusive and floored to the resolution, so go a month past the last reading
+    result = store.range(times[0], times[-1] + np.timedelta64(32, "D"), resolution)
+    expected = brute_rollup(times, values[field], RESOLUTIONS[resolution])
+
+    np.testing.assert_array_equal(result["time"], np.array(expected["time"]))
+    np.testing.assert_array_equal(result[f"{field}_count"], expected["count"])
+    np.testing.assert_allclose(result[field], expected["mean"], rtol=1e-9)
+    np.testing.assert_allclose(result[f"{field}_min"], expected["min"])
+    np.testing.assert_allclose(result[f"{field}_max"], expected["max"])
+
+def test_fields_never_provided_are_empty(series):
+    store, times, _ = series
+    result = store.range(times[0], times[-1], "day")
+    assert (result["co_count"] == 0).all()
+    assert np.isnan(result["co"]).all() and np.isnan(result["co_max"]).all()
+
+def test_range_bounds_select_bucket_starts(series):
+    store, _, _ = series
+    result = store.range(np.datetime64("2026-01-02T13:45"), np.datetime64("2026-01-05"), "day")
+    np.testing.assert_array_equal(result["time"], np.arange("2026-01-02", "2026-01-05", dtype="datetime64[D]"))
+
+    with pytest.raises(ValueError):
+        store.range(START, START + np.timedelta64(1, "D"), "week")
+
+def test_raw_returns_sorted_readings_in_range(series):
+    store, times, values = series
+    start, end = times[100], times[400]
+    result = store.raw(start, end)
+    np.testing.assert_array_equal(result["time"], times[100:400])
+    np.testing.assert_allclose(result["pm25"], values["pm25"][100:400].astype(np.float32))
+
+def test_readings_must_not_precede_the_newest():
+    store = SeriesStore()
+    store.append(np.array(["2026-01-01T10"], dtype="datetime64[s]"), pm25=[10.0])
+    with pytest.raises(ValueError):
+        store.append(np.array(["2026-01-01T09"], dtype="datetime64[s]"), pm25=[20.0])
+    with pytest.raises(ValueError):
+        store.append(np.array(["2026-01-01T11"], dtype="datetime64[s]"), lead=[1.0])
+    with pytest.raises(ValueError):
+        store.append(np.array(["2026-01-01T11", "2026-01-01T12"], dtype="datetime64[s]"), pm25=[1.0])
+    assert len(store) == 1
+
+def test_saved_store_reopens_memory_mapped_and_keeps_appending(series, tmp_path):
+    store, times, _ = series
+    store.save(tmp_path)
+    loaded = SeriesStore.load(tmp_path)
+    end = times[-1] + np.timedelta64(32, "D")
+    for resolution in RESOLUTIONS:
+        expected, actual = store.range(times[0], end, resolution), loaded.range(times[0], end, resolution)
+        for key in expected:
+            np.testing.assert_array_equal(actual[key], expected[key])
+
+    # The first append copies the read-only columns and continues the last buckets
+    later = times[-1] + np.array([10, 20], dtype="timedelta64[s]")
+    loaded.append(later, pm25=[1.0, 1000.0])
+    next_day = later[0] + np.timedelta64(1, "D")
+    day = loaded.range(later[0], next_day, "day")
+    assert day["pm25_max"][0] == 1000.0
+    assert day["pm25_count"][0] == store.range(later[0], next_day, "day")["pm25_count"][0] + 2
+    assert len(loaded) == len(store) + 2
+
+def test_registry_backfills_new_locations_once(tmp_path):
+    calls = []
+
+    def backfill(location):
+        calls.append(location)
+        store = SeriesStore()
+        store.append(np.array([START]), pm25=[42.0])
+        return store
+
+    registry = SeriesRegistry(tmp_path, backfill)
+    assert registry.get("New Delhi") is registry.get("new delhi")
+    assert calls == ["New Delhi"]
+    assert len(registry.get("Nowhere", backfill=False)) == 0
+
+    # A new registry over the same directory reads the saved store back
+    reopened = SeriesRegistry(tmp_path, backfill)
+    assert reopened.get("New Delhi").raw(START, START + np.timedelta64(1, "s"))["pm25"][0] == 42.0
+    assert calls == ["New Delhi"]